@@ -0,0 +1,307 @@
+"""
+Benchmark the main Flaskr endpoints against a seeded database.
+
+Seeds a database of configurable size, then:
+  1. drives each endpoint sequentially through the Flask test client to
+     measure per-request latency and SQL statements per request, and
+  2. serves the app over HTTP and drives the read-heavy pages from several
+     threads at once to measure throughput.
+
+Results are written as JSON so runs can be compared between commits.
+
+Usage:
+    python -m benchmarks.endpoints run --products 10000 --output before.json
+    python -m benchmarks.endpoints compare before.json after.json
+"""
+
+import argparse
+import json
+import logging
+import re
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+from werkzeug.serving import make_server
+
+from flaskr import create_app
+from benchmarks.seed import BENCH_URL, ensure_database, seed_db
+from benchmarks.stats import summarize
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+# The example admin user, who sells products 1 & 2
+ADMIN = {"email": "admin@example.com", "password": "admin"}
+# Product 3 is sold by another user, so the admin can buy it
+PURCHASE_PRODUCT_ID = 3
+UPDATE_PRODUCT_ID = 1
+
+
+def _index(client):
+    return client.get("/")
+
+
+def _login(client):
+    return client.post("/auth/login", data=ADMIN)
+
+
+def _purchase_form(client):
+    return client.get(f"/{PURCHASE_PRODUCT_ID}/purchase")
+
+
+def _purchase(client):
+    return client.post(
+        f"/{PURCHASE_PRODUCT_ID}/purchase",
+        data={
+            "street_1": "123 Benchmark St",
+            "street_2": "",
+            "city": "Exampletown",
+            "state": "NY",
+            "zip": "12345",
+        },
+    )
+
+
+def _create(client):
+    return client.post(
+        "/create",
+        data={
+            "name": f"Benchmark {uuid.uuid4().hex}",
+            "description": "A product created by the benchmark",
+            "price": "10.00",
+        },
+    )
+
+
+def _update_form(client):
+    return client.get(f"/{UPDATE_PRODUCT_ID}/update")
+
+
+def _update(client):
+    return client.post(
+        f"/{UPDATE_PRODUCT_ID}/update",
+        data={
+            "name": "Example Product 1",
+            "description": "A description for example product #1",
+            "price": "10.00",
+        },
+    )
+
+
+# (name, request function, whether the client must be logged in)
+SCENARIOS = [
+    ("GET /", _index, False),
+    ("POST /auth/login", _login, False),
+    ("GET /<id>/purchase", _purchase_form, True),
+    ("POST /<id>/purchase", _purchase, True),
+    ("POST /create", _create, True),
+    ("GET /<id>/update", _update_form, True),
+    ("POST /<id>/update", _update, True),
+]
+
+# Pages driven concurrently over HTTP for the throughput benchmark
+THROUGHPUT_PATHS = ["/", f"/{PURCHASE_PRODUCT_ID}/purchase"]
+
+
+def run_micro(app, repeat):
+    """Time each scenario sequentially through the test client."""
+    results = {}
+    for name, scenario, logged_in in SCENARIOS:
+        client = app.test_client()
+        if logged_in:
+            _login(client)
+        samples, queries = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = scenario(client)
+            samples.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                raise RuntimeError(f"{name} failed with {response.status_code}")
+            match = QUERIES.search(response.headers.get("Server-Timing", ""))
+            queries.append(int(match.group(1)) if match else 0)
+        results[name] = summarize(samples)
+        results[name]["queries_per_request"] = round(sum(queries) / len(queries), 2)
+        print(
+            f"{name:<24}p50={results[name]['p50_ms']:>9.2f}ms"
+            f"  p95={results[name]['p95_ms']:>9.2f}ms"
+            f"  queries={results[name]['queries_per_request']}"
+        )
+    return results
+
+
+def run_throughput(app, concurrency, duration, base_url=None):
+    """
+    Drive the app over HTTP from `concurrency` threads, serving it with the
+    threaded werkzeug server unless the `base_url` of a running server is given.
+    """
+    server = None
+    if base_url is None:
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        server = make_server("127.0.0.1", 0, app, threaded=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+
+    def worker(index):
+        session = requests.Session()
+        session.post(f"{base_url}/auth/login", data=ADMIN)
+        samples = []
+        deadline = time.perf_counter() + duration
+        i = index
+        while time.perf_counter() < deadline:
+            path = THROUGHPUT_PATHS[i % len(THROUGHPUT_PATHS)]
+            start = time.perf_counter()
+            session.get(f"{base_url}{path}").raise_for_status()
+            samples.append((time.perf_counter() - start) * 1000)
+            i += 1
+        return samples
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            samples = [
+                sample
+                for worker_samples in executor.map(worker, range(concurrency))
+                for sample in worker_samples
+            ]
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    results = summarize(samples)
+    results["concurrency"] = concurrency
+    results["requests_per_second"] = round(len(samples) / duration, 1)
+    print(
+        f"throughput: {results['requests_per_second']} req/s with {concurrency}"
+        f" threads (p50={results['p50_ms']}ms, p95={results['p95_ms']}ms)"
+    )
+    return results
+
+
+def run(args):
+    ensure_database(args.database_url)
+    app = create_app(
+        {"SQLALCHEMY_DATABASE_URI": args.database_url, "INSTRUMENTATION": True}
+    )
+    if not args.skip_seed:
+        print(
+            f"Seeding {args.users} users, {args.products} products,"
+            f" {args.purchases} purchases..."
+        )
+        with app.app_context():
+            seed_db(users=args.users, products=args.products, purchases=args.purchases)
+
+    results = {
+        "meta": {
+            "commit": _current_commit(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "users": args.users,
+            "products": args.products,
+            "purchases": args.purchases,
+            "repeat": args.repeat,
+        },
+        "micro": run_micro(app, args.repeat),
+    }
+    if args.duration > 0:
+        results["throughput"] = run_throughput(
+            app, args.concurrency, args.duration, args.url
+        )
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"Wrote results to {args.output}")
+
+
+def compare(args):
+    """Compare two result files, failing if any endpoint regressed."""
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.current) as file:
+        current = json.load(file)
+
+    regressions = []
+    print(
+        f"{'endpoint':<24}{'p95 before':>12}{'p95 after':>12}{'change':>9}{'queries':>16}"
+    )
+    for name, before in baseline["micro"].items():
+        after = current["micro"].get(name)
+        if after is None:
+            continue
+        change = after["p95_ms"] / before["p95_ms"] - 1
+        queries = (
+            f"{before['queries_per_request']:g} -> {after['queries_per_request']:g}"
+        )
+        print(
+            f"{name:<24}{before['p95_ms']:>12.2f}{after['p95_ms']:>12.2f}"
+            f"{change:>+9.0%}{queries:>16}"
+        )
+        if change > args.tolerance:
+            regressions.append(f"{name} p95 latency up {change:.0%}")
+        if after["queries_per_request"] > before["queries_per_request"]:
+            regressions.append(f"{name} runs more queries per request")
+
+    if "throughput" in baseline and "throughput" in current:
+        before = baseline["throughput"]["requests_per_second"]
+        after = current["throughput"]["requests_per_second"]
+        change = after / before - 1
+        print(f"throughput: {before} -> {after} req/s ({change:+.0%})")
+        if -change > args.tolerance:
+            regressions.append(f"throughput down {-change:.0%}")
+
+    if regressions:
+        print("Regressions:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+
+
+def _current_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Seed the database and benchmark")
+    run_parser.add_argument("--database-url", default=BENCH_URL)
+    run_parser.add_argument("--users", type=int, default=100)
+    run_parser.add_argument("--products", type=int, default=10000)
+    run_parser.add_argument("--purchases", type=int, default=10000)
+    run_parser.add_argument("--repeat", type=int, default=50)
+    run_parser.add_argument("--concurrency", type=int, default=8)
+    run_parser.add_argument(
+        "--duration", type=float, default=10, help="Seconds (0 to skip)"
+    )
+    run_parser.add_argument(
+        "--url", help="Drive an already running server for throughput instead"
+    )
+    run_parser.add_argument("--skip-seed", action="store_true")
+    run_parser.add_argument("--output", help="Path to write JSON results to")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two results")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="Allowed slowdown (0.2 = 20%%)"
+    )
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
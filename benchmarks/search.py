@@ -0,0 +1,69 @@
+"""
+Benchmark the `/search` endpoint against a seeded database.
+
+Usage:
+    python -m benchmarks.search --products 1000000
+"""
+
+import argparse
+import re
+import time
+from urllib.parse import unquote
+
+from flaskr import create_app
+from benchmarks.seed import BENCH_URL, ensure_database, seed_db
+from benchmarks.stats import percentile
+
+NEXT_PAGE = re.compile(rb"after=([^\"&]+)")
+QUERIES = ["chair", "vintage lamp", "red -chair", "notebook OR guitar", "zzzz"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", default=BENCH_URL)
+    parser.add_argument("--products", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--skip-seed", action="store_true")
+    args = parser.parse_args()
+
+    ensure_database(args.database_url)
+    app = create_app(
+        {"SQLALCHEMY_DATABASE_URI": args.database_url, "PRODUCT_CACHE_TTL": 0}
+    )
+    if not args.skip_seed:
+        print(f"Seeding {args.products} products...")
+        start = time.perf_counter()
+        with app.app_context():
+            seed_db(products=args.products, purchases=0)
+        print(f"Seeded in {time.perf_counter() - start:.1f}s")
+
+    client = app.test_client()
+    print(f"{'query':<24}{'first page ms (p50/p95)':>26}{'next page ms (p50/p95)':>26}")
+    for q in QUERIES:
+        first, after = [], []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            response = client.get("/search", query_string={"q": q})
+            first.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200
+
+            # Follow the "Next" link, if any, to time a keyset-paginated page
+            match = NEXT_PAGE.search(response.data)
+            if match:
+                start = time.perf_counter()
+                client.get(
+                    "/search",
+                    query_string={"q": q, "after": unquote(match.group(1).decode())},
+                )
+                after.append((time.perf_counter() - start) * 1000)
+        print(f"{q:<24}{_percentiles(first):>26}{_percentiles(after):>26}")
+
+
+def _percentiles(samples):
+    if not samples:
+        return "-"
+    return f"{percentile(samples, 50):.1f} / {percentile(samples, 95):.1f}"
+
+
+if __name__ == "__main__":
+    main()
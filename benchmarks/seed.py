@@ -0,0 +1,101 @@
+"""
+Helpers to create and seed a Flaskr database of configurable size for
+benchmarking. Everything is generated server-side with `generate_series`, so
+seeding a million products takes seconds rather than minutes.
+"""
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+from flaskr import POSTGRES_URL
+from flaskr.db import get_db, init_db, rebuild_product_sales
+
+# NOTE: benchmarks use their own database so they never wipe the demo data
+BENCH_URL = str(make_url(POSTGRES_URL).set(database="flaskr_bench"))
+
+# The seeded users all share the password "user"
+PASSWORD_HASH = "pbkdf2:sha256:260000$PGcBy5NzZeDdlu0b$a91ee29eefad98920fe47a6ef4d53b5abffe593300f766f02de041af93ae51f8"
+
+ADJECTIVES = [
+    "red",
+    "blue",
+    "green",
+    "vintage",
+    "modern",
+    "handmade",
+    "organic",
+    "wooden",
+    "steel",
+    "compact",
+]
+NOUNS = [
+    "chair",
+    "lamp",
+    "table",
+    "mug",
+    "jacket",
+    "backpack",
+    "camera",
+    "guitar",
+    "bicycle",
+    "notebook",
+]
+
+
+def ensure_database(url):
+    """Create the database for the given URL, if it doesn't exist yet."""
+    url = make_url(url)
+    engine = create_engine(url.set(database="postgres"), isolation_level="AUTOCOMMIT")
+    with engine.connect() as connection:
+        exists = connection.execute(
+            text("SELECT 1 FROM pg_database WHERE datname = :name"),
+            {"name": url.database},
+        ).scalar()
+        if not exists:
+            connection.execute(text(f'CREATE DATABASE "{url.database}"'))
+    engine.dispose()
+
+
+def seed_db(users=100, products=1000, purchases=1000):
+    """
+    Reinitialize the schema and bulk insert generated users, products and
+    purchases on top of the example rows created by `init_db`.
+
+    Must be called within an app context.
+    """
+    init_db()
+    db = get_db()
+    db.execute(
+        text(
+            "INSERT INTO users (email, password, first_name, last_name)"
+            " SELECT 'user' || i || '@example.com', :password, 'First' || i, 'Last' || i"
+            " FROM generate_series(1, :count) AS i"
+        ),
+        {"password": PASSWORD_HASH, "count": users},
+    )
+    db.execute(
+        text(
+            "INSERT INTO products (seller_id, name, description, price)"
+            " SELECT 1 + i % (SELECT COUNT(*) FROM users),"
+            "  'Product ' || i,"
+            "  (:adjectives)[1 + i % 10] || ' ' || (:nouns)[1 + i / 10 % 10] || ' ' || md5(i::text),"
+            "  (i % 10000) / 100.0"
+            " FROM generate_series(1, :count) AS i"
+        ),
+        {"adjectives": ADJECTIVES, "nouns": NOUNS, "count": products},
+    )
+    db.execute(
+        text(
+            "INSERT INTO purchases (product_id, buyer_id, price, street_1, street_2, city, state, zip)"
+            " SELECT p.id, 1 + i % (SELECT COUNT(*) FROM users), p.price,"
+            "  i || ' Example St', NULL, 'Exampletown', 'NY', lpad((i % 100000)::text, 5, '0')"
+            " FROM generate_series(1, :count) AS i"
+            " JOIN products p ON p.id = 1 + i % (SELECT COUNT(*) FROM products)"
+        ),
+        {"count": purchases},
+    )
+    rebuild_product_sales()
+    db.commit()
+    for table in ("users", "products", "purchases", "product_sales"):
+        db.execute(text(f"ANALYZE {table}"))
+    db.commit()
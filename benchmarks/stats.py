@@ -0,0 +1,20 @@
+"""Small helpers for summarizing benchmark samples."""
+
+import statistics
+
+
+def percentile(samples, q):
+    """Return the q-th percentile (0-100) of the given samples, nearest-rank."""
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q / 100))]
+
+
+def summarize(samples_ms):
+    """Summarize latency samples (in ms) as the percentiles we report."""
+    return {
+        "count": len(samples_ms),
+        "mean_ms": round(statistics.fmean(samples_ms), 3),
+        "p50_ms": round(percentile(samples_ms, 50), 3),
+        "p95_ms": round(percentile(samples_ms, 95), 3),
+        "p99_ms": round(percentile(samples_ms, 99), 3),
+    }
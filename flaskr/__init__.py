@@ -9,14 +9,46 @@ GOOGLE_ANALYTICS_ID = "UA-xxxxxxxxx-y"
 SECRET_KEY = "dev"
 
 
-def create_app(test_config=None):
+def create_app(test_config=None, instance_path=None):
     # create and configure the app
-    app = Flask(__name__, instance_relative_config=True)
+    app = Flask(__name__, instance_path=instance_path, instance_relative_config=True)
     app.config.from_mapping(
         SECRET_KEY=SECRET_KEY,
         SQLALCHEMY_DATABASE_URI=POSTGRES_URL,
         SQLALCHEMY_TRACK_MODIFICATIONS=False,
         GOOGLE_ANALYTICS_ID=GOOGLE_ANALYTICS_ID,
+        # largest request body accepted, e.g. for product imports (16 MB)
+        MAX_CONTENT_LENGTH=16 * 1024 * 1024,
+        # optional read replicas for read-only queries (see flaskr.db.get_db)
+        READ_REPLICA_URLS=[],
+        READ_REPLICA_STICKY_SECONDS=5,
+        READ_REPLICA_RETRY_SECONDS=30,
+        READ_REPLICA_CONNECT_TIMEOUT=2,
+        # purchases are partitioned by month (see flaskr.partitions)
+        PURCHASE_PARTITION_MONTHS_AHEAD=3,
+        PURCHASE_RETENTION_MONTHS=24,
+        PURCHASE_ARCHIVE_DIR=None,
+        # .fides manifests used by `flask fides` (defaults to the repo's)
+        FIDES_DIR=None,
+        # fixed HMAC key for `flask fides erase` (random per batch if unset)
+        ERASURE_HMAC_KEY=None,
+        # seconds to cache product lookups across requests (0 disables)
+        PRODUCT_CACHE_TTL=5,
+        # opt-in request timing & SQL instrumentation (see flaskr.metrics)
+        INSTRUMENTATION=False,
+        INSTRUMENTATION_N_PLUS_ONE_THRESHOLD=5,
+        # opt-in profiling of slow requests (see flaskr.profiler)
+        PROFILING=False,
+        PROFILING_HEADER="X-Flaskr-Profile",
+        # value the header must carry (if unset, it only works in debug mode)
+        PROFILING_SECRET=None,
+        PROFILING_SAMPLE_RATE=0.0,
+        PROFILING_THRESHOLD=0.5,
+        PROFILING_DIR=None,
+        PROFILING_MAX_FILES=100,
+        # cache compiled templates in the instance folder & compile at startup
+        TEMPLATE_BYTECODE_CACHE=True,
+        TEMPLATE_PRECOMPILE=True,
     )
 
     if test_config is None:
@@ -32,6 +64,14 @@ def create_app(test_config=None):
     except OSError:
         pass
 
+    from . import templating
+
+    templating.init_app(app)
+
+    from . import assets
+
+    assets.init_app(app)
+
     # a simple page that says hello
     @app.route("/hello")
     def hello():
@@ -41,6 +81,18 @@ def create_app(test_config=None):
 
     db.init_app(app)
 
+    from . import partitions
+
+    partitions.init_app(app)
+
+    from . import metrics
+
+    metrics.init_app(app)
+
+    from . import profiler
+
+    profiler.init_app(app)
+
     from . import auth
 
     app.register_blueprint(auth.bp)
@@ -54,4 +106,26 @@ def create_app(test_config=None):
 
     app.register_blueprint(purchase.bp)
 
+    from . import dashboard
+
+    app.register_blueprint(dashboard.bp)
+
+    from . import export
+
+    app.register_blueprint(export.bp)
+
+    from . import importer
+
+    importer.init_app(app)
+
+    from . import fides
+
+    fides.init_app(app)
+
+    from . import serve
+
+    serve.init_app(app)
+
+    templating.precompile_templates(app)
+
     return app
@@ -0,0 +1,143 @@
+"""
+Fingerprinted, precompressed static assets.
+
+`flask build-assets` copies every file under the static folder into
+`static/dist/` with a content hash in its name (e.g. `style.3f2a9c1d0b.css`),
+writes gzip and brotli variants of text assets next to it, and records the
+mapping in `static/dist/manifest.json`.
+
+When that manifest exists, it's loaded once at startup: `url_for('static',
+filename='style.css')` then points at the fingerprinted file, which is served
+with far-future immutable caching and in the best encoding the client accepts.
+Without a build, static files are served as usual.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+import click
+from flask import current_app, request, send_from_directory
+from flask.cli import with_appcontext
+
+DIST = "dist"
+MANIFEST = "manifest.json"
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/javascript",
+    "application/json",
+    "image/svg+xml",
+)
+
+# Preferred order when the client accepts several encodings
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+MAX_AGE = 365 * 24 * 60 * 60
+CACHE_CONTROL = f"public, max-age={MAX_AGE}, immutable"
+
+
+def init_app(app):
+    load_manifest(app)
+    app.url_defaults(_fingerprint_static_url)
+    app.view_functions["static"] = send_static_asset
+    app.cli.add_command(build_assets_command)
+
+
+def load_manifest(app):
+    path = os.path.join(app.static_folder, DIST, MANIFEST)
+    manifest = {}
+    if os.path.exists(path):
+        with open(path, "r") as file:
+            manifest = json.load(file)
+    app.extensions["assets"] = {
+        "manifest": manifest,
+        # fingerprinted path -> encodings available for it
+        "encodings": {asset["path"]: asset["encodings"] for asset in manifest.values()},
+    }
+
+
+def _fingerprint_static_url(endpoint, values):
+    if endpoint == "static" and "filename" in values:
+        asset = current_app.extensions["assets"]["manifest"].get(values["filename"])
+        if asset is not None:
+            values["filename"] = asset["path"]
+
+
+def send_static_asset(filename):
+    encodings = current_app.extensions["assets"]["encodings"].get(filename)
+    if encodings is None:
+        return current_app.send_static_file(filename)
+
+    accepted = request.accept_encodings
+    for encoding, suffix in ENCODINGS:
+        if encoding in encodings and accepted[encoding]:
+            response = send_from_directory(
+                current_app.static_folder,
+                filename + suffix,
+                mimetype=mimetypes.guess_type(filename)[0],
+                max_age=MAX_AGE,
+            )
+            response.headers["Content-Encoding"] = encoding
+            break
+    else:
+        response = send_from_directory(
+            current_app.static_folder, filename, max_age=MAX_AGE
+        )
+
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def build_assets(static_folder):
+    """Fingerprint & compress all static files, returning the new manifest."""
+    import brotli
+
+    dist = os.path.join(static_folder, DIST)
+    shutil.rmtree(dist, ignore_errors=True)
+    os.makedirs(dist)
+
+    manifest = {}
+    for root, dirs, files in os.walk(static_folder):
+        if root == static_folder:
+            dirs.remove(DIST)
+        for name in sorted(files):
+            source = os.path.join(root, name)
+            with open(source, "rb") as file:
+                content = file.read()
+
+            relpath = os.path.relpath(source, static_folder).replace(os.sep, "/")
+            stem, ext = os.path.splitext(relpath)
+            digest = hashlib.sha256(content).hexdigest()[:10]
+            path = f"{DIST}/{stem}.{digest}{ext}"
+            target = os.path.join(static_folder, path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "wb") as file:
+                file.write(content)
+
+            encodings = []
+            mimetype = mimetypes.guess_type(name)[0] or ""
+            if mimetype.startswith(COMPRESSIBLE_TYPES):
+                with open(target + ".gz", "wb") as file:
+                    # mtime=0 keeps the output reproducible between builds
+                    file.write(gzip.compress(content, compresslevel=9, mtime=0))
+                with open(target + ".br", "wb") as file:
+                    file.write(brotli.compress(content))
+                encodings = ["br", "gzip"]
+
+            manifest[relpath] = {"path": path, "encodings": encodings}
+
+    with open(os.path.join(dist, MANIFEST), "w") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    return manifest
+
+
+@click.command("build-assets")
+@with_appcontext
+def build_assets_command():
+    """Fingerprint and precompress the static files into static/dist."""
+    manifest = build_assets(current_app.static_folder)
+    load_manifest(current_app)
+    click.echo(f"Built {len(manifest)} assets.")
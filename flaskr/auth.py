@@ -10,10 +10,10 @@ from flask import (
     session,
     url_for,
 )
-from sqlalchemy import text
 from sqlalchemy import exc
 from werkzeug.security import check_password_hash, generate_password_hash
 
+from flaskr import queries
 from flaskr.db import get_db
 
 bp = Blueprint("auth", __name__, url_prefix="/auth")
@@ -40,17 +40,8 @@ def register():
 
         if error is None:
             try:
-                db.execute(
-                    text(
-                        "INSERT INTO users (email, password, first_name, last_name)"
-                        " VALUES (:email, :password, :first_name, :last_name)"
-                    ),
-                    {
-                        "email": email,
-                        "password": generate_password_hash(password),
-                        "first_name": first_name,
-                        "last_name": last_name,
-                    },
+                queries.create_user(
+                    email, generate_password_hash(password), first_name, last_name
                 )
                 db.commit()
             except exc.IntegrityError:
@@ -68,21 +59,17 @@ def login():
     if request.method == "POST":
         email = request.form["email"]
         password = request.form["password"]
-        db = get_db()
         error = None
-        user = db.execute(
-            text("SELECT * FROM users WHERE email = :email"),
-            {"email": email},
-        ).fetchone()
+        user = queries.get_credentials(email)
 
         if user is None:
             error = "Incorrect email."
-        elif not check_password_hash(user["password"], password):
+        elif not check_password_hash(user.password, password):
             error = "Incorrect password."
 
         if error is None:
             session.clear()
-            session["user_id"] = user["id"]
+            session["user_id"] = user.id
             return redirect(url_for("index"))
 
         flash(error)
@@ -97,14 +84,7 @@ def load_logged_in_user():
     if user_id is None:
         g.user = None
     else:
-        g.user = (
-            get_db()
-            .execute(
-                text("SELECT * FROM users WHERE id = :user_id"),
-                {"user_id": user_id},
-            )
-            .fetchone()
-        )
+        g.user = queries.get_user(user_id)
 
 
 @bp.route("/logout")
@@ -0,0 +1,167 @@
+"""
+Client-side metrics for the fidesops API calls made by `flaskr/fidesops.py`.
+
+Every call goes through an `InstrumentedSession`, which records per endpoint
+(method and path, with keys & ids replaced by placeholders) the number of
+calls and failed ones, a latency histogram, and the bytes sent and received.
+Retries, like the health checks repeated while fidesops starts, are counted
+by their callers. `summary()` sorts endpoints by total time spent, to tell
+whether slowness is in dataset uploads, policy upserts or request
+submission, and `prometheus()` exports everything in Prometheus text format.
+
+The session also reuses connections between calls, rather than opening a new
+one per call like the module-level `requests` functions.
+"""
+
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+from flaskr.metrics import LATENCY_BUCKETS, Histogram, histogram_lines
+
+# Path segments following these are keys or ids
+KEY_SEGMENT = re.compile(r"/(user|connection|policy|rule)/[^/]+")
+
+
+def endpoint(method, url):
+    """Return the endpoint label of a call, e.g. `PATCH /api/v1/policy/{policy}/rule`."""
+    path = KEY_SEGMENT.sub(r"/\1/{\1}", urlsplit(url).path)
+    return f"{method.upper()} {path}"
+
+
+COUNTERS = (
+    ("calls", "fidesops_client_requests_total", "fidesops API calls"),
+    ("errors", "fidesops_client_errors_total", "Failed fidesops API calls"),
+    ("retries", "fidesops_client_retries_total", "Retried fidesops API calls"),
+    (
+        "request_bytes",
+        "fidesops_client_request_bytes_total",
+        "Bytes sent in fidesops API request bodies",
+    ),
+    (
+        "response_bytes",
+        "fidesops_client_response_bytes_total",
+        "Bytes received in fidesops API response bodies",
+    ),
+)
+
+
+class EndpointStats:
+    __slots__ = (
+        "calls",
+        "errors",
+        "retries",
+        "latency",
+        "max_latency",
+        "request_bytes",
+        "response_bytes",
+    )
+
+    def __init__(self):
+        self.calls = 0
+        # Calls that raised or got an error response
+        self.errors = 0
+        self.retries = 0
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.max_latency = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+
+class ClientMetrics:
+    """The recorded metrics of API calls, by endpoint."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    def stats(self, name):
+        if name not in self.endpoints:
+            self.endpoints[name] = EndpointStats()
+        return self.endpoints[name]
+
+    def observe(self, name, duration, request_bytes, response_bytes, ok):
+        with self.lock:
+            stats = self.stats(name)
+            stats.calls += 1
+            stats.errors += not ok
+            stats.latency.observe(duration)
+            stats.max_latency = max(stats.max_latency, duration)
+            stats.request_bytes += request_bytes
+            stats.response_bytes += response_bytes
+
+    def retry(self, method, url):
+        """Count a retry of a call to the given URL."""
+        with self.lock:
+            self.stats(endpoint(method, url)).retries += 1
+
+    def summary(self):
+        """Return a table of the endpoints' metrics, slowest in total first."""
+        lines = [
+            f"{'endpoint':<56} {'calls':>6} {'errors':>6} {'retries':>7}"
+            f" {'total s':>8} {'mean ms':>8} {'max ms':>8} {'sent KB':>8}"
+            f" {'recv KB':>8}"
+        ]
+        with self.lock:
+            endpoints = sorted(
+                self.endpoints.items(), key=lambda item: -item[1].latency.sum
+            )
+            for name, stats in endpoints:
+                mean = stats.latency.sum / stats.calls if stats.calls else 0.0
+                lines.append(
+                    f"{name:<56} {stats.calls:>6} {stats.errors:>6}"
+                    f" {stats.retries:>7} {stats.latency.sum:>8.2f}"
+                    f" {mean * 1000:>8.1f} {stats.max_latency * 1000:>8.1f}"
+                    f" {stats.request_bytes / 1024:>8.1f}"
+                    f" {stats.response_bytes / 1024:>8.1f}"
+                )
+        return "\n".join(lines)
+
+    def prometheus(self):
+        """Export the metrics in the Prometheus text format."""
+        lines = []
+        with self.lock:
+            endpoints = sorted(self.endpoints.items())
+            lines.extend(
+                histogram_lines(
+                    "fidesops_client_request_duration_seconds",
+                    "fidesops API call latency",
+                    {name: stats.latency for name, stats in endpoints},
+                )
+            )
+            for attribute, name, description in COUNTERS:
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} counter")
+                for endpoint_name, stats in endpoints:
+                    value = getattr(stats, attribute)
+                    lines.append(f'{name}{{endpoint="{endpoint_name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+class InstrumentedSession(requests.Session):
+    """A session recording the metrics of every call it makes."""
+
+    def __init__(self, metrics):
+        super().__init__()
+        self.metrics = metrics
+
+    def request(self, method, url, *args, **kwargs):
+        name = endpoint(method, url)
+        start = time.perf_counter()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except requests.RequestException:
+            self.metrics.observe(name, time.perf_counter() - start, 0, 0, False)
+            raise
+        body = response.request.body or b""
+        self.metrics.observe(
+            name,
+            time.perf_counter() - start,
+            len(body.encode() if isinstance(body, str) else body),
+            len(response.content),
+            response.ok,
+        )
+        return response
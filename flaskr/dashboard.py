@@ -0,0 +1,18 @@
+from flask import Blueprint, g, render_template
+
+from flaskr import queries
+from flaskr.auth import login_required
+
+bp = Blueprint("dashboard", __name__, url_prefix="/dashboard")
+
+
+@bp.route("/")
+@login_required
+def index():
+    products = queries.list_product_sales(g.user.id)
+    return render_template(
+        "dashboard/index.html",
+        products=products,
+        purchase_count=sum(product.purchase_count for product in products),
+        revenue=sum(product.revenue for product in products),
+    )
@@ -0,0 +1,190 @@
+"""
+Local datamap exports of the `.fides/` manifests, without the fidesctl server.
+
+`flask fides datamap` writes a row per system, privacy declaration and
+dataset field the declaration covers: the fields of its referenced datasets
+with data categories under the declaration's. Declarations that don't
+reference a dataset get a row per data category instead. Each row carries
+the organization's contacts, the system's details and the names, legal
+basis and recipients of the declaration's data use and subjects from the
+taxonomy.
+
+Rows are generated one at a time and written as they are, to CSV or to
+XLSX with openpyxl's write-only mode, so memory use doesn't grow with the
+number of systems.
+"""
+
+import csv
+import os
+
+import click
+
+from flaskr.fides import fides_cli, load_manifests
+from flaskr.taxonomy import dataset_fields, get_taxonomy
+
+COLUMNS = (
+    "Organization",
+    "Controller",
+    "Data Protection Officer",
+    "System",
+    "System Description",
+    "System Type",
+    "Department",
+    "Third Country Transfers",
+    "DPIA Required",
+    "DPIA Progress",
+    "Privacy Declaration",
+    "Data Use",
+    "Purpose of Processing",
+    "Legal Basis",
+    "Special Category",
+    "Recipients",
+    "Data Subjects",
+    "Data Qualifier",
+    "Dataset",
+    "Collection",
+    "Field",
+    "Data Categories",
+    "Retention",
+)
+
+
+def contact_name(contact):
+    return (contact or {}).get("name") or ""
+
+
+def join(values):
+    return ", ".join(values or ())
+
+
+def datamap_rows(resources, taxonomy):
+    """Yield the datamap's rows, as tuples of `COLUMNS`."""
+    organizations = {
+        organization["fides_key"]: organization
+        for organization in resources.get("organization", [])
+    }
+    datasets = {
+        dataset["fides_key"]: (dataset, list(dataset_fields(dataset)))
+        for dataset in resources.get("dataset", [])
+    }
+    data_uses = taxonomy.resources["data_use"]
+    data_subjects = taxonomy.resources["data_subject"]
+
+    for system in resources.get("system", []):
+        organization = organizations.get(
+            system.get("organization_fides_key", "default_organization"), {}
+        )
+        impact_assessment = system.get("data_protection_impact_assessment") or {}
+        system_columns = (
+            organization.get("name") or "",
+            contact_name(organization.get("controller")),
+            contact_name(organization.get("data_protection_officer")),
+            system.get("name") or system["fides_key"],
+            system.get("description") or "",
+            system.get("system_type") or "",
+            system.get("administrating_department") or "",
+            join(system.get("third_country_transfers")),
+            "Yes" if impact_assessment.get("is_required") else "No",
+            impact_assessment.get("progress") or "",
+        )
+
+        for declaration in system.get("privacy_declarations") or ():
+            data_use = data_uses.get(declaration["data_use"], {})
+            declaration_columns = (
+                declaration.get("name") or "",
+                declaration["data_use"],
+                data_use.get("name") or "",
+                data_use.get("legal_basis") or "",
+                data_use.get("special_category") or "",
+                join(data_use.get("recipients")),
+                join(
+                    data_subjects.get(subject, {}).get("name") or subject
+                    for subject in declaration["data_subjects"]
+                ),
+                declaration.get("data_qualifier") or "",
+            )
+            categories = declaration["data_categories"]
+            references = declaration.get("dataset_references") or ()
+            if not references:
+                for category in categories:
+                    yield (
+                        *system_columns,
+                        *declaration_columns,
+                        "",
+                        "",
+                        "",
+                        category,
+                        "",
+                    )
+                continue
+
+            mask = taxonomy.data_category.mask(categories)
+            for reference in references:
+                if reference not in datasets:
+                    raise ValueError(
+                        f"{system['fides_key']} references unknown dataset"
+                        f" {reference}."
+                    )
+                dataset, fields = datasets[reference]
+                for path, field_categories in fields:
+                    matched = taxonomy.data_category.match(field_categories, mask)
+                    if not matched:
+                        continue
+                    _, collection, field = path.split(".", 2)
+                    yield (
+                        *system_columns,
+                        *declaration_columns,
+                        dataset.get("name") or reference,
+                        collection,
+                        field,
+                        join(matched),
+                        dataset.get("retention") or "",
+                    )
+
+
+def write_csv(rows, path):
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(COLUMNS)
+        writer.writerows(rows)
+
+
+def write_xlsx(rows, path):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Datamap")
+    sheet.append(COLUMNS)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+
+
+WRITERS = {"csv": write_csv, "xlsx": write_xlsx}
+
+
+@fides_cli.command("datamap")
+@click.option(
+    "--output",
+    default="fides_tmp/datamap.csv",
+    show_default=True,
+    type=click.Path(dir_okay=False),
+)
+@click.option(
+    "--format", type=click.Choice(sorted(WRITERS)), help="Guessed from --output."
+)
+def datamap_command(output, format):
+    """Export the datamap of the .fides/ manifests to CSV or XLSX."""
+    if format is None:
+        format = os.path.splitext(output)[1].lstrip(".").lower()
+        if format not in WRITERS:
+            raise click.UsageError(f"Can't guess the format of {output}.")
+
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    try:
+        WRITERS[format](datamap_rows(load_manifests(), get_taxonomy()), output)
+    except ValueError as error:
+        raise click.ClickException(str(error))
+    click.echo(output)
@@ -1,22 +1,101 @@
+import itertools
+import logging
+import threading
+import time
+
 import click
-from flask import current_app, g
+from flask import current_app, g, has_request_context, session
 from flask.cli import with_appcontext
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import text
+from sqlalchemy import create_engine, event, exc, text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
 
 _db = SQLAlchemy()
 
 
-def get_db():
+def get_db(readonly=False):
+    """
+    Return the database session for the current request.
+
+    Pass `readonly=True` for queries that may be served by a read replica, if
+    any are configured in `READ_REPLICA_URLS`. Reads stay on the primary for
+    `READ_REPLICA_STICKY_SECONDS` after this user's last commit, so they
+    always see their own writes, and whenever no replica is reachable.
+    """
+    if not readonly or not current_app.extensions["db_replicas"]:
+        return _db.session
+    if "replica_db" not in g:
+        g.replica_db = _replica_session()
+    return g.replica_db
+
+
+def _replica_session():
+    # Outside of requests (e.g. CLI commands), there's no user to stick to
+    if has_request_context() and session.get("db_primary_until", 0) > time.time():
+        return _db.session
+
+    state = current_app.extensions["db_replicas"]
+    replicas = state["replicas"]
+    now = time.monotonic()
+    start = next(state["counter"])
+    # Round-robin over the replicas, skipping any that recently failed
+    for i in range(len(replicas)):
+        replica = replicas[(start + i) % len(replicas)]
+        if replica["down_until"] > now:
+            continue
+        replica_session = Session(bind=replica["engine"])
+        try:
+            # Checking out a connection pings it, which doubles as a health check
+            replica_session.connection()
+        except exc.OperationalError:
+            replica_session.close()
+            with state["lock"]:
+                replica["down_until"] = (
+                    now + current_app.config["READ_REPLICA_RETRY_SECONDS"]
+                )
+            logger.warning(f"Read replica {replica['engine'].url!r} is unavailable")
+            continue
+        return replica_session
+
     return _db.session
 
 
+def _close_replica_session(exception=None):
+    replica_db = g.pop("replica_db", None)
+    if replica_db is not None and replica_db is not _db.session:
+        replica_db.close()
+
+
+def _stick_to_primary(db_session):
+    # Route this user's reads to the primary for a while after any commit, so
+    # the page they're redirected to never lags behind what they just wrote
+    if has_request_context() and current_app.extensions["db_replicas"]:
+        session["db_primary_until"] = (
+            time.time() + current_app.config["READ_REPLICA_STICKY_SECONDS"]
+        )
+        _close_replica_session()
+
+
+def get_engines(app):
+    """Return the primary engine and every read replica engine for the app."""
+    with app.app_context():
+        engines = [_db.engine]
+    if app.extensions["db_replicas"]:
+        engines += [
+            replica["engine"] for replica in app.extensions["db_replicas"]["replicas"]
+        ]
+    return engines
+
+
 def init_db():
     db = get_db()
 
     # Initialize our schema, one statement at a time (SQLAlchemy doesn't play
     # nice with multi-statement SQL)
     statements = [
+        "DROP TABLE IF EXISTS product_sales;",
         "DROP TABLE IF EXISTS purchases;",
         "DROP TABLE IF EXISTS products;",
         "DROP TABLE IF EXISTS users;",
@@ -38,22 +117,45 @@ def init_db():
             name TEXT UNIQUE NOT NULL,
             description TEXT NOT NULL,
             price REAL NOT NULL,
+            search_vector TSVECTOR GENERATED ALWAYS AS (
+                to_tsvector('english', name || ' ' || description)
+            ) STORED,
             FOREIGN KEY (seller_id) REFERENCES users (id)
         );
         """,
+        "CREATE INDEX products_search_vector_idx ON products USING GIN (search_vector);",
+        "CREATE INDEX products_seller_id_idx ON products (seller_id);",
+        "CREATE INDEX products_created_at_idx ON products (created_at);",
         """
         CREATE TABLE purchases (
-            id SERIAL PRIMARY KEY,
+            id SERIAL,
             created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
             product_id INTEGER NOT NULL,
             buyer_id INTEGER NOT NULL,
+            -- The product's price at the time of purchase
+            price REAL NOT NULL,
             street_1 TEXT,
             street_2 TEXT,
             city TEXT,
             state TEXT,
             zip TEXT,
+            PRIMARY KEY (id, created_at),
             FOREIGN KEY (product_id) REFERENCES products (id),
             FOREIGN KEY (buyer_id) REFERENCES users (id)
+        ) PARTITION BY RANGE (created_at);
+        """,
+        # Monthly partitions are added by create_purchase_partitions below
+        "CREATE TABLE purchases_default PARTITION OF purchases DEFAULT;",
+        # Per-product sales counters, maintained by purchase.create in the
+        # same transaction as each purchase (see queries.record_sale)
+        """
+        CREATE TABLE product_sales (
+            product_id INTEGER PRIMARY KEY,
+            seller_id INTEGER NOT NULL,
+            purchase_count INTEGER NOT NULL,
+            revenue REAL NOT NULL,
+            FOREIGN KEY (product_id) REFERENCES products (id) ON DELETE CASCADE,
+            FOREIGN KEY (seller_id) REFERENCES users (id)
         );
         """,
         """
@@ -73,18 +175,42 @@ def init_db():
         ;
         """,
         """
-        INSERT INTO purchases (created_at, product_id, buyer_id, street_1, street_2, city, state, zip)
+        INSERT INTO purchases (created_at, product_id, buyer_id, price, street_1, street_2, city, state, zip)
         VALUES
-            ('2020-01-04 12:00:00', 1, 2, '123 Example St', 'Apt 123', 'Exampletown', 'NY', '12345'),
-            ('2020-01-06 12:00:00', 1, 3, '101 Example Ave', 'Suite 202', 'Exampletown', 'NY', '12345')
+            ('2020-01-04 12:00:00', 1, 2, '10.00', '123 Example St', 'Apt 123', 'Exampletown', 'NY', '12345'),
+            ('2020-01-06 12:00:00', 1, 3, '10.00', '101 Example Ave', 'Suite 202', 'Exampletown', 'NY', '12345')
         ;
         """,
     ]
     for statement in statements:
         db.execute(text(statement))
+
+    from flaskr.partitions import create_purchase_partitions
+
+    create_purchase_partitions(current_app.config["PURCHASE_PARTITION_MONTHS_AHEAD"])
+    rebuild_product_sales()
     db.commit()
 
 
+def rebuild_product_sales():
+    """
+    Recompute all sales counters from scratch, e.g. after a bulk load.
+
+    Revenue sums the prices purchases were made at, like record_sale, so the
+    result matches the incremental counters even after price changes.
+    """
+    db = get_db()
+    db.execute(text("DELETE FROM product_sales"))
+    db.execute(
+        text(
+            "INSERT INTO product_sales (product_id, seller_id, purchase_count, revenue)"
+            " SELECT p.id, p.seller_id, COUNT(*), SUM(pu.price)"
+            " FROM purchases pu JOIN products p ON pu.product_id = p.id"
+            " GROUP BY p.id"
+        )
+    )
+
+
 @click.command("init-db")
 @with_appcontext
 def init_db_command():
@@ -96,3 +222,28 @@ def init_db_command():
 def init_app(app):
     _db.init_app(app)
     app.cli.add_command(init_db_command)
+
+    app.extensions["db_replicas"] = None
+    if app.config["READ_REPLICA_URLS"]:
+        options = app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {})
+        options = {
+            **options,
+            "pool_pre_ping": True,
+            # Fall back to the primary quickly when a replica is unreachable,
+            # rather than after the OS's TCP timeout
+            "connect_args": {
+                **options.get("connect_args", {}),
+                "connect_timeout": app.config["READ_REPLICA_CONNECT_TIMEOUT"],
+            },
+        }
+        app.extensions["db_replicas"] = {
+            "lock": threading.Lock(),
+            "counter": itertools.count(),
+            "replicas": [
+                {"engine": create_engine(url, **options), "down_until": 0}
+                for url in app.config["READ_REPLICA_URLS"]
+            ],
+        }
+        app.teardown_appcontext(_close_replica_session)
+        if not event.contains(_db.session, "after_commit", _stick_to_primary):
+            event.listen(_db.session, "after_commit", _stick_to_primary)
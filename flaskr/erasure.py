@@ -0,0 +1,155 @@
+"""
+Bulk erasure of data subjects, run directly against flaskr's database.
+
+fidesops erases one subject per privacy request, walking the dataset a
+collection at a time and updating matching rows one by one. To work through a
+backlog, `flask fides erase` does the same masking for a whole batch of
+emails at once: it follows `flaskr_postgres_dataset` from the `email`
+identity, selects every row of each collection for the whole batch in one
+query, and masks the fields in the target data categories with one
+`UPDATE ... FROM (VALUES ...)` per collection, all in a single transaction.
+
+Values are masked like fidesops' `hmac` strategy: the hex HMAC-SHA256 of the
+value plus a salt. Unless `ERASURE_HMAC_KEY` is set, a random key and salt
+are used for each batch, so masked values can't be linked across batches.
+"""
+
+import hashlib
+import hmac
+import secrets
+
+import click
+from flask import current_app
+from psycopg2.extras import execute_values
+from sqlalchemy import text
+
+from flaskr.db import get_db
+from flaskr.fides import fides_cli, load_dataset, targeted_traversal
+
+# The targets of fidesops' default_erasure_policy (see flaskr/fidesops.py)
+DEFAULT_ERASURE_CATEGORIES = ("user.contact", "user.name")
+
+
+def hmac_mask(value, key, salt):
+    if value is None:
+        return None
+    return hmac.new(key, (str(value) + salt).encode(), hashlib.sha256).hexdigest()
+
+
+def erasure_plan(dataset, categories, identity="email"):
+    """Return the (collection, edges, masked fields) of each collection to visit."""
+    plan = []
+    for collection, edges, fields in targeted_traversal(dataset, categories, identity):
+        # Primary keys are never masked, as fidesops needs them to update rows
+        masked = [name for name in fields if not collection.fields[name].primary_key]
+        if masked and collection.primary_key is None:
+            raise ValueError(f"Can't mask {collection.name} without a primary key.")
+        for name in masked:
+            data_type = collection.fields[name].data_type
+            if data_type not in (None, "string"):
+                raise ValueError(
+                    f"Can't HMAC mask {collection.name}.{name} of type {data_type}."
+                )
+        plan.append((collection, edges, masked))
+    return plan
+
+
+def erase(emails, categories=DEFAULT_ERASURE_CATEGORIES, dataset=None):
+    """
+    Mask the data in `categories` of every subject with one of `emails`.
+
+    Returns the number of rows masked per collection. The caller commits.
+    """
+    if dataset is None:
+        dataset = load_dataset()
+    key = current_app.config["ERASURE_HMAC_KEY"]
+    if key is None:
+        key, salt = secrets.token_bytes(32), secrets.token_hex(16)
+    else:
+        key, salt = key.encode(), ""
+
+    db = get_db()
+    plan = erasure_plan(dataset, categories)
+    # (collection, field) -> values selecting rows downstream of it
+    values = {(None, "email"): list(emails)}
+    # source (collection, field) pairs that later steps select rows by
+    sources = {(source, field) for _, edges, _ in plan for _, source, field in edges}
+    counts = {}
+
+    for collection, edges, masked in plan:
+        pk = collection.primary_key
+        outputs = sorted(
+            field for source, field in sources if source == collection.name
+        )
+        columns = list(dict.fromkeys([pk, *outputs, *masked]))
+
+        params = {}
+        conditions = []
+        for i, (field, source, source_field) in enumerate(edges):
+            if values.get((source, source_field)):
+                params[f"values_{i}"] = values[(source, source_field)]
+                conditions.append(f"{field} = ANY(:values_{i})")
+        rows = []
+        if conditions:
+            rows = db.execute(
+                text(
+                    f"SELECT {', '.join(columns)} FROM {collection.name}"
+                    f" WHERE {' OR '.join(conditions)} FOR UPDATE"
+                ),
+                params,
+            ).fetchall()
+
+        for field in outputs:
+            index = columns.index(field)
+            values[(collection.name, field)] = list(
+                {row[index] for row in rows if row[index] is not None}
+            )
+
+        if masked and rows:
+            indexes = [columns.index(field) for field in masked]
+            cursor = db.connection().connection.cursor()
+            try:
+                execute_values(
+                    cursor,
+                    f"UPDATE {collection.name} AS t SET "
+                    + ", ".join(f"{field} = v.{field}" for field in masked)
+                    + f" FROM (VALUES %s) AS v({pk}, {', '.join(masked)})"
+                    f" WHERE t.{pk} = v.{pk}",
+                    [
+                        (row[0], *(hmac_mask(row[i], key, salt) for i in indexes))
+                        for row in rows
+                    ],
+                    page_size=len(rows),
+                )
+            finally:
+                cursor.close()
+        counts[collection.name] = len(rows) if masked else 0
+
+    return counts
+
+
+@fides_cli.command("erase")
+@click.argument("emails", nargs=-1)
+@click.option(
+    "--file",
+    type=click.File("r"),
+    help="Read emails from a file too, one per line.",
+)
+@click.option(
+    "--category",
+    "categories",
+    multiple=True,
+    help="Data category to mask (repeatable). Defaults to user.contact & user.name.",
+)
+def erase_command(emails, file, categories):
+    """Mask the personal data of every user with one of the given EMAILS."""
+    emails = list(emails)
+    if file is not None:
+        emails += [line.strip() for line in file if line.strip()]
+    if not emails:
+        raise click.UsageError("No emails given.")
+
+    counts = erase(emails, categories or DEFAULT_ERASURE_CATEGORIES)
+    get_db().commit()
+    for collection, count in counts.items():
+        click.echo(f"{collection}: masked {count} rows")
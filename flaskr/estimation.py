@@ -0,0 +1,206 @@
+"""
+Cost estimates of running privacy requests against flaskr's database.
+
+fidesops answers a privacy request by walking `flaskr_postgres_dataset` from
+the request's identity, looking up each reachable collection's rows by the
+values found upstream of it. `flask fides estimate` plans those lookups for
+a whole batch of identities, without running them: each collection's lookup
+is explained with `EXPLAIN (FORMAT JSON)`, selecting the rows matching its
+upstream lookups (nested as subqueries) from the batch's identities. It
+reports the planner's estimated rows and cost per collection and for the
+batch, and flags lookups that would scan a table sequentially or lack an
+index on the fields they look rows up by.
+
+Costs are in the planner's arbitrary units. A collection's cost is that of
+the scans of its table in its lookup, times the times they're repeated on
+the inner side of nested loops; upstream lookups and joins aren't counted,
+so collections' costs add up to the batch's.
+
+Lookups are planned on the primary, even when read replicas are configured:
+a replica's statistics and indexes can lag behind the primary's, while
+privacy requests run against the primary.
+"""
+
+import click
+from sqlalchemy import text
+
+from flaskr.access import DEFAULT_ACCESS_CATEGORIES
+from flaskr.db import get_db
+from flaskr.fides import fides_cli, load_dataset, matches_category, traversal
+
+# The leading column of every index, by table (partitioned or not)
+INDEXED_COLUMNS = text("""
+    SELECT t.relname, a.attname
+    FROM pg_index i
+    JOIN pg_class t ON t.oid = i.indrelid
+    JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+    WHERE t.relnamespace = to_regnamespace(current_schema())
+    """)
+
+# The partitions of each partitioned table, which plans scan instead of it
+PARTITIONS = text("""
+    SELECT c.relname, p.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    JOIN pg_class p ON p.oid = i.inhparent
+    WHERE p.relnamespace = to_regnamespace(current_schema())
+    """)
+
+SCAN_TYPES = (
+    "Seq Scan",
+    "Index Scan",
+    "Index Only Scan",
+    "Bitmap Heap Scan",
+    "Tid Scan",
+)
+
+
+class Estimate:
+    __slots__ = (
+        "collection",
+        "fields",
+        "targeted",
+        "rows",
+        "cost",
+        "scans",
+        "unindexed",
+    )
+
+    def __init__(self, collection, fields, targeted, rows, cost, scans, unindexed):
+        self.collection = collection
+        # The fields rows are looked up by
+        self.fields = fields
+        # Whether the collection has fields in the request's data categories
+        self.targeted = targeted
+        self.rows = rows
+        self.cost = cost
+        # The scan node types planned on the collection's table
+        self.scans = scans
+        self.unindexed = unindexed
+
+    @property
+    def sequential(self):
+        return "Seq Scan" in self.scans
+
+
+def lookup_queries(dataset, identity="email"):
+    """
+    Return the `(collection, edges, query)` of each collection's lookup.
+
+    Queries take the batch's identities as an `:identities` array, and
+    select the rows fidesops would find for them.
+    """
+    queries = {}
+    lookups = []
+    for collection, edges in traversal(dataset, identity):
+        conditions = []
+        for field, source, source_field in edges:
+            if source is None:
+                conditions.append(f"{field} = ANY(:identities)")
+            else:
+                conditions.append(
+                    f"{field} IN (SELECT {source_field} FROM ({queries[source]})"
+                    f" AS {source})"
+                )
+        query = f"SELECT * FROM {collection.name} WHERE {' OR '.join(conditions)}"
+        queries[collection.name] = query
+        lookups.append((collection, edges, query))
+    return lookups
+
+
+def plan_nodes(plan, loops=1):
+    """Yield the `(node, loops)` of a plan's nodes, with their estimated loops."""
+    yield plan, loops
+    children = plan.get("Plans", ())
+    for i, child in enumerate(children):
+        # A nested loop runs its inner side once per outer row
+        if plan["Node Type"] == "Nested Loop" and i == 1:
+            yield from plan_nodes(child, loops * children[0]["Plan Rows"])
+        else:
+            yield from plan_nodes(child, loops)
+
+
+def estimate(identities, categories=DEFAULT_ACCESS_CATEGORIES, dataset=None):
+    """Return an `Estimate` per collection looked up for the identities."""
+    if dataset is None:
+        dataset = load_dataset()
+    db = get_db()
+    indexed = {tuple(row) for row in db.execute(INDEXED_COLUMNS)}
+    parents = {partition: parent for partition, parent in db.execute(PARTITIONS)}
+
+    def table(relation):
+        while relation in parents:
+            relation = parents[relation]
+        return relation
+
+    estimates = []
+    for collection, edges, query in lookup_queries(dataset):
+        plan = db.execute(
+            text(f"EXPLAIN (FORMAT JSON) {query}"),
+            {"identities": list(identities)},
+        ).scalar()[0]["Plan"]
+        scans = [
+            (node, loops)
+            for node, loops in plan_nodes(plan)
+            if node["Node Type"] in SCAN_TYPES
+            and table(node.get("Relation Name")) == collection.name
+        ]
+        fields = list(dict.fromkeys(field for field, _, _ in edges))
+        estimates.append(
+            Estimate(
+                collection.name,
+                fields,
+                any(
+                    matches_category(category, categories)
+                    for field in collection.fields.values()
+                    for category in field.data_categories
+                ),
+                plan["Plan Rows"],
+                sum(node["Total Cost"] * loops for node, loops in scans),
+                sorted({node["Node Type"] for node, _ in scans}),
+                [field for field in fields if (collection.name, field) not in indexed],
+            )
+        )
+    return estimates
+
+
+@fides_cli.command("estimate")
+@click.argument("emails", nargs=-1)
+@click.option(
+    "--file",
+    type=click.File("r"),
+    help="Read emails from a file too, one per line.",
+)
+@click.option(
+    "--category",
+    "categories",
+    multiple=True,
+    help="Data category the requests target (repeatable). Defaults to user.contact & user.name.",
+)
+def estimate_command(emails, file, categories):
+    """Estimate the database load of privacy requests for the given EMAILS."""
+    emails = list(emails)
+    if file is not None:
+        emails += [line.strip() for line in file if line.strip()]
+    if not emails:
+        raise click.UsageError("No emails given.")
+
+    estimates = estimate(emails, categories or DEFAULT_ACCESS_CATEGORIES)
+    click.echo(f"{'collection':<16} {'lookup':<20} {'rows':>10} {'cost':>12}  scans")
+    for e in estimates:
+        name = e.collection + ("*" if e.targeted else "")
+        click.echo(
+            f"{name:<16} {', '.join(e.fields):<20} {e.rows:>10} {e.cost:>12.1f}"
+            f"  {', '.join(e.scans)}"
+        )
+    click.echo(
+        f"{'total':<37} {sum(e.rows for e in estimates):>10}"
+        f" {sum(e.cost for e in estimates):>12.1f}"
+    )
+    click.echo(f"(* has data in {', '.join(categories or DEFAULT_ACCESS_CATEGORIES)})")
+
+    for e in estimates:
+        if e.sequential:
+            click.echo(f"Warning: {e.collection} would be scanned sequentially.")
+        for field in e.unindexed:
+            click.echo(f"Warning: no index on {e.collection}.{field}.")
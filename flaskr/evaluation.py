@@ -0,0 +1,280 @@
+"""
+Offline, incremental evaluation of the `.fides/` manifests against their
+policies, instead of `fidesctl evaluate --dry .fides` and its server.
+
+Like fidesctl, every privacy declaration of every system is checked against
+every policy rule, along with the data categories of the datasets the
+declaration references. Results are cached per declaration, keyed by a
+hash of everything its evaluation depends on: the declaration itself, the
+referenced datasets' categories and the policies. Manifests are only parsed
+again when their content changes, and a change to the extended taxonomy
+recompiles it and drops the cache. Re-evaluating after editing one file
+then only checks the declarations it affects, so `flask fides evaluate
+--watch` can run on every save.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+import click
+import yaml
+from flask import current_app
+
+from flaskr.fides import fides_cli
+from flaskr.taxonomy import (
+    DEFAULT_QUALIFIER,
+    TAXONOMY,
+    compile_policy,
+    dataset_fields,
+    load_taxonomy,
+)
+
+
+class Violation:
+    __slots__ = (
+        "policy",
+        "rule",
+        "system",
+        "declaration",
+        "dataset",
+        "data_categories",
+    )
+
+    def __init__(self, policy, rule, system, declaration, dataset, data_categories):
+        self.policy = policy
+        self.rule = rule
+        self.system = system
+        self.declaration = declaration
+        # The referenced dataset whose categories violate the rule, or None
+        # for the declaration's own categories
+        self.dataset = dataset
+        self.data_categories = data_categories
+
+    def __str__(self):
+        source = f" (dataset {self.dataset})" if self.dataset else ""
+        return (
+            f"{self.system}: {self.declaration!r}{source} violates"
+            f" {self.policy}.{self.rule} with {', '.join(self.data_categories)}"
+        )
+
+
+def digest(value):
+    """Return the hash of a JSON-serializable value's content."""
+    content = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class Evaluator:
+    """Evaluates the manifests in a directory, reusing unchanged results."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        # path -> (content hash, resources)
+        self.manifests = {}
+        self.taxonomy = None
+        self.taxonomy_hash = None
+        # declaration hash -> [Violation]
+        self.results = {}
+        # declarations evaluated (rather than cached) by the last run
+        self.evaluated = 0
+
+    def load(self):
+        """Return the manifests' resources keyed by type, parsing changed files."""
+        manifests = {}
+        resources = {}
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith((".yml", ".yaml")):
+                continue
+            path = os.path.join(self.directory, name)
+            with open(path, "rb") as file:
+                content = file.read()
+            content_hash = hashlib.sha256(content).hexdigest()
+            manifest = self.manifests.get(path)
+            if manifest is None or manifest[0] != content_hash:
+                manifest = (content_hash, yaml.safe_load(content) or {})
+            manifests[path] = manifest
+            for resource_type, items in manifest[1].items():
+                resources.setdefault(resource_type, []).extend(items or ())
+        self.manifests = manifests
+        return resources
+
+    def evaluate(self):
+        """Return the violations of every system's declarations, in order."""
+        resources = self.load()
+        taxonomy_path = os.path.join(self.directory, TAXONOMY)
+        taxonomy_hash = self.manifests.get(taxonomy_path, (None,))[0]
+        if self.taxonomy is None or taxonomy_hash != self.taxonomy_hash:
+            self.taxonomy = load_taxonomy(taxonomy_path)
+            self.taxonomy_hash = taxonomy_hash
+            self.results = {}
+
+        policies = resources.get("policy", [])
+        policies_hash = digest(policies)
+        rules = [
+            (policy["fides_key"], compile_policy(policy, self.taxonomy))
+            for policy in policies
+        ]
+        # fides_key -> (data categories, data qualifier)
+        datasets = {
+            dataset["fides_key"]: (
+                sorted(
+                    {
+                        category
+                        for _, categories in dataset_fields(dataset)
+                        for category in categories
+                    }
+                ),
+                dataset.get("data_qualifier") or DEFAULT_QUALIFIER,
+            )
+            for dataset in resources.get("dataset", [])
+        }
+
+        results = {}
+        violations = []
+        self.evaluated = 0
+        for system in resources.get("system", []):
+            for declaration in system.get("privacy_declarations") or ():
+                references = declaration.get("dataset_references") or []
+                for reference in references:
+                    if reference not in datasets:
+                        raise ValueError(
+                            f"{system['fides_key']} references unknown dataset"
+                            f" {reference}."
+                        )
+                key = digest(
+                    [
+                        policies_hash,
+                        system["fides_key"],
+                        declaration,
+                        [datasets[reference] for reference in references],
+                    ]
+                )
+                if key not in results:
+                    if key in self.results:
+                        results[key] = self.results[key]
+                    else:
+                        results[key] = self.evaluate_declaration(
+                            system["fides_key"], declaration, rules, datasets
+                        )
+                        self.evaluated += 1
+                violations.extend(results[key])
+        self.results = results
+        return violations
+
+    def evaluate_declaration(self, system, declaration, rules, datasets):
+        # The declaration itself, then one per referenced dataset, with the
+        # dataset's categories & qualifier
+        sources = [(None, declaration)]
+        for reference in declaration.get("dataset_references") or ():
+            categories, qualifier = datasets[reference]
+            sources.append(
+                (
+                    reference,
+                    {
+                        **declaration,
+                        "data_categories": categories,
+                        "data_qualifier": qualifier,
+                    },
+                )
+            )
+
+        violations = []
+        for policy, policy_rules in rules:
+            for rule in policy_rules:
+                for dataset, source in sources:
+                    categories = rule.violations(source)
+                    if categories:
+                        violations.append(
+                            Violation(
+                                policy,
+                                rule.fides_key,
+                                system,
+                                declaration.get("name"),
+                                dataset,
+                                categories,
+                            )
+                        )
+        return violations
+
+
+def run_evaluation(evaluator):
+    """Evaluate & print the results, returning whether the manifests passed."""
+    start = time.perf_counter()
+    try:
+        violations = evaluator.evaluate()
+    except (ValueError, yaml.YAMLError) as error:
+        click.echo(f"Evaluation error: {error}", err=True)
+        return False
+    elapsed = (time.perf_counter() - start) * 1000
+
+    for violation in violations:
+        click.echo(violation)
+    status = f"{len(violations)} violations" if violations else "passed"
+    click.echo(
+        f"Evaluation {status} ({evaluator.evaluated} of {len(evaluator.results)}"
+        f" declarations evaluated in {elapsed:.1f}ms)"
+    )
+    return not violations
+
+
+def reevaluate(evaluator):
+    """
+    Run the evaluation again after the manifests changed, for `--watch`.
+
+    Manifests being edited can be malformed in ways the evaluation doesn't
+    check for, or vanish while they're read, so any error is logged instead
+    of stopping the watch.
+    """
+    try:
+        return run_evaluation(evaluator)
+    except Exception:
+        current_app.logger.exception("Evaluation failed, waiting for changes")
+        return False
+
+
+@fides_cli.command("evaluate")
+@click.option(
+    "--watch",
+    is_flag=True,
+    help="Evaluate again whenever the manifests change, until interrupted.",
+)
+def evaluate_command(watch):
+    """Evaluate the .fides/ manifests against their policies."""
+    evaluator = Evaluator(current_app.config["FIDES_DIR"])
+    passed = run_evaluation(evaluator)
+    if not watch:
+        if not passed:
+            click.get_current_context().exit(1)
+        return
+
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+
+    changed = threading.Event()
+
+    class Handler(FileSystemEventHandler):
+        # Not on_any_event, which also fires when the manifests are read
+        def on_created(self, event):
+            changed.set()
+
+        on_modified = on_deleted = on_moved = on_created
+
+    observer = Observer()
+    observer.schedule(Handler(), evaluator.directory)
+    observer.start()
+    click.echo(f"Watching {evaluator.directory} for changes...")
+    try:
+        while True:
+            changed.wait()
+            # Let editors finish writing (e.g. save via a temporary file)
+            time.sleep(0.05)
+            changed.clear()
+            reevaluate(evaluator)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        observer.stop()
+        observer.join()
@@ -0,0 +1,97 @@
+"""
+Bulk export of the product catalog, for partners to sync from.
+
+`/products.ndjson` and `/products.csv` stream every product, oldest first,
+straight from a server-side cursor, so neither the database driver nor the
+app ever holds more than one batch of rows. Pass `since=<created_at>` (ISO
+8601) to only export products created after a previous export's last one.
+The response is gzipped as it's streamed when the client accepts it.
+"""
+
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+
+from flask import Blueprint, Response, request, stream_with_context
+from werkzeug.exceptions import abort
+
+from flaskr import queries
+
+bp = Blueprint("export", __name__)
+
+# Rows fetched from the database (and written to the response) at a time
+EXPORT_BATCH_SIZE = 1000
+
+
+def _ndjson(batches):
+    for batch in batches:
+        yield "".join(
+            json.dumps(dict(zip(queries.EXPORT_COLUMNS, row)), default=_isoformat)
+            + "\n"
+            for row in batch
+        )
+
+
+def _csv(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(queries.EXPORT_COLUMNS)
+    for batch in batches:
+        writer.writerows(
+            [
+                value.isoformat() if isinstance(value, datetime) else value
+                for value in row
+            ]
+            for row in batch
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def _isoformat(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Can't export {type(value).__name__} values")
+
+
+def _gzip(chunks):
+    # wbits=31 writes a gzip (rather than zlib) header & trailer
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        # Flush every batch, so the client receives data as it's produced
+        yield compressor.compress(chunk.encode()) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def _export(serialize, mimetype, extension):
+    since = request.args.get("since")
+    if since:
+        try:
+            since = datetime.fromisoformat(since)
+        except ValueError:
+            abort(400, f"Invalid since timestamp {since}.")
+
+    # NOTE: stream_with_context keeps the request, and with it the database
+    # session & cursor, open until the whole response has been sent
+    chunks = serialize(queries.export_products(EXPORT_BATCH_SIZE, since=since or None))
+    headers = {
+        "Content-Disposition": f"attachment; filename=products.{extension}",
+        "Vary": "Accept-Encoding",
+    }
+    if request.accept_encodings["gzip"]:
+        chunks = _gzip(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
+
+@bp.route("/products.ndjson")
+def products_ndjson():
+    return _export(_ndjson, "application/x-ndjson", "ndjson")
+
+
+@bp.route("/products.csv")
+def products_csv():
+    return _export(_csv, "text/csv", "csv")
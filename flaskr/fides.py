@@ -0,0 +1,220 @@
+"""
+The Fides manifests in `.fides/`, loaded for privacy tooling that runs
+directly against flaskr's own database instead of through fidesops.
+
+Commands built on them live under `flask fides`. Manifests are read from
+`FIDES_DIR`, which defaults to the `.fides/` folder next to the package.
+"""
+
+import os
+from collections import deque
+
+import yaml
+from flask import current_app
+from flask.cli import AppGroup
+
+DATASET = "flaskr_postgres_dataset.yml"
+
+fides_cli = AppGroup("fides", help="Privacy tooling driven by the .fides manifests.")
+
+
+class Field:
+    """A dataset field, with the fidesops_meta annotations flaskr relies on."""
+
+    __slots__ = (
+        "name",
+        "data_categories",
+        "identity",
+        "primary_key",
+        "data_type",
+        "references",
+    )
+
+    def __init__(self, name, data_categories, meta):
+        self.name = name
+        self.data_categories = data_categories
+        self.identity = meta.get("identity")
+        self.primary_key = bool(meta.get("primary_key"))
+        self.data_type = meta.get("data_type")
+        # (dataset, collection, field, direction) of each referenced field
+        self.references = [
+            (
+                reference["dataset"],
+                *reference["field"].split(".", 1),
+                reference.get("direction"),
+            )
+            for reference in meta.get("references") or ()
+        ]
+
+
+class Collection:
+    __slots__ = ("name", "fields")
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+
+    @property
+    def primary_key(self):
+        return next(
+            (field.name for field in self.fields.values() if field.primary_key), None
+        )
+
+
+class Dataset:
+    __slots__ = ("fides_key", "collections")
+
+    def __init__(self, fides_key, collections):
+        self.fides_key = fides_key
+        self.collections = collections
+
+
+def load_manifest(path):
+    """Return the resources in a manifest file, keyed by type (e.g. "dataset")."""
+    with open(path, "r") as file:
+        return yaml.safe_load(file) or {}
+
+
+def load_manifests(directory=None):
+    """Return the resources of every manifest in a directory, keyed by type."""
+    if directory is None:
+        directory = current_app.config["FIDES_DIR"]
+    resources = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith((".yml", ".yaml")):
+            for resource_type, items in load_manifest(
+                os.path.join(directory, name)
+            ).items():
+                resources.setdefault(resource_type, []).extend(items or ())
+    return resources
+
+
+def load_dataset(path=None):
+    """Load the (first) dataset in a manifest, by default flaskr's own."""
+    if path is None:
+        path = os.path.join(current_app.config["FIDES_DIR"], DATASET)
+    manifest = load_manifest(path)["dataset"][0]
+    return Dataset(
+        manifest["fides_key"],
+        {
+            collection["name"]: Collection(
+                collection["name"],
+                {
+                    field["name"]: Field(
+                        field["name"],
+                        field.get("data_categories") or [],
+                        field.get("fidesops_meta") or {},
+                    )
+                    for field in collection["fields"]
+                },
+            )
+            for collection in manifest["collections"]
+        },
+    )
+
+
+def matches_category(category, targets):
+    """Whether a data category is one of `targets` or a subcategory of one."""
+    return any(
+        category == target or category.startswith(target + ".") for target in targets
+    )
+
+
+def traversal(dataset, identity):
+    """
+    Return the order to visit the dataset's collections in, from an identity.
+
+    Each step is a `(collection, edges)` pair, where each edge is a
+    `(field, source collection, source field)` whose values select the
+    collection's rows. The identity itself is an edge with a source collection
+    of None. Edges only come from collections visited earlier, following the
+    references' directions like fidesops does. Unreachable collections are
+    left out.
+    """
+    # (collection, field) -> [(source collection, source field)]
+    incoming = {}
+    for collection in dataset.collections.values():
+        for field in collection.fields.values():
+            for ref_dataset, ref_collection, ref_field, direction in field.references:
+                if ref_dataset != dataset.fides_key:
+                    continue
+                here, there = (collection.name, field.name), (ref_collection, ref_field)
+                if direction in ("from", None):
+                    incoming.setdefault(here, []).append(there)
+                if direction in ("to", None):
+                    incoming.setdefault(there, []).append(here)
+
+    steps = {}
+    queue = deque()
+    for collection in dataset.collections.values():
+        for field in collection.fields.values():
+            if field.identity == identity:
+                steps.setdefault(collection.name, []).append(
+                    (field.name, None, identity)
+                )
+                if collection.name not in queue:
+                    queue.append(collection.name)
+
+    order = []
+    while queue:
+        name = queue.popleft()
+        order.append(name)
+        for (collection, field), sources in sorted(incoming.items()):
+            for source, source_field in sources:
+                if source != name or collection in order:
+                    continue
+                steps.setdefault(collection, []).append((field, source, source_field))
+                if collection not in queue:
+                    queue.append(collection)
+
+    return [(dataset.collections[name], steps[name]) for name in order]
+
+
+def targeted_traversal(dataset, categories, identity):
+    """
+    Return the (collection, edges, targeted fields) of each collection to visit.
+
+    Like `traversal`, but only with the collections that have fields in the
+    target data `categories`, plus the ones they're reached through.
+    """
+    steps = [
+        (
+            collection,
+            edges,
+            [
+                field.name
+                for field in collection.fields.values()
+                if any(
+                    matches_category(category, categories)
+                    for category in field.data_categories
+                )
+            ],
+        )
+        for collection, edges in traversal(dataset, identity)
+    ]
+
+    # Work backwards to drop collections that neither have targeted fields
+    # nor lead to one that does
+    needed = set()
+    for collection, edges, fields in reversed(steps):
+        if fields or collection.name in needed:
+            needed.add(collection.name)
+            needed.update(source for _, source, _ in edges if source is not None)
+    return [step for step in steps if step[0].name in needed]
+
+
+def init_app(app):
+    if app.config["FIDES_DIR"] is None:
+        app.config["FIDES_DIR"] = os.path.join(os.path.dirname(app.root_path), ".fides")
+    # Import the modules defining fides_cli's commands, to register them
+    from flaskr import (  # noqa: F401
+        access,
+        datamap,
+        erasure,
+        estimation,
+        evaluation,
+        introspection,
+        taxonomy,
+    )
+
+    app.cli.add_command(fides_cli)
@@ -18,6 +18,8 @@ from os.path import exists
 import requests
 import yaml
 
+from flaskr.client_metrics import ClientMetrics, InstrumentedSession
+
 logger = logging.getLogger(__name__)
 
 
@@ -33,6 +35,11 @@ POSTGRES_USER = "postgres"
 POSTGRES_PASSWORD = "postgres"
 POSTGRES_PORT = "5432"
 
+# Every fidesops API call goes through this session, which reuses connections
+# and records each endpoint's call counts, latencies & payload sizes
+metrics = ClientMetrics()
+session = InstrumentedSession(metrics)
+
 SCOPES = [
     "client:create",
     "client:delete",
@@ -98,7 +105,7 @@ def get_access_token(client_id, client_secret):
         "client_id": client_id,
         "client_secret": client_secret,
     }
-    response = requests.post(f"{FIDESOPS_URL}/api/v1/oauth/token", data=data)
+    response = session.post(f"{FIDESOPS_URL}/api/v1/oauth/token", data=data)
 
     if response.ok:
         access_token = (response.json())["access_token"]
@@ -125,7 +132,7 @@ def create_oauth_client(access_token):
 
     See http://localhost:8080/docs#/OAuth/acquire_access_token_api_v1_oauth_token_post
     """
-    response = requests.post(
+    response = session.post(
         f"{FIDESOPS_URL}/api/v1/oauth/client",
         headers=oauth_headers(access_token),
         json=SCOPES,
@@ -153,7 +160,7 @@ def create_user(username, password, access_token):
     """
     user_data = {"username": username, "password": str_to_b64_str(password)}
 
-    response = requests.post(
+    response = session.post(
         f"{FIDESOPS_URL}/api/v1/user",
         headers=oauth_headers(access_token=access_token),
         json=user_data,
@@ -165,7 +172,7 @@ def create_user(username, password, access_token):
             logger.info(f"Created fidesops user '{username}' via /api/v1/user")
 
             # Now update the user's scopes
-            response = requests.put(
+            response = session.put(
                 f"{FIDESOPS_URL}/api/v1/user/{user['id']}/permission",
                 headers=oauth_headers(access_token=access_token),
                 json={"id": user["id"], "scopes": SCOPES},
@@ -195,7 +202,7 @@ def create_postgres_connection(key, access_token):
             "access": "write",
         },
     ]
-    response = requests.patch(
+    response = session.patch(
         f"{FIDESOPS_URL}/api/v1/connection",
         headers=oauth_headers(access_token=access_token),
         json=connection_create_data,
@@ -231,7 +238,7 @@ def create_mailchimp_saas_connection(key, access_token):
             "access": "write",
         },
     ]
-    response = requests.patch(
+    response = session.patch(
         f"{FIDESOPS_URL}/api/v1/connection",
         headers=oauth_headers(access_token=access_token),
         json=connection_create_data,
@@ -262,7 +269,7 @@ def create_mailchimp_saas_config(key, access_token, yaml_path):
     with open(yaml_path, "r") as file:
         config = yaml.safe_load(file).get("saas_config", {})
 
-    response = requests.patch(
+    response = session.patch(
         f"{FIDESOPS_URL}/api/v1/connection/{key}/saas_config",
         headers=oauth_headers(access_token=access_token),
         json=config,
@@ -297,7 +304,7 @@ def configure_postgres_connection(
         "username": username,
         "password": password,
     }
-    response = requests.put(
+    response = session.put(
         f"{FIDESOPS_URL}/api/v1/connection/{key}/secret",
         headers=oauth_headers(access_token=access_token),
         json=connection_secrets_data,
@@ -329,7 +336,7 @@ def configure_saas_connection(key, domain, username, api_key, access_token):
         "username": username,
         "api_key": api_key,
     }
-    response = requests.put(
+    response = session.put(
         f"{FIDESOPS_URL}/api/v1/connection/{key}/secret",
         headers=oauth_headers(access_token=access_token),
         json=connection_secrets_data,
@@ -364,7 +371,7 @@ def validate_dataset(connection_key, yaml_path, access_token):
         dataset = yaml.safe_load(file).get("dataset", [])[0]
 
     validate_dataset_data = dataset
-    response = requests.put(
+    response = session.put(
         f"{FIDESOPS_URL}/api/v1/connection/{connection_key}/validate_dataset",
         headers=oauth_headers(access_token=access_token),
         json=validate_dataset_data,
@@ -405,7 +412,7 @@ def create_dataset(connection_key, yaml_path, access_token):
         dataset = yaml.safe_load(file).get("dataset", [])[0]
 
     dataset_create_data = [dataset]
-    response = requests.patch(
+    response = session.patch(
         f"{FIDESOPS_URL}/api/v1/connection/{connection_key}/dataset",
         headers=oauth_headers(access_token=access_token),
         json=dataset_create_data,
@@ -444,7 +451,7 @@ def create_local_storage(key, format, access_token):
             },
         },
     ]
-    response = requests.patch(
+    response = session.patch(
         f"{FIDESOPS_URL}/api/v1/storage/config",
         headers=oauth_headers(access_token=access_token),
         json=storage_create_data,
@@ -479,7 +486,7 @@ def create_policy(key, access_token):
             "key": key,
         },
     ]
-    response = requests.patch(
+    response = session.patch(
         f"{FIDESOPS_URL}/api/v1/policy",
         headers=oauth_headers(access_token=access_token),
         json=policy_create_data,
@@ -505,7 +512,7 @@ def delete_policy_rule(policy_key, key, access_token):
 
     See http://localhost:8080/docs#/Policy/delete_rule_api_v1_policy__policy_key__rule__rule_key__delete
     """
-    return requests.delete(
+    return session.delete(
         f"{FIDESOPS_URL}/api/v1/policy/{policy_key}/rule/{key}",
         headers=oauth_headers(access_token=access_token),
     )
@@ -537,7 +544,7 @@ def create_policy_rule(
             "masking_strategy": masking_strategy,
         },
     ]
-    response = requests.patch(
+    response = session.patch(
         f"{FIDESOPS_URL}/api/v1/policy/{policy_key}/rule",
         headers=oauth_headers(access_token=access_token),
         json=rule_create_data,
@@ -571,7 +578,7 @@ def create_policy_rule_target(policy_key, rule_key, data_category, access_token)
             "data_category": data_category,
         },
     ]
-    response = requests.patch(
+    response = session.patch(
         f"{FIDESOPS_URL}/api/v1/policy/{policy_key}/rule/{rule_key}/target",
         headers=oauth_headers(access_token=access_token),
         json=target_create_data,
@@ -607,7 +614,7 @@ def create_privacy_request(email, policy_key, access_token):
             "identity": {"email": email},
         },
     ]
-    response = requests.post(
+    response = session.post(
         f"{FIDESOPS_URL}/api/v1/privacy-request",
         headers=oauth_headers(access_token=access_token),
         json=privacy_request_data,
@@ -627,6 +634,52 @@ def create_privacy_request(email, policy_key, access_token):
     )
 
 
+def get_privacy_request(privacy_request_id, access_token):
+    """
+    Get the privacy request with the given id, including its current status.
+
+    Returns the privacy request JSON if successful, or throws an error otherwise.
+
+    See http://localhost:8080/docs#/Privacy%20Requests/get_request_status_api_v1_privacy_request_get
+    """
+    response = session.get(
+        f"{FIDESOPS_URL}/api/v1/privacy-request",
+        headers=oauth_headers(access_token=access_token),
+        params={"id": privacy_request_id},
+    )
+
+    if response.ok:
+        privacy_requests = (response.json())["items"]
+        if len(privacy_requests) > 0:
+            return privacy_requests[0]
+
+    raise RuntimeError(
+        f"fidesops privacy request lookup failed! response.status_code={response.status_code}, response.json()={response.json()}",
+        response,
+    )
+
+
+def wait_for_health():
+    """Block until fidesops responds to health checks with a usable database."""
+    print("Waiting for fidesops to be healthy...")
+    while True:
+        try:
+            res = session.get(f"{FIDESOPS_URL}/health")
+            if res.json()["database"] == "unhealthy":
+                print("connection unhealthy, retrying")
+                raise requests.ConnectionError
+            if res.json()["database"] == "needs migration":
+                print("needs migration")
+                break
+            break
+        except requests.ConnectionError:
+            metrics.retry("GET", f"{FIDESOPS_URL}/health")
+            time.sleep(1)
+        except Exception as e:
+            metrics.retry("GET", f"{FIDESOPS_URL}/health")
+            print(e)
+
+
 def print_results(privacy_request_id):
     """
     Check to see if a result JSON for the given privacy request exists, and
@@ -639,7 +692,7 @@ def print_results(privacy_request_id):
     )
     while wait_time < 10:
         if exists(results_path):
-            requests.get(f"{FIDESOPS_URL}/health")
+            session.get(f"{FIDESOPS_URL}/health")
             logger.info(
                 f"Successfully read fidesops privacy request results from {results_path}:"
             )
@@ -654,6 +707,18 @@ def print_results(privacy_request_id):
     raise RuntimeError(f"fidesops privacy requests failed to upload to {results_path}!")
 
 
+def report_metrics(path=None):
+    """
+    Print a summary table of the fidesops API calls made so far, and write
+    their metrics to the given path in Prometheus text format, if any.
+    """
+    print(metrics.summary())
+    if path:
+        with open(path, "w") as file:
+            file.write(metrics.prometheus())
+        print(f"Wrote fidesops API metrics to {path}")
+
+
 def setup_defaults(access_token):
     """
     Setup default values so that fidesops is ready to use, including:
@@ -835,6 +900,12 @@ if __name__ == "__main__":
     if len(sys.argv) > 1 and "--setup-only" in sys.argv:
         setup_only = True
 
+    # If --metrics=PATH is provided, also write the API call metrics to PATH
+    metrics_path = None
+    for arg in sys.argv[1:]:
+        if arg.startswith("--metrics="):
+            metrics_path = arg.split("=", 1)[1]
+
     if test_mode:
         logging.basicConfig(level=logging.INFO)
     else:
@@ -857,21 +928,7 @@ if __name__ == "__main__":
         input()
 
     # Ensure fidesops is ready for requests
-    print("Waiting for fidesops to be healthy...")
-    while True:
-        try:
-            res = requests.get(f"{FIDESOPS_URL}/health")
-            if res.json()["database"] == "unhealthy":
-                print("connection unhealthy, retrying")
-                raise requests.ConnectionError
-            if res.json()["database"] == "needs migration":
-                print("needs migration")
-                break
-            break
-        except requests.ConnectionError:
-            time.sleep(1)
-        except Exception as e:
-            print(e)
+    wait_for_health()
 
     # Create a new OAuth client every time to fetch an access token (not efficient, but it's a demo!)
     root_token = get_access_token(
@@ -884,6 +941,7 @@ if __name__ == "__main__":
 
     # Setup the default values: user, policies, connection, etc.
     setup_defaults(access_token=access_token)
+    report_metrics(metrics_path)
 
     # Exit now if --setup-only was provided to this runner
     if setup_only:
@@ -961,4 +1019,5 @@ if __name__ == "__main__":
         print("Complete! Press [y] to execute another request (or any key to quit)")
         should_continue = input() == "y"
         if not should_continue:
+            report_metrics(metrics_path)
             exit(0)
@@ -0,0 +1,221 @@
+"""
+Bulk import of products from a CSV or NDJSON file.
+
+Sellers upload a file at `/import`, or run `flask import-products`, to add
+many products at once. Each row needs a name, description and price, as in
+the create form, and names must be unique. Rows are validated as the file is
+read and valid ones are streamed straight into a COPY, then merged into the
+products table in the same transaction. Invalid rows are skipped and
+reported by line number, without stopping the rest of the import.
+"""
+
+import csv
+import io
+import json
+import math
+
+import click
+from flask import Blueprint, flash, g, render_template, request
+from flask.cli import with_appcontext
+from werkzeug.exceptions import abort
+
+from flaskr import queries
+from flaskr.auth import login_required
+from flaskr.db import get_db
+
+bp = Blueprint("importer", __name__)
+
+FORMATS = ("csv", "ndjson")
+
+# The largest value of the REAL prices column
+MAX_PRICE = 3.4028234663852886e38
+
+
+def read_csv(file):
+    """Yield the (line number, fields) of each row of a CSV file with a header."""
+    reader = csv.DictReader(file)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_ndjson(file):
+    """Yield the (line number, fields) of each JSON object in an NDJSON file."""
+    for line_num, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        # Rows that aren't objects are reported by validate()
+        yield line_num, row if isinstance(row, dict) else None
+
+
+def validate(rows, errors):
+    """
+    Yield the (line, name, description, price) of each valid row.
+
+    The (line, message) of each invalid row is appended to `errors` instead.
+    """
+    names = set()
+    for line, row in rows:
+        if row is None:
+            errors.append((line, "Invalid JSON object."))
+            continue
+
+        name = str(row.get("name") or "").strip()
+        description = str(row.get("description") or "").strip()
+        price = row.get("price")
+        error = None
+
+        if not name:
+            error = "Name is required."
+        elif not description:
+            error = "Description is required."
+        elif price is None or price == "":
+            error = "Price is required."
+        # Postgres text can't hold NUL characters
+        elif "\x00" in name or "\x00" in description:
+            error = "Name and description can't contain NUL characters."
+        elif name in names:
+            error = f"Name {name} appears more than once."
+        else:
+            try:
+                price = float(price)
+            except (TypeError, ValueError):
+                price = math.nan
+            if not math.isfinite(price):
+                error = "Price must be a number."
+            elif price < 0:
+                error = "Price can't be negative."
+            elif price > MAX_PRICE:
+                error = "Price is too large."
+
+        if error is not None:
+            errors.append((line, error))
+        else:
+            names.add(name)
+            yield line, name, description, price
+
+
+class CopyStream:
+    """A read-only file of CSV-encoded rows, encoded as COPY reads them."""
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        self._pending = ""
+        # COPY fails with its own error if reading the rows raises, so keep
+        # the original to raise again
+        self.error = None
+
+    def read(self, size=-1):
+        chunks = [self._pending]
+        length = len(self._pending)
+        while size < 0 or length < size:
+            try:
+                row = next(self._rows, None)
+            except Exception as error:
+                self.error = error
+                raise
+            if row is None:
+                break
+            self._buffer.seek(0)
+            self._buffer.truncate()
+            self._writer.writerow(row)
+            chunks.append(self._buffer.getvalue())
+            length += len(chunks[-1])
+
+        data = "".join(chunks)
+        if size < 0:
+            self._pending = ""
+            return data
+        self._pending = data[size:]
+        return data[:size]
+
+
+def import_products(file, format, seller_id):
+    """
+    Import the products in an open text file, owned by the given seller.
+
+    Returns the number of products added and the (line, message) of every
+    rejected row, in line order. Commits the import, or rolls it back and
+    raises UnicodeDecodeError if the file isn't valid UTF-8, or csv.Error if
+    it isn't a valid CSV file.
+    """
+    errors = []
+    rows = read_ndjson(file) if format == "ndjson" else read_csv(file)
+    stream = CopyStream(validate(rows, errors))
+    try:
+        imported, conflicts = queries.import_products(stream, seller_id)
+    except Exception:
+        if not isinstance(stream.error, (UnicodeDecodeError, csv.Error)):
+            raise
+        get_db().rollback()
+        raise stream.error from None
+    get_db().commit()
+
+    errors += [(line, f"Name {name} already exists.") for line, name in conflicts]
+    errors.sort()
+    return imported, errors
+
+
+def guess_format(filename):
+    return "ndjson" if filename.endswith((".ndjson", ".jsonl")) else "csv"
+
+
+@bp.route("/import", methods=("GET", "POST"))
+@login_required
+def upload():
+    imported = errors = None
+
+    if request.method == "POST":
+        upload = request.files.get("file")
+        if not upload or not upload.filename:
+            flash("File is required.")
+        else:
+            format = request.form.get("format") or guess_format(upload.filename)
+            if format not in FORMATS:
+                abort(400, f"Unsupported format {format}.")
+            # utf-8-sig skips the byte order mark spreadsheets like to add
+            file = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline="")
+            try:
+                imported, errors = import_products(file, format, g.user.id)
+            except UnicodeDecodeError:
+                flash("File must be encoded as UTF-8.")
+            except csv.Error as error:
+                flash(f"Invalid CSV file: {error}.")
+
+    return render_template("product/import.html", imported=imported, errors=errors)
+
+
+@click.command("import-products")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--seller", required=True, help="Email of the user selling them.")
+@click.option("--format", type=click.Choice(FORMATS), help="Guessed from PATH.")
+@with_appcontext
+def import_products_command(path, seller, format):
+    """Add the products listed in a CSV or NDJSON file."""
+    credentials = queries.get_credentials(seller)
+    if credentials is None:
+        raise click.BadParameter(f"No user with email {seller}.", param_hint="--seller")
+
+    with open(path, encoding="utf-8-sig", newline="") as file:
+        try:
+            imported, errors = import_products(
+                file, format or guess_format(path), credentials.id
+            )
+        except UnicodeDecodeError:
+            raise click.ClickException(f"{path} isn't encoded as UTF-8.")
+        except csv.Error as error:
+            raise click.ClickException(f"{path} isn't a valid CSV file: {error}.")
+
+    for line, message in errors:
+        click.echo(f"line {line}: {message}", err=True)
+    click.echo(f"Imported {imported} products, rejected {len(errors)} rows.")
+
+
+def init_app(app):
+    app.register_blueprint(bp)
+    app.cli.add_command(import_products_command)
@@ -0,0 +1,312 @@
+"""
+Generate flaskr's dataset manifest from the database schema.
+
+`fidesctl generate dataset db` writes a new manifest from scratch, without
+the data categories, identities and references annotated by hand in
+`flaskr_postgres_dataset.yml`. `flask fides generate-dataset` instead reads
+the schema with a single catalog query (columns, types, primary & foreign
+keys) and merges it into the existing manifest:
+
+- tables & columns missing from the manifest are added, with
+  `fidesops_meta` inferred from the schema (data type, primary key and a
+  reference per foreign key) and empty data categories to fill in
+- fields & collections whose column or table no longer exists are removed
+- every other field is left exactly as it is
+
+The manifest is only written when something changed, so it can run after
+every migration; `--check` only reports what would change, exiting 1 if the
+manifest is out of date. PyYAML doesn't keep comments, so rather than
+dumping the merged manifest, only the lines of the collections & fields
+added or removed are edited: comments and the layout of everything else
+are kept as written.
+"""
+
+import os
+
+import click
+import yaml
+from flask import current_app
+from sqlalchemy import text
+
+from flaskr.db import get_db
+from flaskr.fides import DATASET, fides_cli
+
+# Every column of the schema's tables (partitions are covered by their
+# parent), with its primary key membership and referenced columns
+SCHEMA = text("""
+    WITH keys AS (
+        SELECT k.conrelid, k.contype, key.attnum, ft.relname AS ref_table,
+            fa.attname AS ref_column
+        FROM pg_constraint k
+        CROSS JOIN LATERAL unnest(k.conkey, k.confkey) AS key(attnum, ref_attnum)
+        LEFT JOIN pg_class ft ON ft.oid = k.confrelid
+        LEFT JOIN pg_attribute fa
+            ON fa.attrelid = k.confrelid AND fa.attnum = key.ref_attnum
+        WHERE k.contype IN ('p', 'f')
+            AND k.connamespace = to_regnamespace(current_schema())
+    )
+    SELECT t.relname, a.attname, ty.typname, ty.typcategory,
+        coalesce(bool_or(keys.contype = 'p'), false),
+        coalesce(
+            array_agg(keys.ref_table || '.' || keys.ref_column
+                ORDER BY keys.ref_table, keys.ref_column)
+                FILTER (WHERE keys.contype = 'f'),
+            '{}'
+        )
+    FROM pg_class t
+    JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum > 0 AND NOT a.attisdropped
+    JOIN pg_type ty ON ty.oid = a.atttypid
+    LEFT JOIN keys ON keys.conrelid = t.oid AND keys.attnum = a.attnum
+    WHERE t.relnamespace = to_regnamespace(current_schema())
+        AND t.relkind IN ('r', 'p') AND NOT t.relispartition
+    GROUP BY t.relname, a.attname, a.attnum, ty.typname, ty.typcategory
+    ORDER BY t.relname, a.attnum
+    """)
+
+INTEGER_TYPES = ("int2", "int4", "int8")
+
+
+class ManifestDumper(yaml.SafeDumper):
+    """Dumps scalar lists inline & booleans as `True`, like the manifests."""
+
+    def represent_bool(self, data):
+        return self.represent_scalar("tag:yaml.org,2002:bool", str(data))
+
+    def represent_list(self, data):
+        flow = all(not isinstance(item, (dict, list)) for item in data)
+        return self.represent_sequence("tag:yaml.org,2002:seq", data, flow_style=flow)
+
+
+ManifestDumper.add_representer(bool, ManifestDumper.represent_bool)
+ManifestDumper.add_representer(list, ManifestDumper.represent_list)
+
+
+def is_content(line):
+    stripped = line.strip()
+    return bool(stripped) and not stripped.startswith("#")
+
+
+def indentation(line):
+    return len(line) - len(line.lstrip(" "))
+
+
+def split_sequence(lines, start):
+    """
+    Split the block sequence under the key on line `start` into its items.
+
+    Returns the items' indentation, the comment & blank lines before the
+    first item, the lines of each item and the index of the first line after
+    the sequence. Comment & blank lines at the end of the sequence are left
+    after it.
+    """
+    indent = None
+    leading, items = [], []
+    end = start + 1
+    while end < len(lines):
+        line = lines[end]
+        if is_content(line):
+            if indent is None:
+                # Items may be indented like their key, but not less
+                if indentation(line) < indentation(lines[start]):
+                    break
+                indent = indentation(line)
+            if indentation(line) > indent:
+                items[-1].append(line)
+            elif indentation(line) == indent and line[indent:].startswith("- "):
+                items.append([line])
+            else:
+                break
+        elif items:
+            items[-1].append(line)
+        else:
+            leading.append(line)
+        end += 1
+    while items and not is_content(items[-1][-1]):
+        items[-1].pop()
+        end -= 1
+    if indent is None:
+        indent = indentation(lines[start])
+    return indent, leading, items, end
+
+
+def dump_item(item, indent):
+    """Return the lines of a sequence item, as dumped at the given indentation."""
+    content = yaml.dump(
+        [item],
+        Dumper=ManifestDumper,
+        sort_keys=False,
+        default_flow_style=False,
+    )
+    return [" " * indent + line for line in content.splitlines(keepends=True)]
+
+
+def update_manifest(content, original, collections):
+    """
+    Return the manifest `content` with its dataset's collections replaced.
+
+    `original` lists the (name, field names) of the collections in
+    `content`, in order, and `collections` the merged ones. The lines of
+    kept collections & fields are copied as they are; new ones are dumped,
+    indented like their siblings.
+    """
+    if not content.endswith("\n"):
+        content += "\n"
+    lines = content.splitlines(keepends=True)
+    start = next(i for i, line in enumerate(lines) if line.strip() == "collections:")
+    indent, output, items, end = split_sequence(lines, start)
+    output = lines[: start + 1] + output
+
+    blocks = {}
+    for (name, field_names), item in zip(original, items):
+        fields_start = next(
+            i for i, line in enumerate(item) if line.strip() == "fields:"
+        )
+        field_indent, leading, fields, fields_end = split_sequence(item, fields_start)
+        blocks[name] = (
+            item[: fields_start + 1] + leading,
+            field_indent,
+            dict(zip(field_names, fields)),
+            item[fields_end:],
+        )
+
+    for collection in collections:
+        if collection["name"] not in blocks:
+            output += dump_item(collection, indent)
+            continue
+        head, field_indent, fields, tail = blocks[collection["name"]]
+        output += head
+        for field in collection["fields"]:
+            output += fields.get(field["name"]) or dump_item(field, field_indent)
+        output += tail
+    return "".join(output + lines[end:])
+
+
+def data_type(type_name, category):
+    """Return the fidesops data type of a Postgres type, if it has one."""
+    if type_name in INTEGER_TYPES:
+        return "integer"
+    if category == "N":
+        return "float"
+    if category == "S":
+        return "string"
+    if category == "B":
+        return "boolean"
+    return None
+
+
+def introspect():
+    """
+    Return the schema's tables, as `{table: {column: fidesops_meta}}`.
+
+    Tables and columns are in their creation order. The schema is read from
+    the primary, as a replica may not have replayed the latest migration.
+    """
+    tables = {}
+    rows = get_db().execute(SCHEMA)
+    for table, column, type_name, category, primary_key, references in rows:
+        meta = {}
+        if primary_key:
+            meta["primary_key"] = True
+        if references:
+            meta["references"] = [
+                {"field": reference, "direction": "from"} for reference in references
+            ]
+        if data_type(type_name, category):
+            meta["data_type"] = data_type(type_name, category)
+        tables.setdefault(table, {})[column] = meta
+    return tables
+
+
+def new_field(dataset, name, meta):
+    field = {"name": name, "data_categories": []}
+    if meta:
+        meta = dict(meta)
+        if "references" in meta:
+            meta["references"] = [
+                {"dataset": dataset, **reference} for reference in meta["references"]
+            ]
+        field["fidesops_meta"] = meta
+    return field
+
+
+def merge_dataset(dataset, tables):
+    """
+    Merge the introspected `tables` into a dataset manifest, in place.
+
+    Returns a description of each change made. New collections & fields are
+    added in name order, like the rest of the manifest.
+    """
+    changes = []
+    collections = []
+    existing = {collection["name"]: collection for collection in dataset["collections"]}
+    for collection in dataset["collections"]:
+        if collection["name"] not in tables:
+            changes.append(f"removed {collection['name']}")
+            continue
+        collections.append(collection)
+        columns = tables[collection["name"]]
+        fields = []
+        for field in collection["fields"]:
+            if field["name"] in columns:
+                fields.append(field)
+            else:
+                changes.append(f"removed {collection['name']}.{field['name']}")
+        names = {field["name"] for field in fields}
+        for name, meta in columns.items():
+            if name not in names:
+                fields.append(new_field(dataset["fides_key"], name, meta))
+                changes.append(f"added {collection['name']}.{name}")
+        collection["fields"] = sorted(fields, key=lambda field: field["name"])
+
+    for table, columns in tables.items():
+        if table not in existing:
+            collections.append(
+                {
+                    "name": table,
+                    "fields": [
+                        new_field(dataset["fides_key"], name, columns[name])
+                        for name in sorted(columns)
+                    ],
+                }
+            )
+            changes.append(f"added {table}")
+    dataset["collections"] = sorted(collections, key=lambda c: c["name"])
+    return changes
+
+
+@fides_cli.command("generate-dataset")
+@click.option(
+    "--output",
+    type=click.Path(dir_okay=False),
+    help="Where to write the manifest. Defaults to updating it in place.",
+)
+@click.option(
+    "--check",
+    is_flag=True,
+    help="Only list the changes, exiting 1 if there are any.",
+)
+def generate_dataset_command(output, check):
+    """Merge the database schema into the Postgres dataset manifest."""
+    path = os.path.join(current_app.config["FIDES_DIR"], DATASET)
+    with open(path) as file:
+        content = file.read()
+    dataset = (yaml.safe_load(content) or {})["dataset"][0]
+    original = [
+        (collection["name"], [field["name"] for field in collection["fields"]])
+        for collection in dataset["collections"]
+    ]
+    changes = merge_dataset(dataset, introspect())
+    for change in changes:
+        click.echo(change)
+    if check:
+        if changes:
+            click.get_current_context().exit(1)
+        return
+    if not changes and output is None:
+        click.echo(f"{path} is up to date.")
+        return
+
+    output = output or path
+    with open(output, "w") as file:
+        file.write(update_manifest(content, original, dataset["collections"]))
+    click.echo(f"Wrote {output}.")
@@ -0,0 +1,177 @@
+"""
+A local record of the privacy requests submitted to fidesops.
+
+Batch runs of `flaskr.scenarios` record every request they submit in a
+SQLite database, keyed by `(identity, policy_key, batch)`, with its request
+id, its last known status and when it was submitted & last updated. Each
+submission is committed before the next one, so re-running an interrupted
+batch with the same `--batch` name skips the identities it has already
+submitted and only polls the requests that hadn't finished, found through a
+partial index over the pending rows rather than a scan of the whole batch.
+
+`python -m flaskr.ledger export` writes the ledger (or one batch of it) as
+CSV for reporting, and `python -m flaskr.ledger summary` counts each batch's
+requests by status.
+"""
+
+import csv
+import sqlite3
+import sys
+from datetime import datetime
+
+import click
+
+LEDGER = "fides_tmp/fidesops_ledger.sqlite3"
+
+# Privacy request statuses fidesops won't move on from by itself
+FINISHED = ("complete", "error", "denied", "canceled")
+
+COLUMNS = (
+    "identity",
+    "policy_key",
+    "batch",
+    "request_id",
+    "status",
+    "submitted_at",
+    "updated_at",
+)
+
+# The partial index only covers rows matching PENDING, and SQLite only uses
+# it for queries repeating the same condition
+PENDING = f"status NOT IN ({', '.join(repr(status) for status in FINISHED)})"
+
+SCHEMA = f"""
+    CREATE TABLE IF NOT EXISTS privacy_requests (
+        identity TEXT NOT NULL,
+        policy_key TEXT NOT NULL,
+        batch TEXT NOT NULL,
+        request_id TEXT NOT NULL UNIQUE,
+        status TEXT NOT NULL,
+        submitted_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        PRIMARY KEY (batch, policy_key, identity)
+    );
+    CREATE INDEX IF NOT EXISTS privacy_requests_pending
+        ON privacy_requests (batch, policy_key) WHERE {PENDING};
+    """
+
+
+def now():
+    return datetime.utcnow().isoformat(timespec="seconds")
+
+
+class Ledger:
+    """The privacy requests recorded in a SQLite database."""
+
+    def __init__(self, path=LEDGER):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        # Keep commits cheap enough to make after every submission
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA synchronous = NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def requests(self, batch, policy_key):
+        """Return the batch's requests for a policy, as `{identity: (id, status)}`."""
+        return {
+            identity: (request_id, status)
+            for identity, request_id, status in self.db.execute(
+                "SELECT identity, request_id, status FROM privacy_requests"
+                " WHERE batch = ? AND policy_key = ?",
+                (batch, policy_key),
+            )
+        }
+
+    def pending(self, batch, policy_key):
+        """Return the batch's unfinished requests for a policy, as `{id: status}`."""
+        return dict(
+            self.db.execute(
+                "SELECT request_id, status FROM privacy_requests"
+                f" WHERE batch = ? AND policy_key = ? AND {PENDING}",
+                (batch, policy_key),
+            )
+        )
+
+    def record(self, identity, policy_key, batch, request_id, status):
+        """Record a submitted request, committing it right away."""
+        timestamp = now()
+        with self.db:
+            self.db.execute(
+                "INSERT INTO privacy_requests VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (identity, policy_key, batch, request_id, status, timestamp, timestamp),
+            )
+
+    def update(self, statuses):
+        """Record the latest statuses of requests, given as `{id: status}`."""
+        timestamp = now()
+        with self.db:
+            self.db.executemany(
+                "UPDATE privacy_requests SET status = ?, updated_at = ?"
+                " WHERE request_id = ? AND status != ?",
+                [
+                    (status, timestamp, request_id, status)
+                    for request_id, status in statuses.items()
+                ],
+            )
+
+    def rows(self, batch=None):
+        """Yield the recorded requests, as tuples of `COLUMNS`."""
+        query = f"SELECT {', '.join(COLUMNS)} FROM privacy_requests"
+        if batch is None:
+            return self.db.execute(f"{query} ORDER BY batch, submitted_at")
+        return self.db.execute(
+            f"{query} WHERE batch = ? ORDER BY submitted_at", (batch,)
+        )
+
+
+@click.group()
+@click.option(
+    "--ledger",
+    "path",
+    default=LEDGER,
+    show_default=True,
+    type=click.Path(exists=True, dir_okay=False),
+)
+@click.pass_context
+def cli(ctx, path):
+    """Report on the privacy requests submitted by scenario runs."""
+    ctx.obj = Ledger(path)
+    ctx.call_on_close(ctx.obj.close)
+
+
+@cli.command("export")
+@click.option("--batch", help="Only export this batch.")
+@click.option(
+    "--output",
+    type=click.Path(dir_okay=False),
+    help="Where to write the CSV. Defaults to stdout.",
+)
+@click.pass_obj
+def export_command(ledger, batch, output):
+    """Export the recorded privacy requests as CSV."""
+    file = open(output, "w", newline="") if output else sys.stdout
+    try:
+        writer = csv.writer(file)
+        writer.writerow(COLUMNS)
+        writer.writerows(ledger.rows(batch))
+    finally:
+        if output:
+            file.close()
+
+
+@cli.command("summary")
+@click.pass_obj
+def summary_command(ledger):
+    """Count each batch's privacy requests by status."""
+    for batch, policy_key, status, count in ledger.db.execute(
+        "SELECT batch, policy_key, status, count(*) FROM privacy_requests"
+        " GROUP BY batch, policy_key, status ORDER BY batch, policy_key, status"
+    ):
+        click.echo(f"{batch}\t{policy_key}\t{status}\t{count}")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,207 @@
+"""
+Opt-in request instrumentation for flaskr.
+
+When the `INSTRUMENTATION` config flag is set, every request records its
+latency, the number of SQL statements it ran and their cumulative time (via
+cursor events on the `flaskr.db` engines), and the time spent rendering
+templates. Totals are exposed in Prometheus text format at `/metrics`, and
+each response reports its own numbers in a `Server-Timing` header.
+
+Requests that run the same SQL statement at least
+`INSTRUMENTATION_N_PLUS_ONE_THRESHOLD` times are logged and counted as likely
+N+1 query patterns.
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+
+from flask import Response, current_app, g, has_app_context, request
+from flask import before_render_template, template_rendered
+from sqlalchemy import event
+
+from flaskr.db import get_engines
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Histogram:
+    """A cumulative Prometheus-style histogram with fixed bucket bounds."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+def init_app(app):
+    if not app.config["INSTRUMENTATION"]:
+        return
+
+    app.extensions["metrics"] = {
+        "lock": threading.Lock(),
+        "request_duration": {},
+        "db_duration": {},
+        "db_queries": {},
+        "render_duration": {},
+        "n_plus_one": Counter(),
+    }
+
+    for engine in get_engines(app):
+        instrument_engine(engine)
+    before_render_template.connect(_before_render_template, app)
+    template_rendered.connect(_template_rendered, app)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.add_url_rule("/metrics", "metrics", metrics)
+
+
+def instrument_engine(engine):
+    """Time every statement run by the given engine against the current request."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def _request_stats():
+    if has_app_context():
+        return g.get("metrics")
+    return None
+
+
+# Start times are keyed by execution context, and dropped when a statement
+# fails, so failed statements never leave stale ones on pooled connections
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", {})[context] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop(context)
+    stats = _request_stats()
+    if stats is not None:
+        stats["db_duration"] += elapsed
+        stats["statements"][statement] += 1
+
+
+def _handle_error(exception_context):
+    if exception_context.connection is not None:
+        exception_context.connection.info.get("query_start", {}).pop(
+            exception_context.execution_context, None
+        )
+
+
+def _before_render_template(app, template, context):
+    stats = _request_stats()
+    if stats is not None:
+        stats["render_start"] = time.perf_counter()
+
+
+def _template_rendered(app, template, context):
+    stats = _request_stats()
+    if stats is not None and "render_start" in stats:
+        stats["render_duration"] += time.perf_counter() - stats.pop("render_start")
+
+
+def _start_request():
+    g.metrics = {
+        "start": time.perf_counter(),
+        "db_duration": 0.0,
+        "render_duration": 0.0,
+        "statements": Counter(),
+    }
+
+
+def _finish_request(response):
+    stats = g.metrics
+    duration = time.perf_counter() - stats["start"]
+    queries = sum(stats["statements"].values())
+    endpoint = request.endpoint or "unknown"
+
+    threshold = current_app.config["INSTRUMENTATION_N_PLUS_ONE_THRESHOLD"]
+    repeated = [
+        (statement, count)
+        for statement, count in stats["statements"].items()
+        if count >= threshold
+    ]
+    for statement, count in repeated:
+        logger.warning(
+            f"Possible N+1 query in {endpoint}: statement ran {count} times: {statement}"
+        )
+
+    state = current_app.extensions["metrics"]
+    with state["lock"]:
+        for name, buckets, value in (
+            ("request_duration", LATENCY_BUCKETS, duration),
+            ("db_duration", LATENCY_BUCKETS, stats["db_duration"]),
+            ("db_queries", QUERY_COUNT_BUCKETS, queries),
+            ("render_duration", LATENCY_BUCKETS, stats["render_duration"]),
+        ):
+            histograms = state[name]
+            if endpoint not in histograms:
+                histograms[endpoint] = Histogram(buckets)
+            histograms[endpoint].observe(value)
+        if repeated:
+            state["n_plus_one"][endpoint] += 1
+
+    response.headers["Server-Timing"] = ", ".join(
+        [
+            f'db;dur={stats["db_duration"] * 1000:.2f};desc="{queries} queries"',
+            f'render;dur={stats["render_duration"] * 1000:.2f}',
+            f"total;dur={duration * 1000:.2f}",
+        ]
+    )
+    return response
+
+
+HISTOGRAMS = (
+    ("request_duration", "flaskr_request_duration_seconds", "Request latency"),
+    ("db_duration", "flaskr_db_duration_seconds", "Time spent in SQL per request"),
+    ("db_queries", "flaskr_db_queries", "SQL statements executed per request"),
+    (
+        "render_duration",
+        "flaskr_render_duration_seconds",
+        "Template render time per request",
+    ),
+)
+
+
+def histogram_lines(name, description, histograms):
+    """Yield the Prometheus text lines of histograms keyed by endpoint."""
+    yield f"# HELP {name} {description}"
+    yield f"# TYPE {name} histogram"
+    for endpoint, histogram in sorted(histograms.items()):
+        label = f'endpoint="{endpoint}"'
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            yield f'{name}_bucket{{{label},le="{bound}"}} {count}'
+        yield f'{name}_bucket{{{label},le="+Inf"}} {histogram.count}'
+        yield f"{name}_sum{{{label}}} {histogram.sum}"
+        yield f"{name}_count{{{label}}} {histogram.count}"
+
+
+def metrics():
+    """Export all recorded metrics in the Prometheus text format."""
+    state = current_app.extensions["metrics"]
+    lines = []
+    with state["lock"]:
+        for key, name, description in HISTOGRAMS:
+            lines.extend(histogram_lines(name, description, state[key]))
+
+        name = "flaskr_n_plus_one_requests_total"
+        lines.append(f"# HELP {name} Requests that repeated a SQL statement")
+        lines.append(f"# TYPE {name} counter")
+        for endpoint, count in sorted(state["n_plus_one"].items()):
+            lines.append(f'{name}{{endpoint="{endpoint}"}} {count}')
+
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
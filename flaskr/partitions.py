@@ -0,0 +1,214 @@
+"""
+Monthly partitions of the purchases table.
+
+`purchases` is range partitioned on `created_at`, one partition per month
+named `purchases_YYYY_MM`, plus a default partition that catches rows for any
+month without one. Partitions are created `PURCHASE_PARTITION_MONTHS_AHEAD`
+months in advance by `init-db`, `flask serve` on startup and
+`flask purchases partition` (run it from cron on long-lived deployments).
+Rows that landed in the default partition are moved into their month's
+partition when it's created.
+
+`flask purchases archive` saves every partition older than
+`PURCHASE_RETENTION_MONTHS` as a gzipped CSV under `PURCHASE_ARCHIVE_DIR`
+(`archive/` in the instance folder by default), then detaches and drops it,
+so old purchases are removed without a DELETE. Archived purchases
+still count towards the sales counters, unless they're rebuilt afterwards.
+"""
+
+import gzip
+import os
+from datetime import date
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import text
+
+from flaskr.db import get_db
+
+DEFAULT_PARTITION = "purchases_default"
+
+
+def add_months(month, months):
+    """Return the first day of the month `months` after (or before) `month`."""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"purchases_{month.year:04}_{month.month:02}"
+
+
+def current_month():
+    """Return the first day of this month, by the database's clock."""
+    month = get_db().execute(text("SELECT date_trunc('month', LOCALTIMESTAMP)"))
+    return month.scalar().date()
+
+
+def purchase_partitions():
+    """Return the (name, month) of every monthly partition, oldest first."""
+    names = (
+        get_db()
+        .execute(
+            text(
+                "SELECT c.relname FROM pg_inherits i"
+                " JOIN pg_class c ON c.oid = i.inhrelid"
+                " WHERE i.inhparent = 'purchases'::regclass"
+                " AND c.relname <> :default ORDER BY c.relname"
+            ),
+            {"default": DEFAULT_PARTITION},
+        )
+        .scalars()
+    )
+    return [(name, date(int(name[-7:-3]), int(name[-2:]), 1)) for name in names]
+
+
+def create_purchase_partitions(months_ahead):
+    """
+    Create the partitions for this month and `months_ahead` months after it.
+
+    Partitions are also created for any month with rows in the default
+    partition, and those rows moved into them. Returns the names of the new
+    partitions; the caller commits.
+    """
+    db = get_db()
+    # Serialize with any other process doing the same, e.g. several servers
+    # starting at once
+    db.execute(text("SELECT pg_advisory_xact_lock(hashtext('purchases_partitions'))"))
+
+    this_month = current_month()
+    months = {add_months(this_month, i) for i in range(months_ahead + 1)}
+    months.update(
+        month.date()
+        for month in db.execute(
+            text(
+                f"SELECT DISTINCT date_trunc('month', created_at)"
+                f" FROM {DEFAULT_PARTITION}"
+            )
+        ).scalars()
+    )
+    existing = {name for name, month in purchase_partitions()}
+
+    created = []
+    for month in sorted(months):
+        name = partition_name(month)
+        if name in existing:
+            continue
+        end = add_months(month, 1)
+        # Build the partition standalone & attach it, rather than creating it
+        # with PARTITION OF, so rows can first be moved out of the default
+        # partition (which would otherwise make the new partition overlap it)
+        db.execute(
+            text(
+                f"CREATE TABLE {name}"
+                " (LIKE purchases INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+            )
+        )
+        db.execute(
+            text(
+                f"WITH moved AS ("
+                f" DELETE FROM {DEFAULT_PARTITION}"
+                f" WHERE created_at >= :start AND created_at < :end RETURNING *"
+                f") INSERT INTO {name} SELECT * FROM moved"
+            ),
+            {"start": month, "end": end},
+        )
+        db.execute(
+            text(
+                f"ALTER TABLE purchases ATTACH PARTITION {name}"
+                f" FOR VALUES FROM ('{month}') TO ('{end}')"
+            )
+        )
+        created.append(name)
+    return created
+
+
+def archive_purchase_partitions(before, directory):
+    """
+    Save, detach and drop every partition for a month before `before`.
+
+    Each partition is written to `<directory>/<name>.csv.gz` and dropped in
+    its own transaction, so a failure leaves it attached with no archive
+    file. Only writes to the partition are blocked while it's written out;
+    the whole purchases table is locked just to detach it, once the archive
+    is complete. Returns the paths of the archives written.
+    """
+    db = get_db()
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for name, month in purchase_partitions():
+        if month >= before:
+            break
+
+        path = os.path.join(directory, f"{name}.csv.gz")
+        partial_path = f"{path}.partial"
+        try:
+            # Keep the partition from changing until it's dropped, while
+            # purchases of other months can still be made & read
+            db.execute(text(f"LOCK TABLE {name} IN SHARE MODE"))
+            with gzip.open(partial_path, "wt", newline="") as file:
+                cursor = db.connection().connection.cursor()
+                try:
+                    cursor.copy_expert(
+                        f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)", file
+                    )
+                finally:
+                    cursor.close()
+            os.replace(partial_path, path)
+            db.execute(text(f"ALTER TABLE purchases DETACH PARTITION {name}"))
+            db.execute(text(f"DROP TABLE {name}"))
+            db.commit()
+        except Exception:
+            db.rollback()
+            for file_path in (partial_path, path):
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+            raise
+        paths.append(path)
+    return paths
+
+
+purchases_cli = AppGroup("purchases", help="Manage the purchases partitions.")
+
+
+@purchases_cli.command("partition")
+@click.option(
+    "--months-ahead",
+    type=int,
+    help="Defaults to PURCHASE_PARTITION_MONTHS_AHEAD.",
+)
+def partition_command(months_ahead):
+    """Create the upcoming months' partitions."""
+    if months_ahead is None:
+        months_ahead = current_app.config["PURCHASE_PARTITION_MONTHS_AHEAD"]
+    created = create_purchase_partitions(months_ahead)
+    get_db().commit()
+    click.echo(f"Created {len(created)} partitions.")
+    for name in created:
+        click.echo(f"  {name}")
+
+
+@purchases_cli.command("archive")
+@click.option(
+    "--older-than",
+    type=int,
+    help="Months of purchases to keep. Defaults to PURCHASE_RETENTION_MONTHS.",
+)
+def archive_command(older_than):
+    """Archive & drop the partitions of months older than the retention period."""
+    if older_than is None:
+        older_than = current_app.config["PURCHASE_RETENTION_MONTHS"]
+    paths = archive_purchase_partitions(
+        add_months(current_month(), -older_than),
+        current_app.config["PURCHASE_ARCHIVE_DIR"],
+    )
+    click.echo(f"Archived {len(paths)} partitions.")
+    for path in paths:
+        click.echo(f"  {path}")
+
+
+def init_app(app):
+    if app.config["PURCHASE_ARCHIVE_DIR"] is None:
+        app.config["PURCHASE_ARCHIVE_DIR"] = os.path.join(app.instance_path, "archive")
+    app.cli.add_command(purchases_cli)
@@ -1,24 +1,60 @@
-from flask import Blueprint, flash, g, redirect, render_template, request, url_for
-from sqlalchemy import text
+import time
+
+from flask import (
+    Blueprint,
+    current_app,
+    flash,
+    g,
+    redirect,
+    render_template,
+    request,
+    url_for,
+)
 from werkzeug.exceptions import abort
 
+from flaskr import queries
 from flaskr.auth import login_required
 from flaskr.db import get_db
 
 bp = Blueprint("product", __name__)
 
+# Number of results shown per page of search results
+SEARCH_PAGE_SIZE = 20
+
+# Upper bound on cached products per app; the cache is simply reset when full
+PRODUCT_CACHE_MAX_SIZE = 1024
+
 
 @bp.route("/")
 def index():
-    db = get_db()
-    products = db.execute(
-        text(
-            "SELECT p.id, p.name, p.description, p.price, p.created_at, p.seller_id, u.first_name"
-            " FROM products p JOIN users u ON p.seller_id = u.id"
-            " ORDER BY p.created_at DESC"
-        )
-    ).fetchall()
-    return render_template("product/index.html", products=products)
+    return render_template("product/index.html", products=queries.list_products())
+
+
+@bp.route("/search")
+def search():
+    q = request.args.get("q", "").strip()
+    after = request.args.get("after")
+    products = []
+    next_after = None
+
+    if q:
+        cursor = None
+        if after:
+            try:
+                after_rank, after_id = after.split(":")
+                cursor = (float(after_rank), int(after_id))
+            except ValueError:
+                abort(400, f"Invalid search cursor {after}.")
+
+        products = queries.search_products(q, SEARCH_PAGE_SIZE + 1, after=cursor)
+        if len(products) > SEARCH_PAGE_SIZE:
+            products = products[:SEARCH_PAGE_SIZE]
+            last = products[-1]
+            next_after = f"{last.rank!r}:{last.id}"
+
+    return render_template(
+        "product/search.html", q=q, products=products, next_after=next_after
+    )
 
 
 @bp.route("/create", methods=("GET", "POST"))
@@ -40,51 +76,74 @@ def create():
         if error is not None:
             flash(error)
         else:
-            db = get_db()
-            db.execute(
-                text(
-                    "INSERT INTO products (name, description, price, seller_id)"
-                    " VALUES (:name, :description, :price, :seller_id)"
-                ),
-                {
-                    "name": name,
-                    "description": description,
-                    "price": price,
-                    "seller_id": g.user["id"],
-                },
-            )
-            db.commit()
+            queries.create_product(name, description, price, g.user.id)
+            get_db().commit()
             return redirect(url_for("product.index"))
 
     return render_template("product/create.html")
 
 
+def _product_cache():
+    return current_app.extensions.setdefault("product_cache", {})
+
+
+def invalidate_product(id):
+    """Drop a product from both the request identity map and the app cache."""
+    g.setdefault("products", {}).pop(id, None)
+    _product_cache().pop(id, None)
+
+
+def _load_product(id):
+    # Per-request identity map: repeated lookups within one request are free
+    products = g.setdefault("products", {})
+    if id in products:
+        return products[id]
+
+    # Short-lived cross-request cache, keyed by product id
+    ttl = current_app.config["PRODUCT_CACHE_TTL"]
+    cache = _product_cache()
+    cached = cache.get(id)
+    if cached is not None and cached[0] > time.monotonic():
+        products[id] = cached[1]
+        return cached[1]
+
+    product = queries.find_product(id)
+    products[id] = product
+    if product is not None and ttl > 0:
+        if len(cache) >= PRODUCT_CACHE_MAX_SIZE:
+            cache.clear()
+        cache[id] = (time.monotonic() + ttl, product)
+    return product
+
+
 def get_product(id, check_seller=True):
-    product = (
-        get_db()
-        .execute(
-            text(
-                "SELECT p.id, p.name, p.description, p.price, p.created_at, p.seller_id, u.first_name"
-                " FROM products p JOIN users u ON p.seller_id = u.id"
-                " WHERE p.id = :id"
-            ),
-            {"id": id},
-        )
-        .fetchone()
-    )
+    product = _load_product(id)
 
     if product is None:
         abort(404, f"Product id {id} doesn't exist.")
 
-    if check_seller and product["seller_id"] != g.user["id"]:
+    if check_seller and product.seller_id != g.user.id:
         abort(403)
 
     return product
 
 
+def abort_for_product_write(id):
+    """
+    Abort with the appropriate error after a seller-scoped write matched no rows.
+
+    The write already checked ownership, so the product is re-read uncached
+    only to tell a missing product (404) apart from someone else's (403).
+    """
+    invalidate_product(id)
+    get_product(id)
+    abort(404, f"Product id {id} doesn't exist.")
+
+
 @bp.route("/<int:id>/update", methods=("GET", "POST"))
 @login_required
 def update(id):
+    # Usually served from the product cache warmed by rendering this form
     product = get_product(id)
 
     if request.method == "POST":
@@ -103,15 +162,12 @@ def update(id):
         if error is not None:
             flash(error)
         else:
-            db = get_db()
-            db.execute(
-                text(
-                    "UPDATE products SET name = :name, description = :description, price = :price"
-                    " WHERE id = :id",
-                ),
-                {"name": name, "description": description, "price": price, "id": id},
-            )
-            db.commit()
+            # Re-check ownership as part of the write itself, since the product
+            # above may have come from the cache
+            if not queries.update_product(id, g.user.id, name, description, price):
+                abort_for_product_write(id)
+            get_db().commit()
+            invalidate_product(id)
             return redirect(url_for("product.index"))
 
     return render_template("product/update.html", product=product)
@@ -120,8 +176,9 @@ def update(id):
 @bp.route("/<int:id>/delete", methods=("POST",))
 @login_required
 def delete(id):
-    get_product(id)
-    db = get_db()
-    db.execute(text("DELETE FROM products WHERE id = :id"), {"id": id})
-    db.commit()
+    # Check ownership and delete in a single round-trip
+    if not queries.delete_product(id, g.user.id):
+        abort_for_product_write(id)
+    get_db().commit()
+    invalidate_product(id)
     return redirect(url_for("product.index"))
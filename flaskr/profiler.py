@@ -0,0 +1,146 @@
+"""
+Per-request profiling for slow requests.
+
+When `PROFILING` is enabled, a request is profiled with cProfile if it sends
+the `PROFILING_HEADER` header set to `PROFILING_SECRET` (or with any value in
+debug mode, when no secret is configured), or at random with probability
+`PROFILING_SAMPLE_RATE`. Sampled requests slower than `PROFILING_THRESHOLD`
+seconds (and every header-triggered request) are saved as pstats files under
+`PROFILING_DIR`, which defaults to `profiles/` in the instance folder. Only
+the newest `PROFILING_MAX_FILES` profiles are kept.
+
+Use `flask profiles list` and `flask profiles show <name>` to inspect them.
+"""
+
+import cProfile
+import hmac
+import os
+import pstats
+import random
+import re
+import time
+import uuid
+from datetime import datetime
+
+import click
+from flask import current_app, g, request
+from flask.cli import AppGroup
+
+
+def init_app(app):
+    if app.config["PROFILING_DIR"] is None:
+        app.config["PROFILING_DIR"] = os.path.join(app.instance_path, "profiles")
+    app.cli.add_command(profiles_cli)
+
+    if not app.config["PROFILING"]:
+        return
+
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+    app.teardown_request(_stop_profile)
+
+
+def _forced():
+    """Return whether the request asks to be profiled, and may."""
+    config = current_app.config
+    value = request.headers.get(config["PROFILING_HEADER"])
+    if value is None:
+        return False
+    if config["PROFILING_SECRET"] is None:
+        return current_app.debug
+    return hmac.compare_digest(value.encode(), config["PROFILING_SECRET"].encode())
+
+
+def _start_profile():
+    config = current_app.config
+    forced = _forced()
+    if not forced and random.random() >= config["PROFILING_SAMPLE_RATE"]:
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler is already active in this process
+        return
+    g.profile = (profiler, time.perf_counter(), forced)
+
+
+def _stop_profile(exception=None):
+    # after_request hooks don't run when a view raises, so make sure the
+    # profiler never stays enabled past its request
+    if "profile" in g:
+        profiler, _, _ = g.pop("profile")
+        profiler.disable()
+
+
+def _finish_profile(response):
+    if "profile" not in g:
+        return response
+
+    profiler, start, forced = g.pop("profile")
+    profiler.disable()
+    duration = time.perf_counter() - start
+    if not forced and duration < current_app.config["PROFILING_THRESHOLD"]:
+        return response
+
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    endpoint = request.endpoint or "unknown"
+    name = "{}-{}-{}.pstats".format(
+        datetime.utcnow().strftime("%Y%m%dT%H%M%S"),
+        endpoint,
+        re.sub(r"[^\w.-]", "_", request_id),
+    )
+    directory = current_app.config["PROFILING_DIR"]
+    os.makedirs(directory, exist_ok=True)
+    profiler.dump_stats(os.path.join(directory, name))
+    _prune_profiles(directory, current_app.config["PROFILING_MAX_FILES"])
+    current_app.logger.info(f"Saved {duration:.3f}s profile of {endpoint} to {name}")
+
+    response.headers["X-Profile"] = name
+    return response
+
+
+def _prune_profiles(directory, max_files):
+    """Delete the oldest profiles beyond the newest `max_files`."""
+    # Names start with a UTC timestamp, so they sort oldest first
+    names = sorted(name for name in os.listdir(directory) if name.endswith(".pstats"))
+    for name in names[: max(len(names) - max_files, 0)]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            # Pruned concurrently by another worker
+            pass
+
+
+profiles_cli = AppGroup("profiles", help="Inspect profiles of slow requests.")
+
+
+@profiles_cli.command("list")
+def list_profiles_command():
+    """List captured profiles, newest first."""
+    directory = current_app.config["PROFILING_DIR"]
+    names = []
+    if os.path.isdir(directory):
+        names = sorted(
+            (name for name in os.listdir(directory) if name.endswith(".pstats")),
+            reverse=True,
+        )
+    if not names:
+        click.echo(f"No profiles in {directory}.")
+    for name in names:
+        stats = pstats.Stats(os.path.join(directory, name))
+        click.echo(f"{name}  {stats.total_tt:.3f}s  {stats.total_calls} calls")
+
+
+@profiles_cli.command("show")
+@click.argument("name")
+@click.option("--sort", default="cumulative", help="pstats sort key.")
+@click.option("--limit", default=25, help="Number of functions to show.")
+def show_profile_command(name, sort, limit):
+    """Summarize the functions taking the most time in a profile."""
+    path = os.path.join(current_app.config["PROFILING_DIR"], os.path.basename(name))
+    if not os.path.exists(path):
+        raise click.ClickException(f"No profile named {name}.")
+    stats = pstats.Stats(path, stream=click.get_text_stream("stdout"))
+    stats.sort_stats(sort).print_stats(limit)
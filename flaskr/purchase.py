@@ -1,9 +1,11 @@
 from flask import Blueprint, flash, g, redirect, render_template, request, url_for
-from sqlalchemy import text
+from sqlalchemy import exc
+from werkzeug.exceptions import abort
 
+from flaskr import queries
 from flaskr.auth import login_required
 from flaskr.db import get_db
-from flaskr.product import get_product
+from flaskr.product import get_product, invalidate_product
 
 bp = Blueprint("purchase", __name__)
 
@@ -36,22 +38,18 @@ def create(product_id):
             flash(error)
         else:
             db = get_db()
-            db.execute(
-                text(
-                    "INSERT INTO purchases (product_id, street_1, street_2, city, state, zip, buyer_id)"
-                    " VALUES (:product_id, :street_1, :street_2, :city, :state, :zip, :buyer_id)"
-                ),
-                {
-                    "product_id": product_id,
-                    "street_1": street_1,
-                    "street_2": street_2,
-                    "city": city,
-                    "state": state,
-                    "zip": zip,
-                    "buyer_id": g.user["id"],
-                },
-            )
-            db.commit()
+            try:
+                created = queries.create_purchase(
+                    product_id, g.user.id, street_1, street_2, city, state, zip
+                )
+                db.commit()
+            except exc.IntegrityError:
+                created = False
+            if not created:
+                # The product was deleted since it was cached
+                db.rollback()
+                invalidate_product(product_id)
+                abort(404, f"Product id {product_id} doesn't exist.")
             return redirect(url_for("product.index"))
 
     return render_template("purchase/create.html", product=product)
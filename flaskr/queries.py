@@ -0,0 +1,378 @@
+"""
+Every query the app runs against its own tables.
+
+Statements are built once at import time rather than per call, so their bind
+parameters are parsed once and SQLAlchemy's compiled cache hits on the same
+statement object every time. Each one selects only the columns its caller
+uses, and results come back as small `__slots__` records rather than rows.
+
+Writes don't commit: callers commit through `get_db()` once they're done.
+"""
+
+from sqlalchemy import text
+
+from flaskr.db import get_db
+
+
+class Record:
+    """A lightweight, immutable-by-convention result row with named fields."""
+
+    __slots__ = ()
+    _fields = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._fields = cls._fields + cls.__dict__.get("__slots__", ())
+
+    def __init__(self, *values):
+        for name, value in zip(self._fields, values):
+            setattr(self, name, value)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            getattr(self, name) == getattr(other, name) for name in self._fields
+        )
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self._fields)
+        return f"{type(self).__name__}({fields})"
+
+
+class User(Record):
+    __slots__ = ("id", "email", "first_name")
+
+
+class Credentials(Record):
+    __slots__ = ("id", "password")
+
+
+class Product(Record):
+    __slots__ = (
+        "id",
+        "name",
+        "description",
+        "price",
+        "created_at",
+        "seller_id",
+        "first_name",
+    )
+
+
+class SearchResult(Product):
+    __slots__ = ("rank",)
+
+
+class ProductSales(Record):
+    __slots__ = ("id", "name", "price", "purchase_count", "revenue")
+
+
+# Users
+
+INSERT_USER = text(
+    "INSERT INTO users (email, password, first_name, last_name)"
+    " VALUES (:email, :password, :first_name, :last_name)"
+)
+SELECT_CREDENTIALS = text("SELECT id, password FROM users WHERE email = :email")
+SELECT_USER = text("SELECT id, email, first_name FROM users WHERE id = :id")
+
+
+def create_user(email, password, first_name, last_name):
+    """Insert a user, given their already hashed password."""
+    get_db().execute(
+        INSERT_USER,
+        {
+            "email": email,
+            "password": password,
+            "first_name": first_name,
+            "last_name": last_name,
+        },
+    )
+
+
+def get_credentials(email):
+    row = get_db().execute(SELECT_CREDENTIALS, {"email": email}).fetchone()
+    return None if row is None else Credentials(*row)
+
+
+def get_user(id):
+    row = get_db(readonly=True).execute(SELECT_USER, {"id": id}).fetchone()
+    return None if row is None else User(*row)
+
+
+# Products
+
+PRODUCT_COLUMNS = (
+    "p.id, p.name, p.description, p.price, p.created_at, p.seller_id, u.first_name"
+)
+SELECT_PRODUCTS = text(
+    f"SELECT {PRODUCT_COLUMNS}"
+    " FROM products p JOIN users u ON p.seller_id = u.id"
+    " ORDER BY p.created_at DESC"
+)
+SELECT_PRODUCT = text(
+    f"SELECT {PRODUCT_COLUMNS}"
+    " FROM products p JOIN users u ON p.seller_id = u.id"
+    " WHERE p.id = :id"
+)
+
+
+def _search_statement(keyset):
+    return text(
+        f"SELECT {PRODUCT_COLUMNS}, p.rank"
+        " FROM ("
+        "  SELECT p.id, p.name, p.description, p.price, p.created_at, p.seller_id,"
+        "  ts_rank(p.search_vector, query) AS rank"
+        "  FROM products p, websearch_to_tsquery('english', :q) query"
+        "  WHERE p.search_vector @@ query"
+        " ) p JOIN users u ON p.seller_id = u.id"
+        + keyset
+        + " ORDER BY p.rank DESC, p.id DESC"
+        " LIMIT :limit"
+    )
+
+
+SEARCH_PRODUCTS = _search_statement("")
+# Keyset pagination: continue after the last (rank, id) shown
+SEARCH_PRODUCTS_AFTER = _search_statement(
+    " WHERE (p.rank, p.id) < (CAST(:after_rank AS REAL), :after_id)"
+)
+INSERT_PRODUCT = text(
+    "INSERT INTO products (name, description, price, seller_id)"
+    " VALUES (:name, :description, :price, :seller_id)"
+)
+# Writes are scoped to the seller, so ownership is checked by the write itself
+UPDATE_PRODUCT = text(
+    "UPDATE products SET name = :name, description = :description, price = :price"
+    " WHERE id = :id AND seller_id = :seller_id"
+    " RETURNING id"
+)
+DELETE_PRODUCT = text(
+    "DELETE FROM products WHERE id = :id AND seller_id = :seller_id RETURNING id"
+)
+SELECT_PRODUCT_SALES = text(
+    "SELECT p.id, p.name, p.price,"
+    " COALESCE(s.purchase_count, 0) AS purchase_count,"
+    " COALESCE(s.revenue, 0) AS revenue"
+    " FROM products p LEFT JOIN product_sales s ON s.product_id = p.id"
+    " WHERE p.seller_id = :seller_id"
+    " ORDER BY revenue DESC, p.id"
+)
+
+
+def list_products():
+    return [Product(*row) for row in get_db(readonly=True).execute(SELECT_PRODUCTS)]
+
+
+def find_product(id):
+    row = get_db(readonly=True).execute(SELECT_PRODUCT, {"id": id}).fetchone()
+    return None if row is None else Product(*row)
+
+
+def search_products(q, limit, after=None):
+    """
+    Return up to `limit` products matching the search `q`, best match first.
+
+    Pass the `(rank, id)` of the last result shown as `after` for the next page.
+    """
+    params = {"q": q, "limit": limit}
+    statement = SEARCH_PRODUCTS
+    if after is not None:
+        params["after_rank"], params["after_id"] = after
+        statement = SEARCH_PRODUCTS_AFTER
+    return [
+        SearchResult(*row) for row in get_db(readonly=True).execute(statement, params)
+    ]
+
+
+EXPORT_COLUMNS = ("id", "name", "description", "price", "created_at", "seller_id")
+EXPORT_PRODUCTS = text(
+    f"SELECT {', '.join(EXPORT_COLUMNS)} FROM products" " ORDER BY created_at, id"
+)
+EXPORT_PRODUCTS_SINCE = text(
+    f"SELECT {', '.join(EXPORT_COLUMNS)} FROM products"
+    " WHERE created_at > :since"
+    " ORDER BY created_at, id"
+)
+
+
+def export_products(batch_size, since=None):
+    """
+    Yield every product (or those created after `since`) in batches of rows.
+
+    Rows are fetched through a server-side cursor, `batch_size` at a time, so
+    memory use doesn't grow with the size of the catalog. Each row is a tuple
+    of `EXPORT_COLUMNS`.
+    """
+    statement, params = EXPORT_PRODUCTS, {}
+    if since is not None:
+        statement, params = EXPORT_PRODUCTS_SINCE, {"since": since}
+    result = get_db(readonly=True).execute(
+        statement.execution_options(stream_results=True, max_row_buffer=batch_size),
+        params,
+    )
+    try:
+        yield from result.partitions(batch_size)
+    finally:
+        result.close()
+
+
+def create_product(name, description, price, seller_id):
+    get_db().execute(
+        INSERT_PRODUCT,
+        {
+            "name": name,
+            "description": description,
+            "price": price,
+            "seller_id": seller_id,
+        },
+    )
+
+
+# Bulk imports are COPYed into a staging table, then merged in one statement
+CREATE_PRODUCT_IMPORT = text(
+    "CREATE TEMPORARY TABLE product_import ("
+    " line INTEGER NOT NULL,"
+    " name TEXT NOT NULL,"
+    " description TEXT NOT NULL,"
+    " price REAL NOT NULL"
+    ")"
+)
+COPY_PRODUCT_IMPORT = (
+    "COPY product_import (line, name, description, price) FROM STDIN WITH (FORMAT csv)"
+)
+# Staged rows the insert doesn't return conflict with an existing product,
+# including one inserted concurrently since the rows were staged
+MERGE_PRODUCT_IMPORT = text(
+    "WITH inserted AS ("
+    " INSERT INTO products (name, description, price, seller_id)"
+    " SELECT name, description, price, :seller_id FROM product_import"
+    " ORDER BY line"
+    " ON CONFLICT (name) DO NOTHING"
+    " RETURNING name"
+    ")"
+    " SELECT i.line, i.name, inserted.name IS NOT NULL AS inserted"
+    " FROM product_import i LEFT JOIN inserted ON inserted.name = i.name"
+    " ORDER BY i.line"
+)
+DROP_PRODUCT_IMPORT = text("DROP TABLE product_import")
+
+
+def import_products(csv_file, seller_id):
+    """
+    Add the products in `csv_file` for the seller, skipping any whose name exists.
+
+    `csv_file` is read by COPY, so only needs a `read(size)` method returning
+    CSV lines of (line, name, description, price). Returns the number of
+    products added and the (line, name) of each skipped one.
+    """
+    db = get_db()
+    db.execute(CREATE_PRODUCT_IMPORT)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(COPY_PRODUCT_IMPORT, csv_file)
+    finally:
+        cursor.close()
+    imported, conflicts = 0, []
+    for line, name, inserted in db.execute(
+        MERGE_PRODUCT_IMPORT, {"seller_id": seller_id}
+    ):
+        if inserted:
+            imported += 1
+        else:
+            conflicts.append((line, name))
+    db.execute(DROP_PRODUCT_IMPORT)
+    return imported, conflicts
+
+
+def update_product(id, seller_id, name, description, price):
+    """Update one of the seller's products, returning False if there's none."""
+    updated = (
+        get_db()
+        .execute(
+            UPDATE_PRODUCT,
+            {
+                "name": name,
+                "description": description,
+                "price": price,
+                "id": id,
+                "seller_id": seller_id,
+            },
+        )
+        .fetchone()
+    )
+    return updated is not None
+
+
+def delete_product(id, seller_id):
+    """Delete one of the seller's products, returning False if there's none."""
+    deleted = (
+        get_db().execute(DELETE_PRODUCT, {"id": id, "seller_id": seller_id}).fetchone()
+    )
+    return deleted is not None
+
+
+def list_product_sales(seller_id):
+    """Return the seller's products with their sales, best selling first."""
+    # Reads the pre-aggregated product_sales counters, so this only touches
+    # the seller's products rather than every purchase
+    return [
+        ProductSales(*row)
+        for row in get_db(readonly=True).execute(
+            SELECT_PRODUCT_SALES, {"seller_id": seller_id}
+        )
+    ]
+
+
+# Purchases
+
+# Purchases keep the product's current price, which later edits don't change
+INSERT_PURCHASE = text(
+    "INSERT INTO purchases"
+    " (product_id, street_1, street_2, city, state, zip, buyer_id, price)"
+    " SELECT id, :street_1, :street_2, :city, :state, :zip, :buyer_id, price"
+    " FROM products WHERE id = :product_id"
+    " RETURNING price"
+)
+RECORD_SALE = text(
+    "INSERT INTO product_sales (product_id, seller_id, purchase_count, revenue)"
+    " SELECT id, seller_id, 1, :price FROM products WHERE id = :product_id"
+    " ON CONFLICT (product_id) DO UPDATE SET"
+    " purchase_count = product_sales.purchase_count + 1,"
+    " revenue = product_sales.revenue + EXCLUDED.revenue"
+)
+
+
+def create_purchase(product_id, buyer_id, street_1, street_2, city, state, zip):
+    """
+    Insert a purchase and count it towards the product's sales.
+
+    Returns False if the product doesn't exist.
+    """
+    db = get_db()
+    price = db.execute(
+        INSERT_PURCHASE,
+        {
+            "product_id": product_id,
+            "street_1": street_1,
+            "street_2": street_2,
+            "city": city,
+            "state": state,
+            "zip": zip,
+            "buyer_id": buyer_id,
+        },
+    ).scalar()
+    if price is None:
+        return False
+    record_sale(product_id, price)
+    return True
+
+
+def record_sale(product_id, price):
+    """
+    Count a new purchase of the given product, at the given price, towards
+    its seller's sales.
+
+    Call this in the same transaction as the purchase INSERT so the counters
+    never drift from the purchases table.
+    """
+    get_db().execute(RECORD_SALE, {"product_id": product_id, "price": price})
@@ -0,0 +1,409 @@
+"""
+Scripted fidesops privacy request workloads, replayable across versions.
+
+`flaskr/fidesops.py` prompts for each request's data categories, action type
+and email. `python -m flaskr.scenarios SCENARIO_FILE` instead runs the
+scenarios described in a YAML file, without prompts:
+
+    scenarios:
+      - name: access_contact
+        policy: scenario_access_policy
+        action_type: access
+        data_categories: [user.contact, user.name]
+        identities: [user@example.com, admin@example.com]
+      - name: erasure_batch
+        policy: scenario_erasure_policy
+        action_type: erasure
+        data_categories: [user.contact]
+        # One email per line, relative to the scenario file
+        identities_file: emails.txt
+        timeout: 300
+
+After setting up fidesops' defaults like `fidesops.py --setup-only`, each
+scenario goes through three timed phases:
+
+- setup: (re)create its policy, with a single rule targeting its categories
+- submission: submit a privacy request per identity
+- completion: poll the requests' statuses until they have all finished
+
+Requests are recorded in the ledger of `flaskr/ledger.py` under the run's
+`--batch`, so running an interrupted batch again resumes it: identities it
+already submitted are skipped, and only its unfinished requests are polled.
+
+The runner prints each phase's time per scenario and the metrics of the
+fidesops API calls it made (see `flaskr/client_metrics.py`). To compare runs,
+`--output` also writes the timings as JSON and `--metrics` the API metrics
+in Prometheus text format. It exits 1 if any scenario failed: an API call
+raised an error, or a request didn't end up `complete` within the
+scenario's timeout.
+"""
+
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import click
+import yaml
+
+from flaskr import fidesops
+from flaskr.ledger import FINISHED, LEDGER, Ledger
+
+ACTION_TYPES = ("access", "erasure")
+
+DEFAULT_TIMEOUT = 60
+
+POLL_INTERVAL = 0.5
+
+PHASES = ("setup", "submission", "completion")
+
+
+class Scenario:
+    __slots__ = (
+        "name",
+        "policy",
+        "action_type",
+        "data_categories",
+        "identities",
+        "timeout",
+    )
+
+    def __init__(
+        self,
+        name,
+        policy,
+        action_type,
+        data_categories,
+        identities,
+        timeout=DEFAULT_TIMEOUT,
+    ):
+        self.name = name
+        self.policy = policy
+        self.action_type = action_type
+        self.data_categories = data_categories
+        self.identities = identities
+        # Seconds to wait for the requests to finish
+        self.timeout = timeout
+
+    @property
+    def rule(self):
+        return f"{self.policy}_rule"
+
+
+class Result:
+    __slots__ = ("scenario", "timings", "statuses", "resumed", "error")
+
+    def __init__(self, scenario):
+        self.scenario = scenario
+        # phase -> seconds, for the phases that ran
+        self.timings = {}
+        # privacy request id -> its last known status
+        self.statuses = {}
+        # identities skipped as submitted by an earlier run of the batch
+        self.resumed = 0
+        self.error = None
+
+    @property
+    def failed(self):
+        return self.error is not None or any(
+            status != "complete" for status in self.statuses.values()
+        )
+
+    def as_dict(self):
+        counts = {}
+        for status in self.statuses.values():
+            counts[status] = counts.get(status, 0) + 1
+        return {
+            "name": self.scenario.name,
+            "requests": len(self.statuses),
+            "timings": self.timings,
+            "statuses": counts,
+            "resumed": self.resumed,
+            "error": self.error,
+        }
+
+
+def load_scenarios(path):
+    """Parse a scenario file, raising ValueError if it is invalid."""
+    with open(path) as file:
+        content = yaml.safe_load(file) or {}
+    if not isinstance(content, dict) or not content.get("scenarios"):
+        raise ValueError(f"{path} has no scenarios.")
+
+    scenarios = []
+    fields = set(Scenario.__slots__) | {"identities_file"}
+    for i, scenario in enumerate(content["scenarios"]):
+        name = scenario.get("name") or f"#{i + 1}"
+        unknown = sorted(set(scenario) - fields)
+        if unknown:
+            raise ValueError(f"Scenario {name} has unknown keys {', '.join(unknown)}.")
+        for key in ("name", "policy", "action_type", "data_categories"):
+            if not scenario.get(key):
+                raise ValueError(f"Scenario {name} has no {key}.")
+        if scenario["action_type"] not in ACTION_TYPES:
+            raise ValueError(
+                f"Scenario {name} has unknown action type {scenario['action_type']}."
+            )
+        if any(s.name == name for s in scenarios):
+            raise ValueError(f"Duplicate scenario {name}.")
+
+        identities = list(scenario.get("identities") or ())
+        if scenario.get("identities_file"):
+            identities_path = os.path.join(
+                os.path.dirname(path), scenario["identities_file"]
+            )
+            with open(identities_path) as file:
+                identities += [line.strip() for line in file if line.strip()]
+        if not identities:
+            raise ValueError(f"Scenario {name} has no identities.")
+        # The ledger keeps one request per identity
+        identities = list(dict.fromkeys(identities))
+
+        scenarios.append(
+            Scenario(
+                name,
+                scenario["policy"],
+                scenario["action_type"],
+                list(scenario["data_categories"]),
+                identities,
+                scenario.get("timeout", DEFAULT_TIMEOUT),
+            )
+        )
+    return scenarios
+
+
+@contextmanager
+def timed(timings, phase):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = time.perf_counter() - start
+
+
+def configure_policy(scenario, access_token):
+    """(Re)create the scenario's policy, with one rule targeting its categories."""
+    fidesops.create_policy(key=scenario.policy, access_token=access_token)
+    fidesops.delete_policy_rule(
+        policy_key=scenario.policy, key=scenario.rule, access_token=access_token
+    )
+    if scenario.action_type == "access":
+        storage_destination_key, masking_strategy = "default_storage", None
+    else:
+        storage_destination_key = None
+        masking_strategy = {"strategy": "hmac", "configuration": {}}
+    fidesops.create_policy_rule(
+        policy_key=scenario.policy,
+        key=scenario.rule,
+        action_type=scenario.action_type,
+        storage_destination_key=storage_destination_key,
+        masking_strategy=masking_strategy,
+        access_token=access_token,
+    )
+    for data_category in scenario.data_categories:
+        fidesops.create_policy_rule_target(
+            policy_key=scenario.policy,
+            rule_key=scenario.rule,
+            data_category=data_category,
+            access_token=access_token,
+        )
+
+
+def wait_for_completion(statuses, access_token, timeout, ledger=None):
+    """
+    Poll the privacy requests in `statuses` (id -> status) until they have
+    all finished or the timeout has passed, updating their statuses (and the
+    ledger's) after each round.
+    """
+    deadline = time.monotonic() + timeout
+    pending = [
+        request_id for request_id, status in statuses.items() if status not in FINISHED
+    ]
+    while pending:
+        for request_id in pending:
+            statuses[request_id] = fidesops.get_privacy_request(
+                privacy_request_id=request_id, access_token=access_token
+            )["status"]
+        if ledger is not None:
+            ledger.update({request_id: statuses[request_id] for request_id in pending})
+        pending = [
+            request_id for request_id in pending if statuses[request_id] not in FINISHED
+        ]
+        if not pending or time.monotonic() >= deadline:
+            return
+        time.sleep(POLL_INTERVAL)
+
+
+def run_scenario(scenario, access_token, ledger, batch):
+    """
+    Run a scenario's phases as part of a batch, returning its `Result`.
+
+    Identities the ledger already has a request for in the batch aren't
+    submitted again, nor are identities listed twice, and only the batch's
+    unfinished requests are polled.
+    """
+    result = Result(scenario)
+    try:
+        with timed(result.timings, "setup"):
+            configure_policy(scenario, access_token)
+        with timed(result.timings, "submission"):
+            recorded = ledger.requests(batch, scenario.policy)
+            for email in dict.fromkeys(scenario.identities):
+                if email in recorded:
+                    result.resumed += 1
+                    continue
+                privacy_requests = fidesops.create_privacy_request(
+                    email=email, policy_key=scenario.policy, access_token=access_token
+                )
+                for privacy_request in privacy_requests["succeeded"]:
+                    ledger.record(
+                        email,
+                        scenario.policy,
+                        batch,
+                        privacy_request["id"],
+                        privacy_request["status"],
+                    )
+        with timed(result.timings, "completion"):
+            wait_for_completion(
+                ledger.pending(batch, scenario.policy),
+                access_token,
+                scenario.timeout,
+                ledger,
+            )
+    except RuntimeError as error:
+        result.error = str(error.args[0])
+
+    identities = set(scenario.identities)
+    result.statuses = {
+        request_id: status
+        for identity, (request_id, status) in ledger.requests(
+            batch, scenario.policy
+        ).items()
+        if identity in identities
+    }
+    return result
+
+
+def print_results(batch, setup_time, results):
+    click.echo(f"Batch {batch}: fidesops defaults set up in {setup_time:.2f}s")
+    click.echo(
+        f"{'scenario':<24} {'requests':>8} {'failed':>6}"
+        + "".join(f" {phase:>11}" for phase in PHASES)
+    )
+    for result in results:
+        failed = sum(status != "complete" for status in result.statuses.values())
+        click.echo(
+            f"{result.scenario.name:<24} {len(result.statuses):>8} {failed:>6}"
+            + "".join(
+                (
+                    f" {result.timings[phase]:>10.2f}s"
+                    if phase in result.timings
+                    else " " * 12
+                )
+                for phase in PHASES
+            )
+        )
+    for result in results:
+        if result.resumed:
+            click.echo(
+                f"{result.scenario.name} resumed, skipping {result.resumed}"
+                " identities already submitted"
+            )
+        if result.error is not None:
+            click.echo(f"{result.scenario.name} failed: {result.error}", err=True)
+        elif result.failed:
+            unfinished = sorted(
+                f"{request_id} ({status})"
+                for request_id, status in result.statuses.items()
+                if status != "complete"
+            )
+            click.echo(
+                f"{result.scenario.name} failed: {', '.join(unfinished)}", err=True
+            )
+
+
+@click.command()
+@click.argument("scenario_file", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--output",
+    type=click.Path(dir_okay=False),
+    help="Also write the timings & statuses as JSON.",
+)
+@click.option(
+    "--batch",
+    help="Name of the submission batch. Pass an earlier run's to resume it;"
+    " defaults to a new batch named after the current time.",
+)
+@click.option(
+    "--ledger",
+    "ledger_path",
+    default=LEDGER,
+    show_default=True,
+    type=click.Path(dir_okay=False),
+    help="The SQLite ledger of submitted requests.",
+)
+@click.option(
+    "--metrics",
+    "metrics_path",
+    type=click.Path(dir_okay=False),
+    help="Also write the fidesops API call metrics in Prometheus text format.",
+)
+@click.option("--verbose", is_flag=True, help="Log every fidesops API call.")
+def main(scenario_file, output, batch, ledger_path, metrics_path, verbose):
+    """Run the privacy request scenarios in SCENARIO_FILE against fidesops."""
+    logging.basicConfig(level=logging.INFO if verbose else logging.WARN)
+    try:
+        scenarios = load_scenarios(scenario_file)
+    except (ValueError, OSError, yaml.YAMLError) as error:
+        raise click.ClickException(str(error))
+
+    start = time.perf_counter()
+    fidesops.wait_for_health()
+    try:
+        root_token = fidesops.get_access_token(
+            client_id=fidesops.ROOT_CLIENT_ID,
+            client_secret=fidesops.ROOT_CLIENT_SECRET,
+        )
+        client = fidesops.create_oauth_client(access_token=root_token)
+        access_token = fidesops.get_access_token(
+            client_id=client["client_id"], client_secret=client["client_secret"]
+        )
+        fidesops.setup_defaults(access_token=access_token)
+    except RuntimeError as error:
+        raise click.ClickException(str(error.args[0]))
+    setup_time = time.perf_counter() - start
+
+    if batch is None:
+        batch = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    directory = os.path.dirname(ledger_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    ledger = Ledger(ledger_path)
+    try:
+        results = [
+            run_scenario(scenario, access_token, ledger, batch)
+            for scenario in scenarios
+        ]
+    finally:
+        ledger.close()
+    print_results(batch, setup_time, results)
+    fidesops.report_metrics(metrics_path)
+    if output is not None:
+        with open(output, "w") as file:
+            json.dump(
+                {
+                    "batch": batch,
+                    "setup": setup_time,
+                    "scenarios": [result.as_dict() for result in results],
+                },
+                file,
+                indent=2,
+            )
+    if any(result.failed for result in results):
+        click.get_current_context().exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Production serving for flaskr under gunicorn's preforking server.
+
+`flask serve` warms the app up in the master process (create_app compiles
+every template, then the database engine is created) and then forks the
+workers, so each worker starts ready to handle requests. Send SIGHUP to the master to gracefully
+replace the workers after a config change, or SIGUSR2 followed by SIGTERM
+to the old master to pick up new code without dropping requests.
+"""
+
+import multiprocessing
+
+import click
+from flask.cli import pass_script_info
+from sqlalchemy import text
+
+from flaskr.db import _db, get_engines
+from flaskr.partitions import create_purchase_partitions
+
+
+def warm_up(app):
+    """Do the per-process setup that would otherwise slow the first requests."""
+    # NOTE: templates are already compiled by create_app
+    with app.app_context():
+        _db.session.execute(text("SELECT 1"))
+        # Keep the upcoming months' purchases partitions in place on each start
+        create_purchase_partitions(app.config["PURCHASE_PARTITION_MONTHS_AHEAD"])
+        _db.session.commit()
+        _db.session.remove()
+
+
+def dispose_engine(app):
+    """
+    Drop the database connections inherited from the master after a fork.
+
+    With close=False the sockets are left for the master to close, rather than
+    being shut down from the child and breaking the master's connections.
+    """
+    for engine in get_engines(app):
+        engine.dispose(close=False)
+
+
+@click.command("serve")
+@click.option("--bind", default="127.0.0.1:2000", show_default=True)
+@click.option(
+    "--workers",
+    default=multiprocessing.cpu_count() * 2 + 1,
+    show_default=True,
+    help="Number of worker processes.",
+)
+@click.option(
+    "--threads", default=1, show_default=True, help="Threads per worker process."
+)
+@click.option("--timeout", default=30, show_default=True)
+@click.option("--graceful-timeout", default=30, show_default=True)
+@click.option("--pidfile", default=None, help="Where to write the master's pid.")
+@pass_script_info
+def serve_command(info, bind, workers, threads, timeout, graceful_timeout, pidfile):
+    """Serve the app under gunicorn with preloaded, forked workers."""
+    # NOTE: deliberately not run inside an app context, since the workers
+    # would inherit it and share it between requests
+    app = info.load_app()
+    warm_up(app)
+    click.echo(f"Serving on {bind} with {workers} workers x {threads} threads")
+
+    # gunicorn only runs on Unix, so only import it when actually serving
+    from gunicorn.app.base import BaseApplication
+
+    class FlaskrApplication(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    FlaskrApplication(
+        {
+            "bind": bind,
+            "workers": workers,
+            "threads": threads,
+            "timeout": timeout,
+            "graceful_timeout": graceful_timeout,
+            "pidfile": pidfile,
+            "preload_app": True,
+            "post_fork": lambda server, worker: dispose_engine(app),
+            "accesslog": "-",
+        },
+    ).run()
+
+
+def init_app(app):
+    app.cli.add_command(serve_command)
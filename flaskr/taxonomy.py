@@ -0,0 +1,255 @@
+"""
+The Fides taxonomy, precompiled for matching policies without fidesctl.
+
+Taxonomy keys are hierarchical: a policy rule targeting `user.contact`
+applies to a field annotated `user.contact.address.city`, and a declaration
+with the `provide.service.operations.e-commerce` data use falls under a rule
+on `provide`. The default taxonomy from fideslang plus the keys defined in
+`.fides/flaskr_extended_taxonomy.yml` are compiled into an index per type
+that gives every key a bit. A key's hierarchy is then the bitmask of itself
+and all of its parents, and a rule's values are the bitmask of its keys, so
+whether a key falls under a rule is a single AND.
+
+Rules are evaluated like `fidesctl evaluate`: a privacy declaration
+violates a REJECT rule when its data categories, data use and data subjects
+all match the rule's, and its data qualifier is the rule's or one of its
+children. `flask fides targets` lists the dataset fields each rule of a
+policy applies to.
+
+fideslang is only imported when the taxonomy is first loaded, as the rest of
+flaskr doesn't need it.
+"""
+
+import os
+
+import click
+from flask import current_app
+
+from flaskr.fides import fides_cli, load_manifest, load_manifests
+
+TAXONOMY = "flaskr_extended_taxonomy.yml"
+
+TYPES = ("data_category", "data_use", "data_subject", "data_qualifier")
+
+# fideslang's default for declarations & rules that don't give a qualifier
+DEFAULT_QUALIFIER = (
+    "aggregated.anonymized.unlinked_pseudonymized.pseudonymized.identified"
+)
+
+
+class Index:
+    """The keys of one taxonomy type, each with the bitmask of its hierarchy."""
+
+    __slots__ = ("key_type", "bits", "hierarchies")
+
+    def __init__(self, key_type, parents):
+        self.key_type = key_type
+        self.bits = {key: 1 << i for i, key in enumerate(sorted(parents))}
+        self.hierarchies = {}
+        for key in self.bits:
+            mask, parent, seen = 0, key, set()
+            while parent is not None and parent not in seen:
+                if parent not in self.bits:
+                    raise ValueError(f"Unknown parent {parent} of {key_type} {key}.")
+                seen.add(parent)
+                mask |= self.bits[parent]
+                parent = parents[parent]
+            self.hierarchies[key] = mask
+
+    def hierarchy(self, key):
+        try:
+            return self.hierarchies[key]
+        except KeyError:
+            raise ValueError(f"Unknown {self.key_type} {key}.") from None
+
+    def mask(self, keys):
+        """Return the bitmask of the given keys."""
+        mask = 0
+        for key in keys:
+            if key not in self.bits:
+                raise ValueError(f"Unknown {self.key_type} {key}.")
+            mask |= self.bits[key]
+        return mask
+
+    def match(self, keys, mask, matches="ANY"):
+        """
+        Return the keys that match a rule's `mask` of values, or [] if none do.
+
+        Like fidesctl, ANY matches the keys falling under any of the values,
+        ALL does too but only when every value is covered by one of the keys,
+        NONE matches every key when none falls under a value, and OTHER the
+        keys that don't.
+        """
+        hierarchies = [self.hierarchy(key) for key in keys]
+        if matches == "ANY":
+            return [k for k, h in zip(keys, hierarchies) if h & mask]
+        if matches == "ALL":
+            covered = 0
+            for h in hierarchies:
+                covered |= h
+            if covered & mask != mask:
+                return []
+            return [k for k, h in zip(keys, hierarchies) if h & mask]
+        if matches == "NONE":
+            return [] if any(h & mask for h in hierarchies) else list(keys)
+        if matches == "OTHER":
+            return [k for k, h in zip(keys, hierarchies) if not h & mask]
+        raise ValueError(f"Unknown match type {matches}.")
+
+
+class Taxonomy:
+    __slots__ = (*TYPES, "resources")
+
+    def __init__(self, resources):
+        # type -> fides_key -> resource, for their names, legal bases, etc.
+        self.resources = resources
+        for key_type in TYPES:
+            setattr(
+                self,
+                key_type,
+                Index(
+                    key_type,
+                    {
+                        key: resource.get("parent_key")
+                        for key, resource in resources.get(key_type, {}).items()
+                    },
+                ),
+            )
+
+
+class Rule:
+    """A policy rule, with its values compiled against a taxonomy."""
+
+    __slots__ = ("fides_key", "name", "action", "conditions", "qualifier", "taxonomy")
+
+    def __init__(self, rule, taxonomy):
+        self.fides_key = rule["fides_key"]
+        self.name = rule.get("name")
+        self.action = rule["action"]
+        self.taxonomy = taxonomy
+        # taxonomy type -> (matches, mask of values)
+        self.conditions = {
+            key_type: (
+                rule[field]["matches"],
+                getattr(taxonomy, key_type).mask(rule[field]["values"]),
+            )
+            for key_type, field in (
+                ("data_category", "data_categories"),
+                ("data_use", "data_uses"),
+                ("data_subject", "data_subjects"),
+            )
+        }
+        self.qualifier = taxonomy.data_qualifier.mask(
+            [rule.get("data_qualifier") or DEFAULT_QUALIFIER]
+        )
+
+    def targets(self, data_categories):
+        """Return which of a field's data categories the rule applies to."""
+        matches, mask = self.conditions["data_category"]
+        return self.taxonomy.data_category.match(data_categories, mask, matches)
+
+    def violations(self, declaration):
+        """
+        Return the data categories of a privacy declaration violating the rule.
+
+        The list is empty when the declaration complies with it.
+        """
+        if self.action != "REJECT":
+            return []
+        taxonomy = self.taxonomy
+        qualifier = declaration.get("data_qualifier") or DEFAULT_QUALIFIER
+        if not taxonomy.data_qualifier.hierarchy(qualifier) & self.qualifier:
+            return []
+        for key_type, keys in (
+            ("data_use", [declaration["data_use"]]),
+            ("data_subject", declaration["data_subjects"]),
+        ):
+            matches, mask = self.conditions[key_type]
+            if not getattr(taxonomy, key_type).match(keys, mask, matches):
+                return []
+        return self.targets(declaration["data_categories"])
+
+
+def load_taxonomy(path=None):
+    """Compile fideslang's default taxonomy, extended with a manifest's keys."""
+    from fideslang.default_taxonomy import DEFAULT_TAXONOMY
+
+    resources = {
+        key_type: {
+            item.fides_key: item.dict()
+            for item in getattr(DEFAULT_TAXONOMY, key_type, None) or ()
+        }
+        for key_type in TYPES
+    }
+    if path is None:
+        path = os.path.join(current_app.config["FIDES_DIR"], TAXONOMY)
+    for key_type, items in load_manifest(path).items():
+        if key_type in TYPES:
+            resources[key_type].update((item["fides_key"], item) for item in items)
+    return Taxonomy(resources)
+
+
+def get_taxonomy():
+    """Return the app's taxonomy, compiled on first use."""
+    if "taxonomy" not in current_app.extensions:
+        current_app.extensions["taxonomy"] = load_taxonomy()
+    return current_app.extensions["taxonomy"]
+
+
+def compile_policy(policy, taxonomy=None):
+    if taxonomy is None:
+        taxonomy = get_taxonomy()
+    return [Rule(rule, taxonomy) for rule in policy["rules"]]
+
+
+def dataset_fields(dataset):
+    """
+    Yield the `(path, data categories)` of every field in a dataset manifest.
+
+    Paths are `<dataset>.<collection>.<field>`, plus the names of any parent
+    fields for nested ones. Fields without data categories inherit their
+    parent's, then their collection's, then the dataset's.
+    """
+
+    def walk(fields, prefix, inherited):
+        for field in fields:
+            path = f"{prefix}.{field['name']}"
+            categories = field.get("data_categories") or inherited
+            if field.get("fields"):
+                yield from walk(field["fields"], path, categories)
+            else:
+                yield path, categories
+
+    for collection in dataset["collections"]:
+        yield from walk(
+            collection["fields"],
+            f"{dataset['fides_key']}.{collection['name']}",
+            collection.get("data_categories") or dataset.get("data_categories") or [],
+        )
+
+
+@fides_cli.command("targets")
+@click.argument("policy_key", required=False)
+def targets_command(policy_key):
+    """List the dataset fields each rule of a policy applies to."""
+    resources = load_manifests()
+    policies = resources.get("policy", [])
+    if not policies:
+        raise click.ClickException("No policies found.")
+    if policy_key is None:
+        policy = policies[0]
+    else:
+        policy = next((p for p in policies if p["fides_key"] == policy_key), None)
+        if policy is None:
+            raise click.BadParameter(f"No policy {policy_key}.")
+
+    fields = [
+        field
+        for dataset in resources.get("dataset", [])
+        for field in dataset_fields(dataset)
+    ]
+    for rule in compile_policy(policy):
+        for path, categories in fields:
+            targeted = rule.targets(categories)
+            if targeted:
+                click.echo(f"{rule.fides_key}\t{path}\t{', '.join(targeted)}")
@@ -0,0 +1,32 @@
+"""
+Template compilation setup.
+
+Compiled templates are cached as bytecode in the instance folder, so a fresh
+process loads them instead of recompiling from source, and every template is
+compiled eagerly when the app is created. Under `flask serve` this happens in
+the master before forking, so workers share the compiled templates.
+"""
+
+import os
+
+from jinja2 import FileSystemBytecodeCache
+
+
+def init_app(app):
+    """Configure the bytecode cache; must run before `app.jinja_env` is used."""
+    if app.config["TEMPLATE_BYTECODE_CACHE"]:
+        directory = os.path.join(app.instance_path, "jinja_cache")
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_options = {
+            **app.jinja_options,
+            "bytecode_cache": FileSystemBytecodeCache(directory),
+        }
+
+
+def precompile_templates(app):
+    """Compile every template the app can render, including blueprints' ones."""
+    if not app.config["TEMPLATE_PRECOMPILE"]:
+        return
+
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
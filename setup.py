@@ -5,7 +5,7 @@ install_requires = open("requirements.txt").read().strip().split("\n")
 setup(
     name='flaskr',
     version='1.0.0',
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks"]),
     include_package_data=True,
     zip_safe=False,
     install_requires=install_requires,
@@ -1,21 +1,88 @@
+import os
+
 import pytest
+from sqlalchemy import event, text
+
 from flaskr import create_app
-from flaskr.db import init_db
+from flaskr.db import _db, init_db
 
 
-@pytest.fixture
-def app():
-    app = create_app(
-        {
-            "TESTING": True,
-        }
-    )
+@pytest.fixture(scope="session")
+def instance_path(tmp_path_factory):
+    """An instance folder for test apps, rather than the checkout's."""
+    return str(tmp_path_factory.mktemp("instance"))
+
+
+@pytest.fixture(scope="session")
+def database(instance_path):
+    """
+    Build the schema once per test session, returning the app config to use it.
+
+    Each pytest-xdist worker gets its own Postgres schema, so workers can run
+    in parallel against the same database without seeing each other's rows.
+    """
+    schema = f"test_{os.environ.get('PYTEST_XDIST_WORKER', 'main')}"
+    config = {
+        "TESTING": True,
+        "SQLALCHEMY_ENGINE_OPTIONS": {
+            "connect_args": {"options": f"-csearch_path={schema}"}
+        },
+    }
 
+    app = create_app(config, instance_path)
     with app.app_context():
+        db = _db.session
+        db.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+        db.execute(text(f"CREATE SCHEMA {schema}"))
+        db.commit()
         init_db()
+        _db.session.remove()
+        _db.engine.dispose()
+
+    yield config
+
+    with app.app_context():
+        _db.session.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+        _db.session.commit()
+        _db.session.remove()
+        _db.engine.dispose()
+
+
+@pytest.fixture
+def app_config():
+    """Extra app config for a test module; override this fixture to change it."""
+    return {}
+
+
+@pytest.fixture
+def app(database, app_config, instance_path):
+    app = create_app({**database, **app_config}, instance_path)
+
+    # Run the whole test inside one transaction that is rolled back at the
+    # end. The app's own commits only release a SAVEPOINT, which is then
+    # restarted so later requests in the same test can commit again.
+    with app.app_context():
+        connection = _db.engine.connect()
+    transaction = connection.begin()
+    savepoint = [connection.begin_nested()]
+
+    def restart_savepoint(session, session_transaction):
+        if session.bind is connection and not savepoint[0].is_active:
+            savepoint[0] = connection.begin_nested()
+
+    event.listen(_db.session, "after_transaction_end", restart_savepoint)
+    _db.session.configure(bind=connection)
 
     yield app
 
+    _db.session.remove()
+    _db.session.configure(bind=None)
+    event.remove(_db.session, "after_transaction_end", restart_savepoint)
+    transaction.rollback()
+    connection.close()
+    with app.app_context():
+        _db.engine.dispose()
+
 
 @pytest.fixture
 def client(app):
@@ -0,0 +1,84 @@
+import json
+import os
+
+from flaskr import POSTGRES_URL, create_app
+from flaskr.access import access_query, export_access
+from flaskr.fides import load_dataset
+
+
+def test_access_query(app):
+    with app.app_context():
+        query = str(access_query(load_dataset(), ("user.contact", "user.name")))
+    # One statement, visiting only the collections with targeted data
+    assert query.startswith("WITH identities")
+    assert "users_rows AS" in query
+    assert "purchases_rows AS" in query
+    assert "products_rows" not in query
+
+
+def test_export_access(app):
+    with app.app_context():
+        results = dict(export_access(["exampleuser@ethyca.com", "nobody@example.com"]))
+    assert results["nobody@example.com"] == {}
+    assert results["exampleuser@ethyca.com"] == {
+        "flaskr_postgres_dataset:users": [
+            {
+                "email": "exampleuser@ethyca.com",
+                "first_name": "Ethyca",
+                "last_name": "User",
+            }
+        ],
+        "flaskr_postgres_dataset:purchases": [
+            {
+                "city": "Exampletown",
+                "state": "NY",
+                "street_1": "101 Example Ave",
+                "street_2": "Suite 202",
+                "zip": "12345",
+            }
+        ],
+    }
+
+
+def test_export_categories(app, monkeypatch):
+    monkeypatch.setattr("flaskr.access.ACCESS_BATCH_SIZE", 1)
+    with app.app_context():
+        results = dict(
+            export_access(
+                ["admin@example.com", "user@example.com", "admin@example.com"],
+                categories=("user.contact.email",),
+            )
+        )
+    assert results == {
+        "admin@example.com": {
+            "flaskr_postgres_dataset:users": [{"email": "admin@example.com"}]
+        },
+        "user@example.com": {
+            "flaskr_postgres_dataset:users": [{"email": "user@example.com"}]
+        },
+    }
+
+
+def test_command(runner, tmp_path):
+    result = runner.invoke(
+        args=["fides", "access", "user@example.com", "--output-dir", str(tmp_path)]
+    )
+    email, path = result.output.strip().split("\t")
+    assert email == "user@example.com"
+    assert os.path.dirname(path) == str(tmp_path)
+    with open(path) as file:
+        results = json.load(file)
+    assert results["flaskr_postgres_dataset:users"][0]["first_name"] == "Example"
+    assert runner.invoke(args=["fides", "access"]).exit_code != 0
+
+
+def test_command_with_replica(database, instance_path, tmp_path):
+    app = create_app({**database, "READ_REPLICA_URLS": [POSTGRES_URL]}, instance_path)
+    result = app.test_cli_runner().invoke(
+        args=["fides", "access", "user@example.com", "--output-dir", str(tmp_path)]
+    )
+    assert result.exit_code == 0, result.output
+    email, path = result.output.strip().split("\t")
+    with open(path) as file:
+        results = json.load(file)
+    assert results["flaskr_postgres_dataset:users"][0]["first_name"] == "Example"
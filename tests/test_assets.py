@@ -0,0 +1,50 @@
+import gzip
+import shutil
+
+import pytest
+from flask import url_for
+
+
+@pytest.fixture
+def static_app(app, tmp_path):
+    static_folder = tmp_path / "static"
+    shutil.copytree(app.static_folder, static_folder)
+    app.static_folder = str(static_folder)
+    return app
+
+
+def test_unbuilt(static_app, client):
+    with static_app.test_request_context():
+        assert url_for("static", filename="style.css") == "/static/style.css"
+    response = client.get("/static/style.css")
+    assert response.status_code == 200
+    assert "immutable" not in response.headers.get("Cache-Control", "")
+
+
+def test_build_assets(static_app, client, runner):
+    result = runner.invoke(args=["build-assets"])
+    assert "Built 3 assets" in result.output
+
+    with static_app.test_request_context():
+        url = url_for("static", filename="style.css")
+        logo_url = url_for("static", filename="fides_logo_primary.png")
+    assert url.startswith("/static/dist/style.") and url.endswith(".css")
+    assert url in client.get("/auth/login").data.decode()
+
+    plain = client.get(url)
+    assert plain.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+    assert "Content-Encoding" not in plain.headers
+    assert "Accept-Encoding" in plain.headers["Vary"]
+
+    gzipped = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert gzipped.headers["Content-Encoding"] == "gzip"
+    assert gzipped.mimetype == "text/css"
+    assert gzip.decompress(gzipped.data) == plain.data
+
+    brotli = client.get(url, headers={"Accept-Encoding": "gzip, br"})
+    assert brotli.headers["Content-Encoding"] == "br"
+
+    logo = client.get(logo_url, headers={"Accept-Encoding": "gzip, br"})
+    assert logo.mimetype == "image/png"
+    assert "Content-Encoding" not in logo.headers
+    assert "immutable" in logo.headers["Cache-Control"]
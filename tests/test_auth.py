@@ -58,7 +58,7 @@ def test_login(client, auth):
     with client:
         client.get("/")
         assert session["user_id"] == 1
-        assert g.user["email"] == "admin@example.com"
+        assert g.user.email == "admin@example.com"
 
 
 @pytest.mark.parametrize(
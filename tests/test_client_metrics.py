@@ -0,0 +1,86 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from flaskr.client_metrics import ClientMetrics, InstrumentedSession, endpoint
+
+
+class Handler(BaseHTTPRequestHandler):
+    def respond(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        body = json.dumps({"succeeded": ["x" * 100]}).encode()
+        self.send_response(404 if self.path.endswith("/missing") else 200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_PATCH = respond
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_endpoint():
+    assert (
+        endpoint("patch", "http://localhost:8080/api/v1/policy/p/rule/r/target")
+        == "PATCH /api/v1/policy/{policy}/rule/{rule}/target"
+    )
+    assert (
+        endpoint("put", "http://localhost:8080/api/v1/connection/flaskr/secret")
+        == "PUT /api/v1/connection/{connection}/secret"
+    )
+    assert (
+        endpoint("get", "http://localhost:8080/api/v1/privacy-request?id=pri_1")
+        == "GET /api/v1/privacy-request"
+    )
+
+
+def test_session(url):
+    metrics = ClientMetrics()
+    session = InstrumentedSession(metrics)
+    for key in ("a", "b"):
+        session.patch(f"{url}/api/v1/policy/{key}/rule", json=[{"key": "k" * 8}])
+    session.get(f"{url}/missing")
+    metrics.retry("GET", f"{url}/missing")
+    with pytest.raises(requests.ConnectionError):
+        session.get("http://127.0.0.1:1/health")
+
+    rules = metrics.endpoints["PATCH /api/v1/policy/{policy}/rule"]
+    assert rules.calls == 2 and rules.errors == 0
+    assert rules.request_bytes == 2 * len(json.dumps([{"key": "k" * 8}]))
+    assert rules.response_bytes == 2 * len(json.dumps({"succeeded": ["x" * 100]}))
+    assert rules.latency.count == 2 and rules.max_latency > 0
+
+    missing = metrics.endpoints["GET /missing"]
+    assert (missing.calls, missing.errors, missing.retries) == (1, 1, 1)
+    unreachable = metrics.endpoints["GET /health"]
+    assert (unreachable.calls, unreachable.errors) == (1, 1)
+
+    lines = metrics.summary().splitlines()
+    assert lines[0].split()[:4] == ["endpoint", "calls", "errors", "retries"]
+    assert len(lines) == 4
+    assert lines[1].startswith("PATCH /api/v1/policy/{policy}/rule")
+
+    text = metrics.prometheus()
+    assert "# TYPE fidesops_client_request_duration_seconds histogram" in text
+    assert (
+        'fidesops_client_request_duration_seconds_count{endpoint="PATCH'
+        ' /api/v1/policy/{policy}/rule"} 2'
+    ) in text
+    assert 'fidesops_client_retries_total{endpoint="GET /missing"} 1' in text
+    assert 'fidesops_client_errors_total{endpoint="GET /health"} 1' in text
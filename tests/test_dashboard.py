@@ -0,0 +1,81 @@
+from sqlalchemy import text
+
+from flaskr.db import get_db, rebuild_product_sales
+
+
+def test_login_required(client):
+    response = client.get("/dashboard/")
+    assert response.headers["Location"] == "/auth/login"
+
+
+def test_index(client, auth):
+    auth.login()
+    response = client.get("/dashboard/")
+    assert b"2 purchases, $20.00 revenue" in response.data
+    assert b"Example Product 1" in response.data
+    assert b"Example Product 3" not in response.data
+
+
+def test_purchase_updates_counters(client, auth, app):
+    auth.login("user@example.com", "user")
+    client.post(
+        "/1/purchase",
+        data={
+            "street_1": "234 Example St",
+            "street_2": "",
+            "city": "Exampleville",
+            "state": "NY",
+            "zip": "23456",
+        },
+    )
+    auth.login()
+    assert b"3 purchases, $30.00 revenue" in client.get("/dashboard/").data
+
+    # the incremental counters agree with a full recomputation
+    with app.app_context():
+        db = get_db()
+        query = text("SELECT * FROM product_sales ORDER BY product_id")
+        counters = db.execute(query).fetchall()
+        rebuild_product_sales()
+        assert db.execute(query).fetchall() == counters
+
+
+def test_rebuild_after_price_change(client, auth, app):
+    auth.login("user@example.com", "user")
+    with app.app_context():
+        db = get_db()
+        db.execute(text("UPDATE products SET price = 15 WHERE id = 1"))
+        db.commit()
+    client.post(
+        "/1/purchase",
+        data={
+            "street_1": "234 Example St",
+            "street_2": "",
+            "city": "Exampleville",
+            "state": "NY",
+            "zip": "23456",
+        },
+    )
+
+    # earlier purchases keep the price they were made at
+    with app.app_context():
+        db = get_db()
+        query = text("SELECT revenue FROM product_sales WHERE product_id = 1")
+        assert db.execute(query).scalar() == 35
+        rebuild_product_sales()
+        assert db.execute(query).scalar() == 35
+
+
+def test_purchase_deleted_product(client, auth):
+    auth.login("user@example.com", "user")
+    response = client.post(
+        "/999/purchase",
+        data={
+            "street_1": "234 Example St",
+            "street_2": "",
+            "city": "Exampleville",
+            "state": "NY",
+            "zip": "23456",
+        },
+    )
+    assert response.status_code == 404
@@ -0,0 +1,76 @@
+import csv
+
+import pytest
+
+from flaskr.datamap import COLUMNS, datamap_rows
+from flaskr.fides import load_manifests
+from flaskr.taxonomy import get_taxonomy
+
+pytest.importorskip("fideslang")
+
+
+@pytest.fixture
+def rows(app):
+    with app.app_context():
+        return [
+            dict(zip(COLUMNS, row))
+            for row in datamap_rows(load_manifests(), get_taxonomy())
+        ]
+
+
+def test_datamap_rows(rows):
+    flaskr = [row for row in rows if row["System"] == "Flaskr Web Application"]
+    fields = {(row["Collection"], row["Field"]) for row in flaskr}
+    assert ("users", "email") in fields
+    assert ("purchases", "buyer_id") in fields
+
+    email = next(row for row in flaskr if row["Field"] == "email")
+    assert email["Organization"] == "Fides Demo"
+    assert email["Controller"] == "Dave L. Epper"
+    assert email["Dataset"] == "Flaskr Example PostgreSQL Database"
+    assert email["Purpose of Processing"] == "e-commerce"
+    assert email["Legal Basis"] == "Consent"
+    assert email["Data Subjects"] == "Flaskr Customer"
+    assert email["Data Categories"] == "user.contact.email"
+
+    # Nested fields of the Mailchimp dataset are flattened
+    mailchimp = {row["Field"] for row in rows if row["System"] == "Mailchimp"}
+    assert "merge_fields.ADDRESS.city" in mailchimp
+
+    # Declarations without datasets get a row per category
+    analytics = [row for row in rows if row["System"] == "Google Analytics"]
+    assert [row["Data Categories"] for row in analytics[:4]] == [
+        "user.browsing_history",
+        "user.device.cookie_id",
+        "user.telemetry",
+        "user.location",
+    ]
+    assert {row["Field"] for row in analytics} == {""}
+    assert analytics[0]["Third Country Transfers"] == "USA"
+    assert analytics[0]["DPIA Required"] == "Yes"
+
+
+def test_command_csv(runner, rows, tmp_path):
+    output = tmp_path / "datamap.csv"
+    result = runner.invoke(args=["fides", "datamap", "--output", str(output)])
+    assert result.output == f"{output}\n"
+    with open(output, newline="") as file:
+        assert list(csv.DictReader(file)) == rows
+
+
+def test_command_xlsx(runner, rows, tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    output = tmp_path / "datamap.xlsx"
+    runner.invoke(args=["fides", "datamap", "--output", str(output)])
+    sheet = openpyxl.load_workbook(output, read_only=True)["Datamap"]
+    values = list(sheet.values)
+    assert values[0] == COLUMNS
+    assert len(values) == len(rows) + 1
+
+
+def test_command_format(runner, tmp_path):
+    result = runner.invoke(args=["fides", "datamap", "--output", "datamap.txt"])
+    assert "Can't guess the format" in result.output
+    output = tmp_path / "datamap.txt"
+    runner.invoke(args=["fides", "datamap", "--output", str(output), "--format", "csv"])
+    assert output.read_text().startswith("Organization,")
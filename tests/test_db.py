@@ -15,3 +15,19 @@ def test_init_db_command(runner, monkeypatch):
     result = runner.invoke(args=["init-db"])
     assert "Initialized" in result.output
     assert Recorder.called
+
+
+def test_init_db(app, runner):
+    with app.app_context():
+        db = get_db()
+        db.execute(text("DELETE FROM purchases"))
+        db.commit()
+
+    result = runner.invoke(args=["init-db"])
+    assert "Initialized" in result.output
+
+    with app.app_context():
+        db = get_db()
+        assert db.execute(text("SELECT COUNT(id) FROM users")).scalar() == 3
+        assert db.execute(text("SELECT COUNT(id) FROM products")).scalar() == 3
+        assert db.execute(text("SELECT COUNT(id) FROM purchases")).scalar() == 2
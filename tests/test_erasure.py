@@ -0,0 +1,79 @@
+import pytest
+from sqlalchemy import text
+
+from flaskr.db import get_db
+from flaskr.erasure import erase, erasure_plan, hmac_mask
+from flaskr.fides import load_dataset, traversal
+
+
+@pytest.fixture
+def app_config():
+    return {"ERASURE_HMAC_KEY": "test"}
+
+
+def test_traversal(app):
+    with app.app_context():
+        steps = traversal(load_dataset(), "email")
+    assert [(collection.name, edges) for collection, edges in steps] == [
+        ("users", [("email", None, "email")]),
+        ("product_sales", [("seller_id", "users", "id")]),
+        ("products", [("seller_id", "users", "id")]),
+        ("purchases", [("buyer_id", "users", "id")]),
+    ]
+
+
+def test_erasure_plan(app):
+    with app.app_context():
+        plan = erasure_plan(load_dataset(), ("user.contact", "user.name"))
+    assert [(collection.name, masked) for collection, _, masked in plan] == [
+        ("users", ["email", "first_name", "last_name"]),
+        ("purchases", ["city", "state", "street_1", "street_2", "zip"]),
+    ]
+
+
+def test_erase(app):
+    with app.app_context():
+        db = get_db()
+        counts = erase(["user@example.com", "exampleuser@ethyca.com", "nobody"])
+        assert counts == {"users": 2, "purchases": 2}
+
+        users = db.execute(
+            text("SELECT email, first_name, last_name FROM users ORDER BY id")
+        ).fetchall()
+        assert users[0] == ("admin@example.com", "Admin", "User")
+        assert users[1] == (
+            hmac_mask("user@example.com", b"test", ""),
+            hmac_mask("Example", b"test", ""),
+            hmac_mask("User", b"test", ""),
+        )
+
+        purchases = db.execute(
+            text("SELECT street_1, street_2, zip FROM purchases ORDER BY id")
+        ).fetchall()
+        assert purchases[0].street_1 == hmac_mask("123 Example St", b"test", "")
+        assert purchases[1].zip == hmac_mask("12345", b"test", "")
+
+
+def test_erase_nobody(app):
+    with app.app_context():
+        assert erase(["nobody@example.com"]) == {"users": 0, "purchases": 0}
+
+
+def test_random_key(app):
+    app.config["ERASURE_HMAC_KEY"] = None
+    with app.app_context():
+        erase(["user@example.com"])
+        email = get_db().execute(text("SELECT email FROM users WHERE id = 2")).scalar()
+        assert email != hmac_mask("user@example.com", b"test", "")
+        assert len(email) == 64
+
+
+def test_command(runner, app, tmp_path):
+    path = tmp_path / "emails.txt"
+    path.write_text("user@example.com\n\n")
+    result = runner.invoke(
+        args=["fides", "erase", "admin@example.com", "--file", str(path)]
+    )
+    assert "users: masked 2 rows" in result.output
+    assert "purchases: masked 1 rows" in result.output
+    assert runner.invoke(args=["fides", "erase"]).exit_code != 0
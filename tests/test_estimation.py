@@ -0,0 +1,66 @@
+import pytest
+from sqlalchemy import text
+
+from flaskr import POSTGRES_URL
+from flaskr.db import get_db
+from flaskr.estimation import estimate, lookup_queries, plan_nodes
+from flaskr.fides import load_dataset
+
+
+def test_lookup_queries(app):
+    with app.app_context():
+        lookups = lookup_queries(load_dataset())
+    queries = {collection.name: query for collection, _, query in lookups}
+    assert queries["users"] == "SELECT * FROM users WHERE email = ANY(:identities)"
+    assert queries["purchases"] == (
+        "SELECT * FROM purchases WHERE buyer_id IN (SELECT id FROM"
+        " (SELECT * FROM users WHERE email = ANY(:identities)) AS users)"
+    )
+
+
+def test_plan_nodes():
+    scan = {"Node Type": "Index Scan", "Plan Rows": 1}
+    plan = {
+        "Node Type": "Nested Loop",
+        "Plans": [{"Node Type": "Seq Scan", "Plan Rows": 5}, scan],
+    }
+    assert [loops for _, loops in plan_nodes(plan)] == [1, 1, 5]
+
+
+def test_estimate(app):
+    with app.app_context():
+        estimates = estimate(["user@example.com", "admin@example.com"])
+    estimates = {e.collection: e for e in estimates}
+    assert list(estimates) == ["users", "product_sales", "products", "purchases"]
+
+    purchases = estimates["purchases"]
+    assert purchases.fields == ["buyer_id"]
+    assert purchases.targeted
+    assert purchases.unindexed == ["buyer_id"]
+    assert purchases.rows > 0 and purchases.cost > 0
+    # Partition scans count as the partitioned table's
+    assert purchases.scans
+
+    assert estimates["users"].unindexed == []
+    assert estimates["products"].unindexed == []
+    assert not estimates["products"].targeted
+
+
+@pytest.mark.parametrize("app_config", [{"READ_REPLICA_URLS": [POSTGRES_URL]}])
+def test_estimate_on_primary(app):
+    with app.app_context():
+        # Only the primary sees the index created in the test's transaction
+        get_db().execute(text("CREATE INDEX ON purchases (buyer_id)"))
+        estimates = estimate(["user@example.com"])
+    assert {e.collection: e for e in estimates}["purchases"].unindexed == []
+
+
+def test_command(runner):
+    result = runner.invoke(args=["fides", "estimate", "user@example.com"])
+    lines = result.output.splitlines()
+    assert lines[0].split() == ["collection", "lookup", "rows", "cost", "scans"]
+    assert lines[1].startswith("users*")
+    assert lines[5].startswith("total")
+    assert "Warning: no index on purchases.buyer_id." in lines
+    assert "Warning: no index on users.email." not in lines
+    assert runner.invoke(args=["fides", "estimate"]).exit_code != 0
@@ -0,0 +1,117 @@
+import os
+import shutil
+
+import pytest
+
+from flaskr.evaluation import Evaluator, reevaluate
+
+pytest.importorskip("fideslang")
+
+FIDES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".fides")
+
+
+@pytest.fixture
+def fides_dir(tmp_path):
+    directory = tmp_path / "fides"
+    shutil.copytree(FIDES_DIR, directory)
+    return directory
+
+
+@pytest.fixture
+def app_config(fides_dir):
+    return {"FIDES_DIR": str(fides_dir)}
+
+
+def uncomment_violation(fides_dir):
+    path = fides_dir / "flaskr_postgres_dataset.yml"
+    path.write_text(
+        path.read_text().replace(
+            "# - user.health_and_medical", "- user.health_and_medical"
+        )
+    )
+
+
+def test_evaluate(fides_dir):
+    evaluator = Evaluator(str(fides_dir))
+    assert evaluator.evaluate() == []
+    assert evaluator.evaluated == 4
+
+    # Nothing changed, so nothing is evaluated again
+    assert evaluator.evaluate() == []
+    assert evaluator.evaluated == 0
+
+    # Only the declaration referencing the changed dataset is
+    uncomment_violation(fides_dir)
+    violations = evaluator.evaluate()
+    assert evaluator.evaluated == 1
+    assert [(v.system, v.dataset, v.rule, v.data_categories) for v in violations] == [
+        (
+            "flaskr_system",
+            "flaskr_postgres_dataset",
+            "reject_sensitive_data",
+            ["user.health_and_medical"],
+        )
+    ]
+
+
+def test_evaluate_declaration(fides_dir):
+    evaluator = Evaluator(str(fides_dir))
+    evaluator.evaluate()
+    path = fides_dir / "google_analytics_system.yml"
+    path.write_text(
+        path.read_text().replace(
+            "data_qualifier: aggregated.anonymized.unlinked_pseudonymized.pseudonymized\n",
+            "data_qualifier: aggregated.anonymized.unlinked_pseudonymized"
+            ".pseudonymized.identified\n",
+        )
+    )
+    violations = evaluator.evaluate()
+    assert evaluator.evaluated == 2
+    assert {(v.system, v.declaration, v.rule, v.dataset) for v in violations} == {
+        (
+            "google_analytics_system",
+            "Track & report on page views",
+            "minimize_user_identifiable_data",
+            None,
+        ),
+        (
+            "google_analytics_system",
+            "Derive user geographic location",
+            "minimize_user_identifiable_data",
+            None,
+        ),
+    }
+
+
+def test_evaluate_errors(fides_dir):
+    path = fides_dir / "mailchimp_system.yml"
+    path.write_text(path.read_text().replace("- user.contact\n", "- user.nope\n"))
+    with pytest.raises(ValueError, match="Unknown data_category user.nope"):
+        Evaluator(str(fides_dir)).evaluate()
+
+
+def test_reevaluate(app, fides_dir, caplog):
+    evaluator = Evaluator(str(fides_dir))
+    with app.app_context():
+        assert reevaluate(evaluator)
+
+        # Malformed manifests are logged without raising
+        path = fides_dir / "mailchimp_system.yml"
+        content = path.read_text()
+        path.write_text("system: 1\n")
+        assert not reevaluate(evaluator)
+        assert "Evaluation failed" in caplog.text
+
+        path.write_text(content)
+        assert reevaluate(evaluator)
+
+
+def test_command(runner, fides_dir):
+    result = runner.invoke(args=["fides", "evaluate"])
+    assert result.exit_code == 0
+    assert "Evaluation passed" in result.output
+
+    uncomment_violation(fides_dir)
+    result = runner.invoke(args=["fides", "evaluate"])
+    assert result.exit_code == 1
+    assert "violates flaskr_policy.reject_sensitive_data" in result.output
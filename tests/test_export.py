@@ -0,0 +1,57 @@
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+
+def test_ndjson(client):
+    response = client.get("/products.ndjson")
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    assert "Content-Encoding" not in response.headers
+    products = [json.loads(line) for line in response.data.splitlines()]
+    assert [product["id"] for product in products] == [1, 2, 3]
+    assert products[0] == {
+        "id": 1,
+        "name": "Example Product 1",
+        "description": "A description for example product #1",
+        "price": 10.0,
+        "created_at": "2020-01-01T12:00:00",
+        "seller_id": 1,
+    }
+
+
+def test_csv(client):
+    response = client.get("/products.csv")
+    assert response.mimetype == "text/csv"
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [row["name"] for row in rows] == [
+        "Example Product 1",
+        "Example Product 2",
+        "Example Product 3",
+    ]
+    assert rows[2]["created_at"] == "2020-01-03T12:00:00"
+
+
+def test_since(client):
+    response = client.get("/products.ndjson?since=2020-01-01T12:00:00")
+    ids = [json.loads(line)["id"] for line in response.data.splitlines()]
+    assert ids == [2, 3]
+    assert client.get("/products.csv?since=yesterday").status_code == 400
+
+
+@pytest.mark.parametrize("path", ("/products.ndjson", "/products.csv"))
+def test_gzip(client, path):
+    plain = client.get(path).data
+    response = client.get(path, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert gzip.decompress(response.data) == plain
+
+
+def test_batches(client, monkeypatch):
+    monkeypatch.setattr("flaskr.export.EXPORT_BATCH_SIZE", 2)
+    response = client.get("/products.ndjson")
+    assert len(response.data.splitlines()) == 3
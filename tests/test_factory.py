@@ -1,9 +1,9 @@
 from flaskr import create_app
 
 
-def test_config():
-    assert not create_app().testing
-    assert create_app({"TESTING": True}).testing
+def test_config(instance_path):
+    assert not create_app(instance_path=instance_path).testing
+    assert create_app({"TESTING": True}, instance_path).testing
 
 
 def test_hello(client):
@@ -0,0 +1,192 @@
+import csv
+import io
+import json
+
+import pytest
+from sqlalchemy import text
+
+from flaskr.db import get_db
+from flaskr.importer import CopyStream
+
+CSV = (
+    "name,description,price\n"
+    "Imported 1,First import,1.50\n"
+    ",No name,1\n"
+    "Imported 2,,2\n"
+    "Imported 3,No price,\n"
+    "Imported 4,Bad price,cheap\n"
+    "Imported 1,Duplicate,1\n"
+    "Example Product 1,Already exists,1\n"
+    '"Imported, 5","Quoted ""description""",5\n'
+)
+
+
+def _imported(app):
+    with app.app_context():
+        return (
+            get_db()
+            .execute(
+                text(
+                    "SELECT name, description, price, seller_id FROM products"
+                    " WHERE name LIKE 'Imported%' ORDER BY id"
+                )
+            )
+            .fetchall()
+        )
+
+
+def test_login_required(client):
+    assert client.get("/import").headers["Location"] == "/auth/login"
+
+
+def test_upload_csv(client, auth, app):
+    auth.login()
+    response = client.post(
+        "/import", data={"file": (io.BytesIO(CSV.encode()), "products.csv")}
+    )
+    assert b"Imported 2 products, rejected 6 rows." in response.data
+    for message in (
+        b"Name is required.",
+        b"Description is required.",
+        b"Price is required.",
+        b"Price must be a number.",
+        b"Name Imported 1 appears more than once.",
+        b"Name Example Product 1 already exists.",
+    ):
+        assert message in response.data
+
+    assert [tuple(row) for row in _imported(app)] == [
+        ("Imported 1", "First import", 1.5, 1),
+        ("Imported, 5", 'Quoted "description"', 5.0, 1),
+    ]
+
+
+def test_upload_ndjson(client, auth, app):
+    auth.login()
+    lines = [
+        json.dumps({"name": "Imported 1", "description": "One", "price": 1}),
+        "not json",
+        "",
+        json.dumps({"name": "Imported 2", "description": "Two", "price": "2"}),
+    ]
+    response = client.post(
+        "/import",
+        data={"file": (io.BytesIO("\n".join(lines).encode()), "products.ndjson")},
+    )
+    assert b"Imported 2 products, rejected 1 rows." in response.data
+    assert b"Invalid JSON object." in response.data
+    assert len(_imported(app)) == 2
+
+
+@pytest.mark.parametrize(
+    ("price", "message"),
+    (
+        ("-1", b"Price can&#39;t be negative."),
+        ("1e39", b"Price is too large."),
+        ("nan", b"Price must be a number."),
+    ),
+)
+def test_upload_invalid_price(client, auth, app, price, message):
+    auth.login()
+    data = f"name,description,price\nImported 1,Bad price,{price}\n".encode()
+    response = client.post("/import", data={"file": (io.BytesIO(data), "p.csv")})
+    assert b"Imported 0 products, rejected 1 rows." in response.data
+    assert message in response.data
+    assert _imported(app) == []
+
+
+def test_upload_not_utf8(client, auth, app):
+    auth.login()
+    data = "name,description,price\nImported 1,Café,1\n".encode("latin-1")
+    response = client.post("/import", data={"file": (io.BytesIO(data), "p.csv")})
+    assert b"File must be encoded as UTF-8." in response.data
+    assert b"Imported 0 products" not in response.data
+    assert _imported(app) == []
+
+    # The rolled back import doesn't affect the next one
+    data = b"name,description,price\nImported 1,Cafe,1\n"
+    response = client.post("/import", data={"file": (io.BytesIO(data), "p.csv")})
+    assert b"Imported 1 products, rejected 0 rows." in response.data
+
+
+@pytest.mark.parametrize(
+    ("data", "filename"),
+    (
+        (b"name,description,price\nImported 1,Nul \x00 byte,1\n", "p.csv"),
+        (
+            json.dumps({"name": "Imported 1", "description": "\x00", "price": 1}),
+            "p.ndjson",
+        ),
+    ),
+)
+def test_upload_nul(client, auth, app, data, filename):
+    auth.login()
+    if isinstance(data, str):
+        data = data.encode()
+    response = client.post("/import", data={"file": (io.BytesIO(data), filename)})
+    assert b"Imported 0 products, rejected 1 rows." in response.data
+    assert b"can&#39;t contain NUL characters." in response.data
+    assert _imported(app) == []
+
+
+def test_upload_invalid_csv(client, auth, app):
+    auth.login()
+    data = b"name,description,price\nImported 1,Fine,1\nImported 2,"
+    data += b"x" * (csv.field_size_limit() + 1) + b",1\n"
+    response = client.post("/import", data={"file": (io.BytesIO(data), "p.csv")})
+    assert b"Invalid CSV file: field larger than field limit" in response.data
+    assert _imported(app) == []
+
+
+def test_upload_too_large(client, auth, app):
+    auth.login()
+    app.config["MAX_CONTENT_LENGTH"] = 1024
+    data = b"name,description,price\n" + b"Imported 1,Large,1\n" * 100
+    response = client.post("/import", data={"file": (io.BytesIO(data), "p.csv")})
+    assert response.status_code == 413
+
+
+def test_upload_required(client, auth):
+    auth.login()
+    response = client.post("/import", data={})
+    assert b"File is required." in response.data
+
+
+def test_command(runner, app, tmp_path):
+    path = tmp_path / "products.csv"
+    path.write_text(CSV)
+    result = runner.invoke(
+        args=["import-products", str(path), "--seller", "user@example.com"]
+    )
+    assert "Imported 2 products, rejected 6 rows." in result.output
+    assert "line 3: Name is required." in result.output
+    assert {row.seller_id for row in _imported(app)} == {2}
+
+    result = runner.invoke(
+        args=["import-products", str(path), "--seller", "nobody@example.com"]
+    )
+    assert result.exit_code != 0
+
+    path.write_bytes("name,description,price\nImported 1,Café,1\n".encode("latin-1"))
+    result = runner.invoke(
+        args=["import-products", str(path), "--seller", "user@example.com"]
+    )
+    assert result.exit_code == 1
+    assert "isn't encoded as UTF-8" in result.output
+
+    path.write_text("name,description,price\nImported 1," + "x" * 200000 + ",1\n")
+    result = runner.invoke(
+        args=["import-products", str(path), "--seller", "user@example.com"]
+    )
+    assert result.exit_code == 1
+    assert "isn't a valid CSV file: field larger than field limit" in result.output
+
+
+def test_copy_stream():
+    rows = [(i, f"name {i}", "description", 1.0) for i in range(1000)]
+    stream = CopyStream(rows)
+    chunks = iter(lambda: stream.read(100), "")
+    data = "".join(chunks)
+    assert data.splitlines()[0] == "0,name 0,description,1.0"
+    assert len(data.splitlines()) == 1000
+    assert CopyStream(rows).read() == data
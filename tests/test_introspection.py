@@ -0,0 +1,202 @@
+import os
+
+import pytest
+import yaml
+from sqlalchemy import text
+
+from flaskr import POSTGRES_URL
+from flaskr.db import get_db
+from flaskr.fides import DATASET, load_manifest
+from flaskr.introspection import introspect, merge_dataset, update_manifest
+
+
+def test_introspect(app):
+    with app.app_context():
+        tables = introspect()
+    # Partitions are covered by their parent table
+    assert sorted(tables) == ["product_sales", "products", "purchases", "users"]
+    assert tables["purchases"]["buyer_id"] == {
+        "references": [{"field": "users.id", "direction": "from"}],
+        "data_type": "integer",
+    }
+    assert tables["purchases"]["id"] == {"primary_key": True, "data_type": "integer"}
+    assert tables["purchases"]["created_at"] == {"primary_key": True}
+    assert tables["users"]["email"] == {"data_type": "string"}
+    assert tables["products"]["price"] == {"data_type": "float"}
+
+
+@pytest.mark.parametrize("app_config", [{"READ_REPLICA_URLS": [POSTGRES_URL]}])
+def test_introspect_primary(app):
+    with app.app_context():
+        # Only the primary sees the column added in the test's transaction
+        get_db().execute(text("ALTER TABLE users ADD COLUMN nickname TEXT"))
+        assert "nickname" in introspect()["users"]
+
+
+def test_manifest_up_to_date(app):
+    with app.app_context():
+        dataset = load_manifest(os.path.join(app.config["FIDES_DIR"], DATASET))
+        assert merge_dataset(dataset["dataset"][0], introspect()) == []
+
+
+def test_merge_dataset(app):
+    with app.app_context():
+        db = get_db()
+        db.execute(text("ALTER TABLE users ADD COLUMN nickname TEXT"))
+        db.execute(text("ALTER TABLE products DROP COLUMN search_vector"))
+        db.execute(
+            text(
+                "CREATE TABLE reviews (id SERIAL PRIMARY KEY,"
+                " author_id INTEGER REFERENCES users (id), body TEXT)"
+            )
+        )
+        manifest = load_manifest(os.path.join(app.config["FIDES_DIR"], DATASET))
+        dataset = manifest["dataset"][0]
+        changes = merge_dataset(dataset, introspect())
+
+    assert changes == [
+        "removed products.search_vector",
+        "added users.nickname",
+        "added reviews",
+    ]
+    collections = {c["name"]: c for c in dataset["collections"]}
+    assert list(collections) == [
+        "product_sales",
+        "products",
+        "purchases",
+        "reviews",
+        "users",
+    ]
+    assert collections["reviews"]["fields"] == [
+        {
+            "name": "author_id",
+            "data_categories": [],
+            "fidesops_meta": {
+                "references": [
+                    {
+                        "dataset": "flaskr_postgres_dataset",
+                        "field": "users.id",
+                        "direction": "from",
+                    }
+                ],
+                "data_type": "integer",
+            },
+        },
+        {
+            "name": "body",
+            "data_categories": [],
+            "fidesops_meta": {"data_type": "string"},
+        },
+        {
+            "name": "id",
+            "data_categories": [],
+            "fidesops_meta": {"primary_key": True, "data_type": "integer"},
+        },
+    ]
+    users = {field["name"]: field for field in collections["users"]["fields"]}
+    assert list(users)[-2:] == ["nickname", "password"]
+    # Hand-written annotations are kept as they are
+    assert users["email"] == {
+        "name": "email",
+        "data_categories": ["user.contact.email"],
+        "fidesops_meta": {"identity": "email", "data_type": "string"},
+    }
+
+
+def test_update_manifest():
+    content = (
+        "dataset:\n"
+        "- fides_key: example\n"
+        "  collections:\n"
+        "  # Tables\n"
+        "  - name: a\n"
+        "    fields:\n"
+        "    - name: x  # the x\n"
+        "      data_categories:\n"
+        "        - user  # hand-written\n"
+        "    - name: y\n"
+        "      data_categories: [user]\n"
+        "\n"
+        "  - name: old\n"
+        "    fields:\n"
+        "    - name: z\n"
+        "      data_categories: [user]\n"
+        "# The end\n"
+    )
+    original = [("a", ["x", "y"]), ("old", ["z"])]
+    collections = [
+        {
+            "name": "a",
+            "fields": [
+                {"name": "w", "data_categories": []},
+                {"name": "x", "data_categories": ["user"]},
+            ],
+        },
+        {
+            "name": "c",
+            "fields": [
+                {
+                    "name": "id",
+                    "data_categories": [],
+                    "fidesops_meta": {"primary_key": True},
+                }
+            ],
+        },
+    ]
+    assert update_manifest(content, original, collections) == (
+        "dataset:\n"
+        "- fides_key: example\n"
+        "  collections:\n"
+        "  # Tables\n"
+        "  - name: a\n"
+        "    fields:\n"
+        "    - name: w\n"
+        "      data_categories: []\n"
+        "    - name: x  # the x\n"
+        "      data_categories:\n"
+        "        - user  # hand-written\n"
+        "\n"
+        "  - name: c\n"
+        "    fields:\n"
+        "    - name: id\n"
+        "      data_categories: []\n"
+        "      fidesops_meta:\n"
+        "        primary_key: True\n"
+        "# The end\n"
+    )
+
+
+def test_command(app, runner, tmp_path):
+    result = runner.invoke(args=["fides", "generate-dataset", "--check"])
+    assert result.exit_code == 0
+    assert "up to date" not in result.output
+
+    result = runner.invoke(args=["fides", "generate-dataset"])
+    assert result.output.endswith("is up to date.\n")
+
+    with app.app_context():
+        get_db().execute(text("ALTER TABLE users ADD COLUMN nickname TEXT"))
+        get_db().commit()
+    result = runner.invoke(args=["fides", "generate-dataset", "--check"])
+    assert result.exit_code == 1
+    assert result.output == "added users.nickname\n"
+
+    output = tmp_path / "dataset.yml"
+    runner.invoke(args=["fides", "generate-dataset", "--output", str(output)])
+    written = output.read_text()
+    # Only the new field's lines are added, keeping comments & layout
+    with open(os.path.join(app.config["FIDES_DIR"], DATASET)) as file:
+        assert written == file.read().replace(
+            "    - name: password\n",
+            "    - name: nickname\n"
+            "      data_categories: []\n"
+            "      fidesops_meta:\n"
+            "        data_type: string\n"
+            "    - name: password\n",
+        )
+    assert "data_categories: [user.contact.email]" in written
+    assert "primary_key: True" in written
+    assert "- name: nickname\n      data_categories: []" in written
+    assert (
+        yaml.safe_load(written)["dataset"][0]["fides_key"] == "flaskr_postgres_dataset"
+    )
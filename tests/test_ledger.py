@@ -0,0 +1,68 @@
+import sqlite3
+
+import pytest
+from click.testing import CliRunner
+
+from flaskr.ledger import PENDING, Ledger, cli
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / "ledger.sqlite3")
+    ledger = Ledger(path)
+    ledger.record("a@example.com", "access", "1", "pri_1", "pending")
+    ledger.record("b@example.com", "access", "1", "pri_2", "pending")
+    ledger.record("a@example.com", "erasure", "1", "pri_3", "complete")
+    ledger.record("a@example.com", "access", "2", "pri_4", "pending")
+    ledger.close()
+    return path
+
+
+def test_ledger(path):
+    ledger = Ledger(path)
+    assert ledger.requests("1", "access") == {
+        "a@example.com": ("pri_1", "pending"),
+        "b@example.com": ("pri_2", "pending"),
+    }
+    assert ledger.pending("1", "access") == {"pri_1": "pending", "pri_2": "pending"}
+    assert ledger.pending("1", "erasure") == {}
+
+    ledger.update({"pri_1": "complete", "pri_2": "in_processing"})
+    assert ledger.pending("1", "access") == {"pri_2": "in_processing"}
+    assert ledger.pending("2", "access") == {"pri_4": "pending"}
+
+    # Identities are only submitted once per batch & policy
+    with pytest.raises(sqlite3.IntegrityError):
+        ledger.record("a@example.com", "access", "1", "pri_5", "pending")
+    ledger.close()
+
+
+def test_pending_index(path):
+    ledger = Ledger(path)
+    plan = ledger.db.execute(
+        "EXPLAIN QUERY PLAN SELECT request_id FROM privacy_requests"
+        f" WHERE batch = ? AND policy_key = ? AND {PENDING}",
+        ("1", "access"),
+    ).fetchall()
+    assert "privacy_requests_pending" in plan[0][-1]
+    ledger.close()
+
+
+def test_export(path, tmp_path):
+    result = CliRunner().invoke(cli, ["--ledger", path, "export", "--batch", "1"])
+    lines = result.output.splitlines()
+    assert lines[0] == (
+        "identity,policy_key,batch,request_id,status,submitted_at,updated_at"
+    )
+    assert [line.split(",")[3] for line in lines[1:]] == ["pri_1", "pri_2", "pri_3"]
+
+    output = tmp_path / "ledger.csv"
+    CliRunner().invoke(cli, ["--ledger", path, "export", "--output", str(output)])
+    assert len(output.read_text().splitlines()) == 5
+
+    result = CliRunner().invoke(cli, ["--ledger", path, "summary"])
+    assert result.output.splitlines() == [
+        "1\taccess\tpending\t2",
+        "1\terasure\tcomplete\t1",
+        "2\taccess\tpending\t1",
+    ]
@@ -0,0 +1,71 @@
+import logging
+
+import pytest
+from sqlalchemy import text
+
+from flaskr import create_app
+from flaskr.db import get_db
+
+
+@pytest.fixture
+def app_config():
+    return {
+        "INSTRUMENTATION": True,
+        "INSTRUMENTATION_N_PLUS_ONE_THRESHOLD": 3,
+    }
+
+
+def test_disabled(instance_path):
+    client = create_app({"TESTING": True}, instance_path).test_client()
+    assert "Server-Timing" not in client.get("/hello").headers
+    assert client.get("/metrics").status_code == 404
+
+
+def test_server_timing(client, auth):
+    auth.login()
+    timing = client.get("/").headers["Server-Timing"]
+    # one query to load the user, one for the product list
+    assert "db;dur=" in timing and 'desc="2 queries"' in timing
+    assert "render;dur=" in timing
+    assert "total;dur=" in timing
+
+
+def test_metrics(client):
+    client.get("/")
+    client.get("/")
+    response = client.get("/metrics")
+    assert response.mimetype == "text/plain"
+    data = response.data.decode()
+    assert 'flaskr_request_duration_seconds_count{endpoint="product.index"} 2' in data
+    assert 'flaskr_db_queries_bucket{endpoint="product.index",le="1"} 2' in data
+    assert 'flaskr_render_duration_seconds_count{endpoint="product.index"} 2' in data
+
+
+def test_n_plus_one(app, client, caplog):
+    @app.route("/n-plus-one")
+    def n_plus_one():
+        db = get_db()
+        for id in (1, 2, 3):
+            db.execute(text("SELECT * FROM products WHERE id = :id"), {"id": id})
+        return "done"
+
+    with caplog.at_level(logging.WARNING, logger="flaskr.metrics"):
+        client.get("/n-plus-one")
+    assert "Possible N+1 query in n_plus_one" in caplog.text
+    data = client.get("/metrics").data.decode()
+    assert 'flaskr_n_plus_one_requests_total{endpoint="n_plus_one"} 1' in data
+
+
+def test_failed_statement(app, client):
+    @app.route("/fails")
+    def fails():
+        db = get_db()
+        try:
+            db.execute(text("SELECT * FROM missing_table"))
+        except Exception:
+            db.rollback()
+        assert db.connection().info["query_start"] == {}
+        db.execute(text("SELECT 1"))
+        return "done"
+
+    assert client.get("/fails").status_code == 200
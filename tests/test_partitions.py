@@ -0,0 +1,116 @@
+import csv
+import gzip
+import os
+from datetime import date
+
+import pytest
+import sqlalchemy.exc
+from sqlalchemy import text
+
+from flaskr import partitions
+from flaskr.db import get_db
+from flaskr.partitions import (
+    add_months,
+    archive_purchase_partitions,
+    create_purchase_partitions,
+    current_month,
+    purchase_partitions,
+)
+
+
+@pytest.fixture
+def app_config(tmp_path):
+    return {"PURCHASE_ARCHIVE_DIR": str(tmp_path)}
+
+
+def _count(table):
+    return get_db().execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+
+
+def test_add_months():
+    assert add_months(date(2020, 1, 1), 1) == date(2020, 2, 1)
+    assert add_months(date(2020, 12, 1), 1) == date(2021, 1, 1)
+    assert add_months(date(2020, 1, 1), -13) == date(2018, 12, 1)
+
+
+def test_init_db_partitions(app):
+    with app.app_context():
+        months = [month for name, month in purchase_partitions()]
+        assert months[0] == date(2020, 1, 1)
+        this_month = current_month()
+        assert months[-4:] == [add_months(this_month, i) for i in range(4)]
+        assert _count("purchases_2020_01") == 2
+        assert _count("purchases_default") == 0
+
+
+def test_create_moves_default_rows(app):
+    with app.app_context():
+        db = get_db()
+        db.execute(
+            text(
+                "INSERT INTO purchases (created_at, product_id, buyer_id, price)"
+                " VALUES ('2019-06-15 12:00:00', 1, 2, 10)"
+            )
+        )
+        assert _count("purchases_default") == 1
+
+        assert create_purchase_partitions(0) == ["purchases_2019_06"]
+        assert _count("purchases_default") == 0
+        assert _count("purchases_2019_06") == 1
+        assert create_purchase_partitions(0) == []
+
+
+def test_archive(app, tmp_path):
+    with app.app_context():
+        paths = archive_purchase_partitions(date(2021, 1, 1), str(tmp_path))
+        assert paths == [os.path.join(tmp_path, "purchases_2020_01.csv.gz")]
+        assert _count("purchases") == 0
+        assert "purchases_2020_01" not in [name for name, _ in purchase_partitions()]
+
+    with gzip.open(paths[0], "rt") as file:
+        rows = list(csv.DictReader(file))
+    assert [row["street_1"] for row in rows] == ["123 Example St", "101 Example Ave"]
+
+
+def test_archive_locks(app, tmp_path, monkeypatch):
+    locks, gzip_open = [], gzip.open
+
+    def open_archive(*args, **kwargs):
+        locks.extend(
+            get_db().execute(
+                text(
+                    "SELECT relation::regclass::text, mode FROM pg_locks"
+                    " WHERE pid = pg_backend_pid() AND relation::regclass::text"
+                    " IN ('purchases', 'purchases_2020_01')"
+                )
+            )
+        )
+        return gzip_open(*args, **kwargs)
+
+    monkeypatch.setattr(partitions.gzip, "open", open_archive)
+    with app.app_context():
+        archive_purchase_partitions(date(2021, 1, 1), str(tmp_path))
+    # Purchases aren't blocked while the partition is exported
+    assert ("purchases", "AccessExclusiveLock") not in locks
+    assert ("purchases_2020_01", "ShareLock") in locks
+
+
+def test_archive_failure(app, tmp_path):
+    with app.app_context():
+        db = get_db()
+        # The view keeps the partition from being dropped
+        db.execute(text("CREATE VIEW old_purchases AS SELECT * FROM purchases_2020_01"))
+        with pytest.raises(sqlalchemy.exc.InternalError):
+            archive_purchase_partitions(date(2021, 1, 1), str(tmp_path))
+        assert "purchases_2020_01" in [name for name, _ in purchase_partitions()]
+        assert _count("purchases") == 2
+    assert os.listdir(tmp_path) == []
+
+
+def test_commands(runner, app, tmp_path):
+    result = runner.invoke(args=["purchases", "partition", "--months-ahead", "5"])
+    assert "Created 2 partitions." in result.output
+
+    result = runner.invoke(args=["purchases", "archive"])
+    assert "Archived 1 partitions." in result.output
+    assert os.listdir(tmp_path) == ["purchases_2020_01.csv.gz"]
@@ -1,3 +1,5 @@
+from urllib.parse import unquote
+
 import pytest
 from sqlalchemy import text
 
@@ -118,3 +120,93 @@ def test_delete(client, auth, app):
         db = get_db()
         product = db.execute(text("SELECT * FROM products WHERE id = 2")).fetchone()
         assert product is None
+
+
+def test_product_cache(client, auth, app):
+    auth.login()
+    assert b"Example Product 1" in client.get("/1/update").data
+
+    # a write behind the app's back is hidden until the cache expires...
+    with app.app_context():
+        db = get_db()
+        db.execute(text("UPDATE products SET name = 'renamed' WHERE id = 1"))
+        db.commit()
+    assert b"Example Product 1" in client.get("/1/update").data
+
+    # ...but updates through the app invalidate it immediately
+    client.post(
+        "/1/update",
+        data={
+            "name": "updated",
+            "description": "updated description",
+            "price": "100.00",
+        },
+    )
+    assert b"updated" in client.get("/1/update").data
+
+
+def test_product_cache_disabled(app, client, auth):
+    app.config["PRODUCT_CACHE_TTL"] = 0
+    auth.login()
+    assert b"Example Product 1" in client.get("/1/update").data
+
+    with app.app_context():
+        db = get_db()
+        db.execute(text("UPDATE products SET name = 'renamed' WHERE id = 1"))
+        db.commit()
+    assert b"renamed" in client.get("/1/update").data
+
+
+def test_delete_invalidates_cache(client, auth):
+    auth.login()
+    assert client.get("/2/update").status_code == 200
+    client.post("/2/delete")
+    assert client.get("/2/update").status_code == 404
+    assert client.post("/2/delete").status_code == 404
+
+
+@pytest.mark.parametrize(
+    ("q", "expected", "unexpected"),
+    (
+        ("product", (b"Example Product 1", b"Example Product 3"), ()),
+        ("#3", (b"Example Product 3",), ()),
+        ("descriptions", (b"Example Product 1",), ()),
+        ("missing", (b'No products match "missing"',), (b"Example Product",)),
+    ),
+)
+def test_search(client, q, expected, unexpected):
+    response = client.get("/search", query_string={"q": q})
+    assert response.status_code == 200
+    for value in expected:
+        assert value in response.data
+    for value in unexpected:
+        assert value not in response.data
+
+
+def test_search_updated(client, auth):
+    auth.login()
+    client.post(
+        "/1/update",
+        data={
+            "name": "updated",
+            "description": "a completely different widget",
+            "price": "100.00",
+        },
+    )
+    response = client.get("/search", query_string={"q": "widget"})
+    assert b"updated" in response.data
+    assert b"Example Product 2" not in response.data
+
+
+def test_search_pagination(client, monkeypatch):
+    monkeypatch.setattr("flaskr.product.SEARCH_PAGE_SIZE", 2)
+    response = client.get("/search", query_string={"q": "example"})
+    assert response.data.count(b'<article class="product">') == 2
+    assert b"Next" in response.data
+
+    after = unquote(response.data.split(b"after=")[1].split(b'"')[0].decode())
+    response = client.get("/search", query_string={"q": "example", "after": after})
+    assert response.data.count(b'<article class="product">') == 1
+    assert b"Next" not in response.data
+
+    assert client.get("/search?q=example&after=bogus").status_code == 400
@@ -0,0 +1,88 @@
+import os
+import sys
+
+import pytest
+
+from flaskr import create_app
+
+
+@pytest.fixture
+def app_config(tmp_path):
+    return {
+        "PROFILING": True,
+        "PROFILING_DIR": str(tmp_path),
+        "PROFILING_SECRET": "s3cret",
+    }
+
+
+def test_disabled(tmp_path):
+    profiles = tmp_path / "profiles"
+    app = create_app({"TESTING": True, "PROFILING_DIR": str(profiles)}, str(tmp_path))
+    response = app.test_client().get("/hello", headers={"X-Flaskr-Profile": "1"})
+    assert "X-Profile" not in response.headers
+    assert not profiles.exists()
+
+
+def test_profile_header(client, app):
+    response = client.get(
+        "/", headers={"X-Flaskr-Profile": "s3cret", "X-Request-ID": "abc123"}
+    )
+    name = response.headers["X-Profile"]
+    assert name.endswith("-product.index-abc123.pstats")
+    assert os.listdir(app.config["PROFILING_DIR"]) == [name]
+
+
+def test_profile_header_secret(client, app):
+    assert "X-Profile" not in client.get("/", headers={"X-Flaskr-Profile": "1"}).headers
+
+    # Without a secret, the header only works in debug mode
+    app.config["PROFILING_SECRET"] = None
+    assert "X-Profile" not in client.get("/", headers={"X-Flaskr-Profile": "1"}).headers
+    app.debug = True
+    assert "X-Profile" in client.get("/", headers={"X-Flaskr-Profile": "1"}).headers
+    assert os.listdir(app.config["PROFILING_DIR"]) != []
+
+
+def test_profile_error(client, app):
+    @app.route("/error")
+    def error():
+        raise RuntimeError("failed")
+
+    app.config["PROFILING_SAMPLE_RATE"] = 1.0
+    app.config["PROFILING_THRESHOLD"] = 0
+    # Propagated exceptions skip after_request hooks
+    with pytest.raises(RuntimeError):
+        client.get("/error")
+    # The failed request's profiler was stopped, so the next one is profiled
+    assert sys.getprofile() is None
+    assert "X-Profile" in client.get("/hello").headers
+
+
+def test_prune(client, app):
+    app.config["PROFILING_MAX_FILES"] = 2
+    directory = app.config["PROFILING_DIR"]
+    for i in range(3):
+        open(os.path.join(directory, f"2020010{i}T000000-x-{i}.pstats"), "w").close()
+    name = client.get("/", headers={"X-Flaskr-Profile": "s3cret"}).headers["X-Profile"]
+    assert sorted(os.listdir(directory)) == ["20200102T000000-x-2.pstats", name]
+
+
+def test_profile_threshold(client, app):
+    app.config["PROFILING_SAMPLE_RATE"] = 1.0
+    assert "X-Profile" not in client.get("/hello").headers
+
+    app.config["PROFILING_THRESHOLD"] = 0
+    assert "X-Profile" in client.get("/hello").headers
+
+
+def test_profiles_command(client, runner):
+    result = runner.invoke(args=["profiles", "list"])
+    assert "No profiles" in result.output
+
+    name = client.get("/", headers={"X-Flaskr-Profile": "s3cret"}).headers["X-Profile"]
+    result = runner.invoke(args=["profiles", "list"])
+    assert name in result.output
+
+    result = runner.invoke(args=["profiles", "show", name, "--limit", "5"])
+    assert "function calls" in result.output
+    assert runner.invoke(args=["profiles", "show", "missing"]).exit_code != 0
@@ -0,0 +1,44 @@
+from flaskr import queries
+
+
+def test_record():
+    user = queries.User(1, "admin@example.com", "Admin")
+    assert user.email == "admin@example.com"
+    assert user == queries.User(1, "admin@example.com", "Admin")
+    assert user != queries.User(2, "admin@example.com", "Admin")
+    assert repr(user) == "User(id=1, email='admin@example.com', first_name='Admin')"
+    assert not hasattr(user, "__dict__")
+
+
+def test_subclass_fields():
+    assert queries.SearchResult._fields == queries.Product._fields + ("rank",)
+    result = queries.SearchResult(1, "name", "description", 1.0, None, 1, "A", 0.5)
+    assert result.first_name == "A"
+    assert result.rank == 0.5
+
+
+def test_projections(app):
+    with app.app_context():
+        user = queries.get_user(1)
+        assert user == queries.User(1, "admin@example.com", "Admin")
+        assert queries.get_credentials("admin@example.com").id == 1
+        assert queries.get_user(100) is None
+
+        products = queries.list_products()
+        assert [product.id for product in products] == [3, 2, 1]
+        assert products[0].first_name == "Example"
+        assert queries.find_product(1).seller_id == 1
+        assert queries.find_product(100) is None
+
+        sales = queries.list_product_sales(1)
+        assert [(s.id, s.purchase_count) for s in sales] == [(1, 2), (2, 0)]
+
+
+def test_seller_scoped_writes(app):
+    with app.app_context():
+        assert not queries.update_product(3, 1, "name", "description", 1)
+        assert not queries.delete_product(3, 1)
+        assert queries.update_product(1, 1, "name", "description", 1)
+        assert queries.find_product(1).name == "name"
+        assert queries.delete_product(2, 1)
+        assert queries.find_product(2) is None
@@ -0,0 +1,265 @@
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from flaskr import fidesops, scenarios
+from flaskr.ledger import Ledger
+from flaskr.scenarios import Scenario, load_scenarios, run_scenario
+
+SCENARIOS = """
+scenarios:
+  - name: access
+    policy: access_policy
+    action_type: access
+    data_categories: [user.contact]
+    identities: [a@example.com]
+    identities_file: emails.txt
+  - name: erasure
+    policy: erasure_policy
+    action_type: erasure
+    data_categories: [user.contact, user.name]
+    identities: [a@example.com]
+    timeout: 5
+"""
+
+
+@pytest.fixture
+def scenario_file(tmp_path):
+    (tmp_path / "emails.txt").write_text(
+        "b@example.com\n\nc@example.com\na@example.com\n"
+    )
+    path = tmp_path / "scenarios.yml"
+    path.write_text(SCENARIOS)
+    return path
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = Ledger(str(tmp_path / "ledger.sqlite3"))
+    yield ledger
+    ledger.close()
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """Replace the fidesops API calls with a server that finishes requests
+    after `polls` status checks, recording the calls made."""
+    api = {"calls": [], "polls": 1, "final": "complete", "checks": {}, "ids": {}}
+
+    def record(name):
+        def call(**kwargs):
+            api["calls"].append((name, kwargs))
+            return {}
+
+        return call
+
+    for name in (
+        "create_policy",
+        "delete_policy_rule",
+        "create_policy_rule",
+        "create_policy_rule_target",
+        "setup_defaults",
+        "wait_for_health",
+    ):
+        monkeypatch.setattr(fidesops, name, record(name))
+
+    def create_privacy_request(email, policy_key, access_token):
+        api["calls"].append(("create_privacy_request", email))
+        n = api["ids"][email] = api["ids"].get(email, 0) + 1
+        request_id = f"pri_{email}" if n == 1 else f"pri_{email}_{n}"
+        return {"succeeded": [{"id": request_id, "status": "pending"}]}
+
+    def get_privacy_request(privacy_request_id, access_token):
+        checks = api["checks"][privacy_request_id] = (
+            api["checks"].get(privacy_request_id, 0) + 1
+        )
+        status = api["final"] if checks >= api["polls"] else "in_processing"
+        return {"id": privacy_request_id, "status": status}
+
+    monkeypatch.setattr(fidesops, "create_privacy_request", create_privacy_request)
+    monkeypatch.setattr(fidesops, "get_privacy_request", get_privacy_request)
+    monkeypatch.setattr(fidesops, "get_access_token", lambda **kwargs: "token")
+    monkeypatch.setattr(
+        fidesops,
+        "create_oauth_client",
+        lambda **kwargs: {"client_id": "id", "client_secret": "secret"},
+    )
+    monkeypatch.setattr(scenarios, "POLL_INTERVAL", 0)
+    return api
+
+
+def test_load_scenarios(scenario_file):
+    access, erasure = load_scenarios(scenario_file)
+    assert access.identities == ["a@example.com", "b@example.com", "c@example.com"]
+    assert access.timeout == scenarios.DEFAULT_TIMEOUT
+    assert access.rule == "access_policy_rule"
+    assert erasure.data_categories == ["user.contact", "user.name"]
+    assert erasure.timeout == 5
+
+
+@pytest.mark.parametrize(
+    ("content", "message"),
+    (
+        ("scenarios: []", "has no scenarios"),
+        (
+            "scenarios: [{name: a, policy: p, action_type: access}]",
+            "no data_categories",
+        ),
+        (
+            "scenarios: [{name: a, policy: p, action_type: delete,"
+            " data_categories: [user], identities: [a]}]",
+            "unknown action type delete",
+        ),
+        (
+            "scenarios: [{name: a, policy: p, action_type: access,"
+            " data_categories: [user]}]",
+            "has no identities",
+        ),
+        (
+            "scenarios: [{name: a, policy: p, action_type: access,"
+            " data_categories: [user], identities: [a], emails: [b]}]",
+            "unknown keys emails",
+        ),
+    ),
+)
+def test_load_invalid(tmp_path, content, message):
+    path = tmp_path / "scenarios.yml"
+    path.write_text(content)
+    with pytest.raises(ValueError, match=message):
+        load_scenarios(path)
+
+
+def test_run_scenario(api, ledger):
+    api["polls"] = 3
+    scenario = Scenario("s", "p", "erasure", ["user.contact"], ["a", "b"])
+    result = run_scenario(scenario, "token", ledger, "batch")
+
+    assert not result.failed
+    assert result.statuses == {"pri_a": "complete", "pri_b": "complete"}
+    assert list(result.timings) == ["setup", "submission", "completion"]
+    assert api["checks"] == {"pri_a": 3, "pri_b": 3}
+    names = [name for name, _ in api["calls"]]
+    assert names == [
+        "create_policy",
+        "delete_policy_rule",
+        "create_policy_rule",
+        "create_policy_rule_target",
+        "create_privacy_request",
+        "create_privacy_request",
+    ]
+    rule = dict(api["calls"])["create_policy_rule"]
+    assert rule["action_type"] == "erasure"
+    assert rule["storage_destination_key"] is None
+    assert rule["masking_strategy"]["strategy"] == "hmac"
+    assert ledger.requests("batch", "p") == {
+        "a": ("pri_a", "complete"),
+        "b": ("pri_b", "complete"),
+    }
+
+
+def test_duplicate_identities(api, ledger):
+    scenario = Scenario("s", "p", "access", ["user"], ["a@x", "a@x"])
+    result = run_scenario(scenario, "token", ledger, "batch")
+    assert not result.failed
+    assert result.statuses == {"pri_a@x": "complete"}
+    assert api["ids"] == {"a@x": 1}
+
+
+def test_resume(api, ledger):
+    scenario = Scenario("s", "p", "access", ["user"], ["a", "b"], timeout=0)
+    api["polls"] = 2
+    assert run_scenario(scenario, "token", ledger, "batch").failed
+    assert ledger.pending("batch", "p") == {
+        "pri_a": "in_processing",
+        "pri_b": "in_processing",
+    }
+
+    # Resuming polls the pending requests without submitting them again
+    scenario.identities.append("c")
+    scenario.timeout = 5
+    api["calls"].clear()
+    result = run_scenario(scenario, "token", ledger, "batch")
+    assert not result.failed
+    assert result.resumed == 2
+    assert result.statuses == {
+        "pri_a": "complete",
+        "pri_b": "complete",
+        "pri_c": "complete",
+    }
+    assert api["checks"] == {"pri_a": 2, "pri_b": 2, "pri_c": 2}
+    assert ("create_privacy_request", "c") in api["calls"]
+    assert ("create_privacy_request", "a") not in api["calls"]
+
+    # Another batch submits everyone again
+    result = run_scenario(scenario, "token", ledger, "other")
+    assert result.resumed == 0
+    assert sorted(result.statuses) == ["pri_a_2", "pri_b_2", "pri_c_2"]
+
+
+def test_run_scenario_failures(api, ledger, monkeypatch):
+    scenario = Scenario("s", "p", "access", ["user"], ["a"], timeout=0)
+    api["polls"] = 2
+    result = run_scenario(scenario, "token", ledger, "1")
+    assert result.failed
+    assert result.statuses == {"pri_a": "in_processing"}
+
+    api["polls"], api["final"] = 1, "error"
+    assert run_scenario(scenario, "token", ledger, "2").failed
+
+    def fail(**kwargs):
+        raise RuntimeError("fidesops policy creation failed!", None)
+
+    monkeypatch.setattr(fidesops, "create_policy", fail)
+    result = run_scenario(scenario, "token", ledger, "3")
+    assert result.error == "fidesops policy creation failed!"
+    assert list(result.timings) == ["setup"]
+
+
+def test_main(api, scenario_file, tmp_path):
+    output = tmp_path / "results.json"
+    metrics = tmp_path / "metrics.txt"
+    ledger = str(tmp_path / "ledger" / "ledger.sqlite3")
+    result = CliRunner().invoke(
+        scenarios.main,
+        [
+            str(scenario_file),
+            "--output",
+            str(output),
+            "--ledger",
+            ledger,
+            "--metrics",
+            str(metrics),
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    lines = result.output.splitlines()
+    assert lines[1].split() == [
+        "scenario",
+        "requests",
+        "failed",
+        "setup",
+        "submission",
+        "completion",
+    ]
+    assert lines[2].split()[:3] == ["access", "3", "0"]
+    assert lines[4].split()[:4] == ["endpoint", "calls", "errors", "retries"]
+    assert "# TYPE fidesops_client_requests_total counter" in metrics.read_text()
+    results = json.loads(output.read_text())
+    assert results["batch"] in lines[0]
+    assert [s["statuses"] for s in results["scenarios"]] == [
+        {"complete": 3},
+        {"complete": 1},
+    ]
+
+    api["final"] = "error"
+    result = CliRunner().invoke(
+        scenarios.main, [str(scenario_file), "--ledger", ledger, "--batch", "b"]
+    )
+    assert result.exit_code == 1
+    assert "access failed: pri_a@example.com_3 (error)" in result.output
+
+    scenario_file.write_text("scenarios:")
+    result = CliRunner().invoke(scenarios.main, [str(scenario_file)])
+    assert result.exit_code == 1
+    assert "has no scenarios" in result.output
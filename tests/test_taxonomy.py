@@ -0,0 +1,83 @@
+import pytest
+
+from flaskr.fides import load_manifests
+from flaskr.taxonomy import Index, compile_policy, dataset_fields
+
+pytest.importorskip("fideslang")
+
+
+@pytest.fixture
+def resources(app):
+    with app.app_context():
+        yield load_manifests()
+
+
+@pytest.fixture
+def rules(app, resources):
+    with app.app_context():
+        return {rule.fides_key: rule for rule in compile_policy(resources["policy"][0])}
+
+
+def test_index():
+    index = Index(
+        "data_category", {"user": None, "user.contact": "user", "system": None}
+    )
+    mask = index.mask(["user"])
+    assert index.match(["user.contact", "system"], mask) == ["user.contact"]
+    assert index.match(["user.contact", "system"], mask, "OTHER") == ["system"]
+    assert index.match(["system"], mask, "NONE") == ["system"]
+    assert index.match(["system"], index.mask(["user", "system"]), "ALL") == []
+    with pytest.raises(ValueError, match="Unknown data_category user.name"):
+        index.match(["user.name"], mask)
+
+
+def test_targets(resources, rules):
+    fields = dict(
+        field for dataset in resources["dataset"] for field in dataset_fields(dataset)
+    )
+    rule = rules["minimize_user_identifiable_data"]
+    assert rule.targets(fields["flaskr_postgres_dataset.users.email"]) == [
+        "user.contact.email"
+    ]
+    assert rule.targets(fields["flaskr_postgres_dataset.users.created_at"]) == []
+    assert rule.targets(
+        fields["mailchimp_connector_example.member.merge_fields.ADDRESS.city"]
+    ) == ["user.contact.address.city"]
+    assert rules["reject_sensitive_data"].targets(["user.contact.email"]) == []
+
+
+def test_violations(resources, rules):
+    # The demo's systems all comply with flaskr_policy
+    for system in resources["system"]:
+        for declaration in system["privacy_declarations"]:
+            for rule in rules.values():
+                assert rule.violations(declaration) == []
+
+    declaration = {
+        "data_categories": ["user.health_and_medical", "system.operations"],
+        "data_use": "provide.service.operations.e-commerce",
+        "data_subjects": ["flaskr_customer"],
+    }
+    assert rules["reject_sensitive_data"].violations(declaration) == [
+        "user.health_and_medical"
+    ]
+    declaration["data_qualifier"] = "aggregated.anonymized"
+    assert rules["reject_sensitive_data"].violations(declaration) == [
+        "user.health_and_medical"
+    ]
+    declaration["data_use"] = "collect.analytics"
+    assert rules["minimize_user_identifiable_data"].violations(declaration) == []
+
+
+def test_targets_command(runner):
+    result = runner.invoke(args=["fides", "targets", "flaskr_policy"])
+    assert result.output == runner.invoke(args=["fides", "targets"]).output
+    lines = result.output.splitlines()
+    assert (
+        "minimize_user_identifiable_data\tflaskr_postgres_dataset.purchases.zip"
+        "\tuser.contact.address.postal_code"
+    ) in lines
+    assert "flaskr_postgres_dataset.users.created_at" not in result.output
+    assert "reject_sensitive_data" not in result.output
+    result = runner.invoke(args=["fides", "targets", "nope"])
+    assert "No policy nope" in result.output
@@ -0,0 +1,27 @@
+import os
+
+from flaskr import create_app
+
+
+def test_precompile(tmp_path):
+    app = create_app({"TESTING": True}, str(tmp_path))
+    assert {"base.html", "product/index.html"} <= {
+        template.name for template in app.jinja_env.cache.values()
+    }
+    # One bytecode cache file per template, in a fresh instance folder
+    cache_dir = os.path.join(tmp_path, "jinja_cache")
+    assert len(os.listdir(cache_dir)) == len(app.jinja_env.list_templates())
+
+
+def test_precompile_disabled(tmp_path):
+    app = create_app(
+        {
+            "TESTING": True,
+            "TEMPLATE_PRECOMPILE": False,
+            "TEMPLATE_BYTECODE_CACHE": False,
+        },
+        str(tmp_path),
+    )
+    assert app.jinja_env.bytecode_cache is None
+    assert len(app.jinja_env.cache) == 0
+    assert not os.path.exists(os.path.join(tmp_path, "jinja_cache"))
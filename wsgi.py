@@ -0,0 +1,11 @@
+"""
+WSGI entry point for serving flaskr with any WSGI server, e.g.:
+
+    gunicorn --workers 4 wsgi:app
+
+Prefer `flask serve`, which also preloads the app before forking workers.
+"""
+
+from flaskr import create_app
+
+app = create_app()